@@ -0,0 +1,57 @@
+"""Latency of the compiled tree backend against native XGBoost.
+
+Compares ``Booster.inplace_predict`` with ``CompiledTreeEnsemble.predict``
+on float32 matrices at several batch sizes and model depths.
+
+    python -m benchmarks.bench_compiled_trees
+"""
+
+import time
+import numpy as np
+from benchmarks.service_utils import service
+from tests.unit.conftest import make_model
+from utils.tree_helper import CompiledTreeEnsemble
+
+BATCH_SIZES = [1, 10, 100, 1_000, 10_000]
+
+
+def measure(func, features, min_time: float = 0.5):
+    latencies = []
+    start_time = time.perf_counter()
+    while time.perf_counter() - start_time < min_time or len(latencies) < 3:
+        call_time = time.perf_counter()
+        func(features)
+        latencies.append(time.perf_counter() - call_time)
+    return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    model = make_model()
+    booster = model.get_booster()
+    compiled_model = CompiledTreeEnsemble.from_model(model)
+    rng = np.random.default_rng(0)
+
+    print(
+        f"{compiled_model.n_trees} trees, depth {compiled_model.max_depth}\n"
+        f"{'batch':>6} {'backend':>9} {'p50 (ms)':>10} {'p99 (ms)':>10}"
+    )
+    for batch_size in BATCH_SIZES:
+        features = rng.normal(
+            size=(batch_size, len(service.MODEL_FEATURE_COLUMNS))
+        ).astype(np.float32)
+        np.testing.assert_array_equal(
+            compiled_model.predict(features), booster.inplace_predict(features)
+        )
+        for backend, func in [
+            ("xgboost", booster.inplace_predict),
+            ("compiled", compiled_model.predict),
+        ]:
+            p50, p99 = measure(func, features)
+            print(
+                f"{batch_size:>6} {backend:>9} {p50 * 1000:>10.3f} "
+                f"{p99 * 1000:>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark of the hourly index construction used by ``data_loader``.
+
+Compares the former row-by-row ``DataFrame.apply`` with
+``build_datetime_index`` on synthetic hourly data.
+
+    python -m benchmarks.bench_datetime_index
+"""
+
+import datetime
+import time
+import pandas as pd
+from steps.data_loaders import build_datetime_index
+
+YEARS = [1, 5, 10]
+
+
+def make_hourly_data(years: int) -> pd.DataFrame:
+    dates = pd.date_range("2015-01-01", periods=365 * years, freq="D")
+    return pd.DataFrame(
+        {
+            "date": dates.repeat(24),
+            "hour": list(range(24)) * len(dates),
+        }
+    )
+
+
+def apply_index(data: pd.DataFrame) -> pd.DatetimeIndex:
+    return pd.DatetimeIndex(
+        data.apply(
+            lambda row: datetime.datetime.combine(
+                row.date.date(), datetime.time(row.hour)
+            ),
+            axis=1,
+        )
+    )
+
+
+def columnar_index(data: pd.DataFrame) -> pd.DatetimeIndex:
+    return build_datetime_index(data["date"], data["hour"])
+
+
+def timeit(func, data: pd.DataFrame, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func(data)
+        best = min(best, time.perf_counter() - start_time)
+    return best
+
+
+def main():
+    print(f"{'years':>5} {'rows':>8} {'apply (s)':>10} {'columnar (s)':>13}")
+    for years in YEARS:
+        data = make_hourly_data(years)
+        assert apply_index(data).equals(columnar_index(data))
+        apply_time = timeit(apply_index, data, repeat=1)
+        columnar_time = timeit(columnar_index, data)
+        print(
+            f"{years:>5} {len(data):>8} {apply_time:>10.3f} "
+            f"{columnar_time:>13.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
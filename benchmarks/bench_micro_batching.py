@@ -0,0 +1,73 @@
+"""Latency and throughput of ``predict_trip`` under concurrent load.
+
+Many clients send small requests at once. The unbatched endpoint runs one
+booster call per request in the worker threads, the batched endpoint
+coalesces them through the micro-batcher.
+
+    python -m benchmarks.bench_micro_batching
+"""
+
+import asyncio
+import time
+import numpy as np
+from benchmarks.service_utils import service
+from tests.unit.conftest import make_raw_inputs, make_service
+
+CONCURRENCY = [1, 16, 64]
+ROWS_PER_REQUEST = 1
+REQUESTS_PER_CLIENT = 50
+MAX_LATENCY_MS = [1.0, 5.0]
+
+
+async def run_clients(endpoint, concurrency: int):
+    input_data = make_raw_inputs(ROWS_PER_REQUEST)
+    latencies = []
+
+    async def client():
+        for _ in range(REQUESTS_PER_CLIENT):
+            call_time = time.perf_counter()
+            await endpoint(input_data)
+            latencies.append(time.perf_counter() - call_time)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start_time
+    return (
+        np.percentile(latencies, 50),
+        np.percentile(latencies, 99),
+        len(latencies) / elapsed,
+    )
+
+
+def main():
+    instance = make_service()
+    predict_trip = service.CitibikeService.inner.predict_trip.func
+
+    async def unbatched(input_data):
+        return await asyncio.to_thread(predict_trip, instance, input_data)
+
+    print(
+        f"{'clients':>7} {'path':>14} {'p50 (ms)':>10} {'p99 (ms)':>10} "
+        f"{'req/s':>10}"
+    )
+    for concurrency in CONCURRENCY:
+        paths = [("unbatched", unbatched)]
+        for max_latency_ms in MAX_LATENCY_MS:
+            batched = make_service(instance.model)
+            batched.batcher.max_latency = max_latency_ms / 1000
+            paths.append(
+                (f"batched {max_latency_ms:g}ms", batched.predict_trip_batched)
+            )
+
+        for path, endpoint in paths:
+            p50, p99, throughput = asyncio.run(
+                run_clients(endpoint, concurrency)
+            )
+            print(
+                f"{concurrency:>7} {path:>14} {p50 * 1000:>10.2f} "
+                f"{p99 * 1000:>10.2f} {throughput:>10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
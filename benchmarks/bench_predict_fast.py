@@ -0,0 +1,96 @@
+"""Latency and throughput of ``/predict`` and ``/predict_fast``.
+
+Both paths start from the same JSON request body and end with the JSON
+response bytes. The legacy path is ``predict`` before the fast path: a
+Pydantic object and a dict per row, a DataFrame and a dict per prediction.
+
+    python -m benchmarks.bench_predict_fast
+"""
+
+import json
+import time
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+from benchmarks.service_utils import service
+from tests.unit.conftest import make_service
+
+BATCH_SIZES = [1, 100, 10_000]
+
+
+class PredictInput(BaseModel):
+    input_data: List[service.CitibikeService.inner.CitibikeInput]
+
+
+class FastPredictInput(BaseModel):
+    input_data: List[Dict[str, float]]
+
+
+def make_body(batch_size: int, random_state: int = 42) -> bytes:
+    rng = np.random.default_rng(random_state)
+    features = rng.normal(
+        size=(batch_size, len(service.MODEL_FEATURE_COLUMNS))
+    )
+    records = [
+        dict(zip(service.MODEL_FEATURE_COLUMNS, row)) for row in features
+    ]
+    for record in records:
+        record["holiday"] = int(rng.integers(0, 2))
+    return json.dumps({"input_data": records}).encode()
+
+
+def legacy_predict(instance, body: bytes) -> bytes:
+    input_data = PredictInput.model_validate_json(body).input_data
+    input_dicts = [item.dict() for item in input_data]
+    df = pd.DataFrame(input_dicts)
+    preds = instance.model.predict(df)
+    predictions = [
+        {"model": service.MODEL_NAME, "prediction": pred}
+        for pred in preds.tolist()
+    ]
+    return json.dumps({"predictions": predictions}).encode()
+
+
+def fast_predict(instance, body: bytes) -> bytes:
+    input_data = FastPredictInput.model_validate_json(body).input_data
+    features = service.decode_input_features(input_data)
+    preds = instance.model.get_booster().inplace_predict(features)
+    return service.encode_predictions(preds)
+
+
+def measure(func, instance, body: bytes, min_time: float = 1.0):
+    latencies = []
+    start_time = time.perf_counter()
+    while time.perf_counter() - start_time < min_time or len(latencies) < 3:
+        call_time = time.perf_counter()
+        func(instance, body)
+        latencies.append(time.perf_counter() - call_time)
+    return np.median(latencies), np.mean(latencies)
+
+
+def main():
+    instance = make_service()
+
+    print(f"{'batch':>6} {'path':>8} {'p50 (ms)':>10} {'rows/s':>12}")
+    for batch_size in BATCH_SIZES:
+        body = make_body(batch_size)
+        np.testing.assert_array_equal(
+            [
+                p["prediction"]
+                for p in json.loads(legacy_predict(instance, body))[
+                    "predictions"
+                ]
+            ],
+            json.loads(fast_predict(instance, body))["predictions"],
+        )
+        for path, func in [("legacy", legacy_predict), ("fast", fast_predict)]:
+            latency, mean_latency = measure(func, instance, body)
+            print(
+                f"{batch_size:>6} {path:>8} {latency * 1000:>10.2f} "
+                f"{batch_size / mean_latency:>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
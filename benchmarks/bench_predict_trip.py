@@ -0,0 +1,90 @@
+"""Latency and throughput of ``CitibikeService.predict_trip``.
+
+Compares the former per-row feature loop with the vectorized batch path
+at several batch sizes.
+
+    python -m benchmarks.bench_predict_trip
+"""
+
+import time
+import holidays
+import numpy as np
+import pandas as pd
+from benchmarks.service_utils import service
+from tests.unit.conftest import make_raw_inputs, make_service
+
+BATCH_SIZES = [1, 100, 10_000]
+
+
+def legacy_predict_trip(instance, input_data):
+    """``predict_trip`` before vectorization: one dict per row."""
+    pro_input_dicts = []
+    for item in [item.dict() for item in input_data]:
+        date = item["date"]
+        data = {
+            "holiday": 1 if date in holidays.US(years=date.year) else 0,
+            "TMAX": item["TMAX"],
+            "TMIN": item["TMIN"],
+            "SNOW": item["SNOW"],
+            "hr_sin": np.sin(date.hour * (2.0 * np.pi / 24)),
+            "hr_cos": np.cos(date.hour * (2.0 * np.pi / 24)),
+            "weekday_sin": np.sin(date.weekday() * (2.0 * np.pi / 7)),
+            "weekday_cos": np.cos(date.weekday() * (2.0 * np.pi / 7)),
+            "week_sin": np.sin((date.isocalendar()[1] - 1) * (2 * np.pi / 52)),
+            "week_cos": np.cos((date.isocalendar()[1] - 1) * (2 * np.pi / 52)),
+            "mnth_sin": np.sin((date.month - 1) * (2.0 * np.pi / 12)),
+            "mnth_cos": np.cos((date.month - 1) * (2.0 * np.pi / 12)),
+        }
+        pro_input_dicts.append(data)
+    preds = instance.model.predict(pd.DataFrame(pro_input_dicts))
+    return {
+        "predictions": [
+            {"model": service.MODEL_NAME, "prediction": pred}
+            for pred in preds.tolist()
+        ]
+    }
+
+
+def measure(func, instance, input_data, min_time: float = 1.0):
+    latencies = []
+    start_time = time.perf_counter()
+    while time.perf_counter() - start_time < min_time or len(latencies) < 3:
+        call_time = time.perf_counter()
+        func(instance, input_data)
+        latencies.append(time.perf_counter() - call_time)
+    return np.median(latencies), len(input_data) / np.mean(latencies)
+
+
+def main():
+    instance = make_service()
+    vectorized = service.CitibikeService.inner.predict_trip.func
+
+    print(f"{'batch':>6} {'path':>10} {'p50 (ms)':>10} {'rows/s':>12}")
+    for batch_size in BATCH_SIZES:
+        input_data = make_raw_inputs(batch_size)
+        np.testing.assert_allclose(
+            [
+                p["prediction"]
+                for p in legacy_predict_trip(instance, input_data)[
+                    "predictions"
+                ]
+            ],
+            [
+                p["prediction"]
+                for p in vectorized(instance, input_data)["predictions"]
+            ],
+            rtol=1e-6,
+        )
+        for path, func in [
+            ("legacy", legacy_predict_trip),
+            ("vectorized", vectorized),
+        ]:
+            latency, throughput = measure(func, instance, input_data)
+            print(
+                f"{batch_size:>6} {path:>10} {latency * 1000:>10.2f} "
+                f"{throughput:>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
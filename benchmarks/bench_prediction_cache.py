@@ -0,0 +1,54 @@
+"""Latency of ``predict_trip`` with and without the prediction cache.
+
+Simulates dashboards that refresh the same week-long hourly forecast over
+and over, so after the first request every row is a cache hit.
+
+    python -m benchmarks.bench_prediction_cache
+"""
+
+import datetime
+import time
+import numpy as np
+from benchmarks.service_utils import service
+from tests.unit.conftest import make_model, make_service
+
+FORECAST_HOURS = 24 * 7
+REQUESTS = 200
+
+
+def make_forecast_inputs():
+    start = datetime.datetime(2025, 6, 2)
+    service_class = service.CitibikeService.inner
+    return [
+        service_class.CitibikeRawInput(
+            date=start + datetime.timedelta(hours=hour),
+            TMAX=80.0,
+            TMIN=65.0,
+            SNOW=0.0,
+        )
+        for hour in range(FORECAST_HOURS)
+    ]
+
+
+def main():
+    model = make_model()
+    input_data = make_forecast_inputs()
+
+    print(f"{'cache':>8} {'p50 (ms)':>10} {'p99 (ms)':>10} {'hit ratio':>10}")
+    for cache_size in [0, 10_000]:
+        instance = make_service(model, prediction_cache_size=cache_size)
+        latencies = []
+        for _ in range(REQUESTS):
+            call_time = time.perf_counter()
+            instance.predict_trip(input_data)
+            latencies.append(time.perf_counter() - call_time)
+        print(
+            f"{cache_size:>8} "
+            f"{np.percentile(latencies, 50) * 1000:>10.2f} "
+            f"{np.percentile(latencies, 99) * 1000:>10.2f} "
+            f"{instance.prediction_cache.stats['hit_ratio']:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
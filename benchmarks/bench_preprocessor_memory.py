@@ -0,0 +1,65 @@
+"""Peak memory of ``data_preprocessor`` in default and lean mode.
+
+Peaks are measured with tracemalloc on synthetic hourly data.
+
+    python -m benchmarks.bench_preprocessor_memory
+"""
+
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from steps.data_loaders import data_preprocessor
+
+YEARS = [1, 5, 10]
+
+
+def make_modeling_data(years: int) -> pd.DataFrame:
+    dates = pd.date_range("2015-01-01", periods=365 * years, freq="D")
+    rows = len(dates) * 24
+    rng = np.random.default_rng(42)
+    return pd.DataFrame(
+        {
+            "date": dates.repeat(24),
+            "hour": np.tile(np.arange(24, dtype="int32"), len(dates)),
+            "trips": rng.integers(0, 5000, rows),
+            "holiday": rng.integers(0, 2, rows),
+            "DATE": dates.repeat(24),
+            "TMAX": rng.normal(60, 15, rows),
+            "TMIN": rng.normal(45, 15, rows),
+            "SNOW": rng.exponential(0.1, rows),
+        }
+    )
+
+
+def measure(dataset: pd.DataFrame, **kwargs):
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    data = data_preprocessor.entrypoint(dataset, **kwargs)
+    elapsed_time = time.perf_counter() - start_time
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed_time, data.memory_usage(deep=True).sum()
+
+
+def main():
+    print(
+        f"{'years':>5} {'mode':>12} {'peak (MB)':>10} {'output (MB)':>12} "
+        f"{'time (s)':>9}"
+    )
+    for years in YEARS:
+        dataset = make_modeling_data(years)
+        for mode, kwargs in [
+            ("default", {}),
+            ("lean", {"lean": True}),
+            ("lean+weather", {"lean": True, "downcast_weather": True}),
+        ]:
+            peak, elapsed_time, output = measure(dataset, **kwargs)
+            print(
+                f"{years:>5} {mode:>12} {peak / 1024**2:>10.1f} "
+                f"{output / 1024**2:>12.1f} {elapsed_time:>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Throughput and latency of the service across worker layouts.
+
+For every combination of workers, booster threads (``nthread``) and CPU
+pinning, a ``bentoml serve`` process is started with the matching
+``CITIBIKE_*`` variables and a fixed request mix is replayed by closed-loop
+clients. The model is the ``:latest`` one of the BentoML store
+(``BENTOML_HOME``); ``--save-model`` stores a synthetic one first.
+
+    python -m benchmarks.bench_worker_scaling
+    python -m benchmarks.bench_worker_scaling --workers 1 2 4 --nthread 1 2 \\
+        --cpu-affinity "" auto --requests mix.jsonl
+"""
+
+import argparse
+import itertools
+import os
+import subprocess
+import time
+import requests
+from benchmarks.load_generator import HttpTarget, run_closed_loop
+from benchmarks.request_mix import default_request_mix, load_request_mix
+
+SERVICE_DIR = "deployment/bentoml"
+PORT = 3999
+STARTUP_TIMEOUT_SECONDS = 120
+
+
+def start_server(workers: int, nthread: int, cpu_affinity: str, port: int):
+    env = dict(
+        os.environ,
+        CITIBIKE_WORKERS=str(workers),
+        CITIBIKE_NTHREAD=str(nthread),
+        CITIBIKE_CPU_AFFINITY=cpu_affinity,
+        # Measure the model, not the cache
+        CITIBIKE_PREDICTION_CACHE_SIZE="0",
+    )
+    server = subprocess.Popen(
+        [
+            "bentoml",
+            "serve",
+            "service:CitibikeService",
+            "--port",
+            str(port),
+        ],
+        cwd=SERVICE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("bentoml serve exited during startup")
+        try:
+            if requests.get(f"{url}/readyz", timeout=1).ok:
+                return server, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    raise TimeoutError("bentoml serve didn't become ready")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--nthread", type=int, nargs="+", default=[1, 2])
+    parser.add_argument(
+        "--cpu-affinity", nargs="+", default=["", "auto"], dest="affinity"
+    )
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--requests", help="JSONL request mix")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument(
+        "--save-model",
+        action="store_true",
+        help="Save a synthetic model as the :latest one first",
+    )
+    args = parser.parse_args()
+
+    if args.save_model:
+        import bentoml
+        from benchmarks.service_utils import service
+        from tests.unit.conftest import make_model
+
+        bentoml.xgboost.save_model(service.MODEL_NAME, make_model())
+    request_mix = (
+        load_request_mix(args.requests)
+        if args.requests
+        else default_request_mix()
+    )
+
+    print(
+        f"{'workers':>7} {'nthread':>7} {'affinity':>8} {'p50 (ms)':>10} "
+        f"{'p99 (ms)':>10} {'req/s':>8} {'errors':>6}"
+    )
+    for workers, nthread, affinity in itertools.product(
+        args.workers, args.nthread, args.affinity
+    ):
+        server, url = start_server(workers, nthread, affinity, args.port)
+        target = HttpTarget(url)
+        try:
+            # Warm up the connections and every worker
+            run_closed_loop(target, request_mix, args.concurrency, 1.0)
+            report = run_closed_loop(
+                target, request_mix, args.concurrency, args.duration
+            )
+        finally:
+            server.terminate()
+            server.wait()
+        latency = report.get("latency_ms", {})
+        print(
+            f"{workers:>7} {nthread:>7} {affinity or 'none':>8} "
+            f"{latency.get('p50', float('nan')):>10.2f} "
+            f"{latency.get('p99', float('nan')):>10.2f} "
+            f"{report['throughput_rps']:>8.0f} {report['errors']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
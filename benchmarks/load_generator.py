@@ -0,0 +1,310 @@
+"""Replay a request mix against the service and report latency as JSON.
+
+Requests are sent either to a running service over HTTP (``--url``) or to
+an in-process ``CitibikeService`` instance (``--in-process``), and either
+open-loop at a target rate (``--qps``) or closed-loop by ``--concurrency``
+clients that send a new request as soon as the previous one is answered.
+In open-loop mode latencies are measured from the time a request was
+scheduled, so a slow service isn't hidden by clients that wait for it.
+
+The report holds the throughput, error rate, latency percentiles and a
+latency histogram, overall and per endpoint. ``--max-p99-ms`` and
+``--max-error-rate`` make the command fail when they are exceeded, so it
+can gate a deploy.
+
+    python -m benchmarks.load_generator --url http://localhost:3000 \\
+        --qps 50 --duration 30 --output load_report.json
+    python -m benchmarks.load_generator --in-process --concurrency 8 \\
+        --requests mix.jsonl --max-p99-ms 200
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import numpy as np
+import requests
+from benchmarks.request_mix import default_request_mix, load_request_mix
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+PERCENTILES = [50, 90, 99]
+
+
+class HttpTarget:
+    """POST requests to a running service, one session per thread."""
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def send(self, request: Dict) -> int:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        response = session.post(
+            f"{self.url}/{request['endpoint']}",
+            json=request["payload"],
+            timeout=self.timeout,
+        )
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class InProcessTarget:
+    """Call the endpoints of a ``CitibikeService`` instance directly.
+
+    Payloads are validated with the input models of the endpoints, like the
+    server does. Async endpoints run on a shared event loop thread, so
+    micro-batched requests from different clients share their batches.
+    """
+
+    def __init__(self, instance):
+        from benchmarks.service_utils import service
+
+        self.instance = instance
+        self.apis = service.CitibikeService.apis
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(
+            target=self._loop.run_forever, daemon=True
+        )
+        self._loop_thread.start()
+
+    def send(self, request: Dict) -> int:
+        api = self.apis[request["endpoint"]]
+        inputs = api.input_spec.model_validate(request["payload"])
+        result = getattr(self.instance, request["endpoint"])(
+            **{
+                name: getattr(inputs, name)
+                for name in type(inputs).model_fields
+            }
+        )
+        if asyncio.iscoroutine(result):
+            result = asyncio.run_coroutine_threadsafe(
+                result, self._loop
+            ).result()
+        return getattr(result, "status_code", 200)
+
+    def close(self):
+        # Stop the micro-batcher worker before its event loop
+        asyncio.run_coroutine_threadsafe(
+            self.instance.batcher.close(), self._loop
+        ).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+
+
+class LatencyRecorder:
+    """Thread-safe record of ``(endpoint, latency, ok)`` per request."""
+
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def send(self, target, request: Dict, started_at: float):
+        try:
+            ok = 200 <= target.send(request) < 300
+        except Exception:
+            ok = False
+        latency = time.perf_counter() - started_at
+        with self._lock:
+            self.records.append((request["endpoint"], latency, ok))
+
+
+def summarize_latencies(latencies: List[float], errors: int, elapsed: float):
+    latencies_ms = np.asarray(latencies) * 1000
+    count = len(latencies_ms)
+    summary = {
+        "requests": count,
+        "errors": errors,
+        "error_rate": errors / count if count else 0.0,
+        "throughput_rps": (count - errors) / elapsed if elapsed else 0.0,
+    }
+    if count:
+        summary["latency_ms"] = {
+            **{
+                f"p{q}": float(np.percentile(latencies_ms, q))
+                for q in PERCENTILES
+            },
+            "mean": float(latencies_ms.mean()),
+            "max": float(latencies_ms.max()),
+        }
+    bounds = LATENCY_BUCKETS_MS + [float("inf")]
+    counts = np.searchsorted(bounds, latencies_ms, side="left")
+    summary["histogram_ms"] = {
+        "bounds": LATENCY_BUCKETS_MS + ["inf"],
+        "counts": np.bincount(counts, minlength=len(bounds)).tolist(),
+    }
+    return summary
+
+
+def summarize(records, elapsed: float) -> Dict:
+    """Overall and per endpoint summary of the recorded requests.
+
+    Latencies include failed requests, which are also counted as errors.
+    """
+    report = summarize_latencies(
+        [latency for _, latency, _ in records],
+        sum(not ok for _, _, ok in records),
+        elapsed,
+    )
+    report["duration_seconds"] = elapsed
+    report["endpoints"] = {}
+    for endpoint in sorted({endpoint for endpoint, _, _ in records}):
+        endpoint_records = [r for r in records if r[0] == endpoint]
+        report["endpoints"][endpoint] = summarize_latencies(
+            [latency for _, latency, _ in endpoint_records],
+            sum(not ok for _, _, ok in endpoint_records),
+            elapsed,
+        )
+    return report
+
+
+def run_closed_loop(
+    target, request_mix: List[Dict], concurrency: int, duration: float
+) -> Dict:
+    """``concurrency`` clients cycle through the mix for ``duration``."""
+    recorder = LatencyRecorder()
+    stop_at = time.perf_counter() + duration
+
+    def client(offset: int):
+        for request in itertools.islice(
+            itertools.cycle(request_mix), offset, None
+        ):
+            started_at = time.perf_counter()
+            if started_at >= stop_at:
+                break
+            recorder.send(target, request, started_at)
+
+    threads = [
+        threading.Thread(target=client, args=(i,)) for i in range(concurrency)
+    ]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(recorder.records, time.perf_counter() - start_time)
+
+
+def run_open_loop(
+    target,
+    request_mix: List[Dict],
+    qps: float,
+    duration: float,
+    max_workers: int = 64,
+) -> Dict:
+    """Send the mix at ``qps`` requests per second for ``duration``.
+
+    Each request is scheduled at a fixed time and its latency counts from
+    then, including the time it waited for a free worker.
+    """
+    recorder = LatencyRecorder()
+    n_requests = max(1, int(qps * duration))
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for i, request in enumerate(
+            itertools.islice(itertools.cycle(request_mix), n_requests)
+        ):
+            scheduled_at = start_time + i / qps
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(recorder.send, target, request, scheduled_at)
+    return summarize(recorder.records, time.perf_counter() - start_time)
+
+
+def check_thresholds(
+    report: Dict,
+    max_p99_ms: Optional[float] = None,
+    max_error_rate: Optional[float] = None,
+) -> List[str]:
+    """Return the thresholds exceeded by ``report``, if any."""
+    failures = []
+    p99 = report.get("latency_ms", {}).get("p99", float("inf"))
+    if max_p99_ms is not None and p99 > max_p99_ms:
+        failures.append(f"p99 {p99:.1f}ms > {max_p99_ms}ms")
+    if max_error_rate is not None and report["error_rate"] > max_error_rate:
+        failures.append(
+            f"error rate {report['error_rate']:.4f} > {max_error_rate}"
+        )
+    return failures
+
+
+def make_in_process_target(synthetic_model: bool) -> InProcessTarget:
+    if synthetic_model:
+        from tests.unit.conftest import make_service
+
+        return InProcessTarget(make_service())
+    from benchmarks.service_utils import service
+
+    # Loads the :latest model of the BentoML store like the server
+    return InProcessTarget(service.CitibikeService.inner())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target_group = parser.add_mutually_exclusive_group(required=True)
+    target_group.add_argument("--url", help="Base URL of the service")
+    target_group.add_argument("--in-process", action="store_true")
+    parser.add_argument(
+        "--synthetic-model",
+        action="store_true",
+        help="In-process only: use a synthetic model instead of :latest",
+    )
+    load_group = parser.add_mutually_exclusive_group()
+    load_group.add_argument("--qps", type=float)
+    load_group.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--requests", help="JSONL request mix")
+    parser.add_argument("--output", help="JSON report path, stdout if unset")
+    parser.add_argument("--max-p99-ms", type=float)
+    parser.add_argument("--max-error-rate", type=float)
+    args = parser.parse_args()
+
+    request_mix = (
+        load_request_mix(args.requests)
+        if args.requests
+        else default_request_mix()
+    )
+    target = (
+        HttpTarget(args.url)
+        if args.url
+        else make_in_process_target(args.synthetic_model)
+    )
+    try:
+        if args.qps:
+            report = run_open_loop(
+                target, request_mix, args.qps, args.duration
+            )
+            report["mode"] = {"open_loop_qps": args.qps}
+        else:
+            report = run_closed_loop(
+                target, request_mix, args.concurrency, args.duration
+            )
+            report["mode"] = {"closed_loop_concurrency": args.concurrency}
+    finally:
+        target.close()
+
+    failures = check_thresholds(report, args.max_p99_ms, args.max_error_rate)
+    report["failures"] = failures
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if failures:
+        sys.exit(f"Load test failed: {'; '.join(failures)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Request mixes replayed by the service benchmarks.
+
+A request mix is a JSONL file with one request per line::
+
+    {"endpoint": "predict", "payload": {"input_data": [...]}}
+    {"endpoint": "predict_trip", "payload": {"input_data": [...]}}
+
+Without a file the mix is built from the sample payloads of ``data/test``
+plus ``predict_trip`` requests of several sizes.
+"""
+
+import datetime
+import glob
+import json
+from typing import Dict, List
+import numpy as np
+
+SAMPLE_PAYLOADS = "data/test/data-00*.json"
+TRIP_BATCH_SIZES = [1, 1, 1, 24, 24, 168]
+
+# Features missing from the samples, which predate the SNOW feature
+DEFAULT_FEATURES = {"SNOW": 0.0}
+
+
+def read_sample_payload(path: str) -> Dict:
+    """Read a ``data/test`` sample as a ``predict`` payload.
+
+    The samples list their rows under ``instances`` and lack ``SNOW``.
+    """
+    with open(path) as f:
+        sample = json.load(f)
+    rows = sample.get("input_data", sample.get("instances"))
+    return {"input_data": [{**DEFAULT_FEATURES, **row} for row in rows]}
+
+
+def make_trip_payload(batch_size: int, rng: np.random.Generator) -> Dict:
+    start = datetime.datetime(2025, 1, 1)
+    return {
+        "input_data": [
+            {
+                "date": (
+                    start + datetime.timedelta(hours=int(hour))
+                ).isoformat(),
+                "TMAX": round(float(rng.normal(60, 15)), 1),
+                "TMIN": round(float(rng.normal(45, 15)), 1),
+                "SNOW": round(float(rng.exponential(0.1)), 2),
+            }
+            for hour in rng.integers(0, 24 * 365, batch_size)
+        ]
+    }
+
+
+def default_request_mix(random_state: int = 42) -> List[Dict]:
+    rng = np.random.default_rng(random_state)
+    requests = [
+        {"endpoint": "predict", "payload": read_sample_payload(path)}
+        for path in sorted(glob.glob(SAMPLE_PAYLOADS))
+    ]
+    requests.extend(
+        {"endpoint": "predict_trip", "payload": make_trip_payload(size, rng)}
+        for size in TRIP_BATCH_SIZES
+    )
+    return requests
+
+
+def load_request_mix(path: str) -> List[Dict]:
+    """Read a JSONL request mix, see the module docstring."""
+    requests = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            if "endpoint" not in request or "payload" not in request:
+                raise ValueError(
+                    f"{path}:{line_number} is not a request, expected the "
+                    "keys 'endpoint' and 'payload'"
+                )
+            requests.append(request)
+    return requests
+
+
+def save_request_mix(requests: List[Dict], path: str):
+    with open(path, "w") as f:
+        for request in requests:
+            f.write(json.dumps(request) + "\n")
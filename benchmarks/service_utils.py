@@ -0,0 +1,17 @@
+"""Import the BentoML service module for the benchmarks.
+
+The model and service factories are shared with the unit tests, see
+``tests/unit/conftest.py``.
+"""
+
+import os
+import sys
+
+SERVICE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "deployment",
+    "bentoml",
+)
+sys.path.insert(0, SERVICE_DIR)
+
+import service  # noqa: E402, F401
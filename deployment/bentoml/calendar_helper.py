@@ -0,0 +1 @@
+../../utils/calendar_helper.py
\ No newline at end of file
@@ -0,0 +1,124 @@
+"""Adaptive micro-batching of concurrent prediction requests."""
+
+import asyncio
+import time
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_MAX_BATCH_SIZE = 256
+DEFAULT_MAX_LATENCY_MS = 5.0
+
+
+class MicroBatcher:
+    """Coalesce concurrent requests into a single call of ``predict_fn``.
+
+    Each request submits a 2D array of feature rows. The batcher waits for
+    the first pending request and keeps collecting requests until the batch
+    holds ``max_batch_size`` rows or ``max_latency_ms`` have passed since
+    the first one was queued. The rows are stacked, ``predict_fn`` is called
+    once in a worker thread and the predictions are split back per request.
+
+    Args:
+        predict_fn: Callable mapping an ``(n, k)`` array to ``n`` predictions.
+        max_batch_size: Maximum number of rows of a batch. A single request
+            with more rows than this is predicted on its own.
+        max_latency_ms: Maximum time a request waits for others to join.
+        on_batch: Optional callback called with the realized batch size
+            (rows) and the queue time (seconds) of each request of the batch.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_latency_ms: float = DEFAULT_MAX_LATENCY_MS,
+        on_batch: Optional[Callable[[int, List[float]], None]] = None,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if max_latency_ms < 0:
+            raise ValueError("max_latency_ms can't be negative")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000
+        self.on_batch = on_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # Request that didn't fit in the previous batch
+        self._carry = None
+
+    async def submit(self, features: np.ndarray) -> np.ndarray:
+        """Queue ``features`` and wait for their predictions."""
+        if self._worker is None or self._worker.done():
+            # The queue and worker are bound to the server's event loop
+            self._queue = asyncio.Queue()
+            self._carry = None
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((features, future, time.perf_counter()))
+        return await future
+
+    async def close(self):
+        """Stop the background worker."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future, float]]:
+        if self._carry is not None:
+            pending, self._carry = [self._carry], None
+        else:
+            pending = [await self._queue.get()]
+        n_rows = len(pending[0][0])
+        deadline = pending[0][2] + self.max_latency
+        while n_rows < self.max_batch_size:
+            # Take what is already queued before waiting for more
+            if self._queue.empty():
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self._queue.get_nowait()
+            if n_rows + len(item[0]) > self.max_batch_size:
+                # Leave it for the next batch
+                self._carry = item
+                break
+            pending.append(item)
+            n_rows += len(item[0])
+        return pending
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            dispatched = time.perf_counter()
+            features = [item[0] for item in batch]
+            try:
+                preds = await asyncio.to_thread(
+                    self.predict_fn, np.concatenate(features)
+                )
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            if self.on_batch is not None:
+                self.on_batch(
+                    len(preds),
+                    [dispatched - enqueued for _, _, enqueued in batch],
+                )
+            offsets = np.cumsum([len(f) for f in features])[:-1]
+            for (_, future, _), request_preds in zip(
+                batch, np.split(preds, offsets)
+            ):
+                if not future.done():
+                    future.set_result(request_preds)
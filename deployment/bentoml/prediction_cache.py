@@ -0,0 +1,118 @@
+"""In-process LRU/TTL cache of model predictions."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+
+DEFAULT_MAX_SIZE = 10_000
+DEFAULT_TTL_SECONDS = 300.0
+
+
+class PredictionCache:
+    """Cache the prediction of each feature row.
+
+    Rows are keyed on the model version and the exact float32 bytes of the
+    feature vector, the precision the trees compare features at, so a cached
+    prediction is always the one the model would return. Entries expire
+    ``ttl_seconds`` after being stored and the least recently used ones are
+    evicted when the cache holds more than ``max_size`` rows. A ``max_size``
+    of 0 disables the cache.
+
+    Args:
+        max_size: Maximum number of cached rows.
+        ttl_seconds: Time to live of an entry.
+        on_lookup: Optional callback called after each lookup with the
+            number of hits, misses and evictions of that lookup.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_SIZE,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        on_lookup: Optional[Callable[[int, int, int], None]] = None,
+    ):
+        if max_size < 0:
+            raise ValueError("max_size can't be negative")
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.on_lookup = on_lookup
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def row_keys(self, features: np.ndarray) -> List[bytes]:
+        """Hashable keys of the rows of ``features`` as float32."""
+        # Adding 0.0 turns -0.0 into 0.0 so both share a key
+        exact = np.ascontiguousarray(features, dtype=np.float32) + 0.0
+        return [row.tobytes() for row in exact]
+
+    def predict(
+        self,
+        features: np.ndarray,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        model_version: Hashable,
+    ) -> np.ndarray:
+        """Predict ``features``, calling ``predict_fn`` only for cache misses.
+
+        The missing rows are predicted together in a single call.
+        """
+        if self.max_size == 0:
+            return predict_fn(features)
+
+        keys = [(model_version, key) for key in self.row_keys(features)]
+        preds = np.empty(len(keys), dtype=np.float32)
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    preds[i] = entry[1]
+                else:
+                    missing.append(i)
+
+        evictions = 0
+        if missing:
+            missing_preds = predict_fn(features[missing])
+            preds[missing] = missing_preds
+            expires_at = time.monotonic() + self.ttl_seconds
+            with self._lock:
+                for i, pred in zip(missing, missing_preds.tolist()):
+                    self._entries[keys[i]] = (expires_at, pred)
+                    self._entries.move_to_end(keys[i])
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    evictions += 1
+
+        hits = len(keys) - len(missing)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(missing)
+            self.evictions += evictions
+        if self.on_lookup is not None:
+            self.on_lookup(hits, len(missing), evictions)
+        return preds
+
+    def invalidate(self):
+        """Drop every cached prediction."""
+        with self._lock:
+            self._entries.clear()
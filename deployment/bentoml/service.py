@@ -1,49 +1,462 @@
+import startup
 import bentoml
-import pandas as pd
 import numpy as np
+import io
 import os
+import json
+import logging
 import datetime
-import holidays
-from bentoml.models import BentoModel
+import time
+import operator
+import itertools
+from calendar_helper import (
+    CYCLICAL_FEATURE_COLUMNS,
+    get_calendar_table,
+    get_holiday_cache,
+)
+from micro_batcher import (
+    DEFAULT_MAX_BATCH_SIZE,
+    DEFAULT_MAX_LATENCY_MS,
+    MicroBatcher,
+)
+from prediction_cache import (
+    DEFAULT_MAX_SIZE,
+    DEFAULT_TTL_SECONDS,
+    PredictionCache,
+)
+from tree_helper import CompiledTreeEnsemble
+from worker_config import pin_worker, worker_cpus
+from bentoml.exceptions import InvalidArgument
+from _bentoml_sdk.io_models import IORootModel
+from prometheus_client import Counter, Gauge, Histogram
 from pydantic import BaseModel, Field
-from bentoml.io import JSON
-from typing import List
+from starlette.responses import Response
+from pathlib import Path
+from typing import Dict, List, Tuple
 
-path = "."
-dir_list = os.listdir(path)
-print(dir_list)
+# pandas, pyarrow and the BentoML model store are imported lazily, where they
+# are used, so importing the service stays fast when containers scale out
+
+logger = logging.getLogger("bentoml.citibike")
 
 MODEL_NAME = "xgb-citibike-reg-model"
+WEATHER_FEATURE_COLUMNS = ["TMAX", "TMIN", "SNOW"]
+MODEL_FEATURE_COLUMNS = (
+    ["holiday"] + WEATHER_FEATURE_COLUMNS + CYCLICAL_FEATURE_COLUMNS
+)
+
+# Column layout of the processed datasets, i.e.
+# DATASET_NUMERICAL_COLUMNS + DATASET_CATEGORICAL_COLUMNS
+COLUMNAR_FEATURE_COLUMNS = (
+    WEATHER_FEATURE_COLUMNS + CYCLICAL_FEATURE_COLUMNS + ["holiday"]
+)
+COLUMNAR_TO_MODEL_INDEX = [
+    COLUMNAR_FEATURE_COLUMNS.index(column) for column in MODEL_FEATURE_COLUMNS
+]
+ARROW_FILE_MEDIA_TYPE = "application/vnd.apache.arrow.file"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+NPY_MEDIA_TYPE = "application/x-npy"
+
+# Fetches the model features of a request record in model order
+get_record_features = operator.itemgetter(*MODEL_FEATURE_COLUMNS)
+
+# Micro-batching of the *_batched endpoints
+MAX_BATCH_SIZE = int(
+    os.environ.get("CITIBIKE_MAX_BATCH_SIZE", DEFAULT_MAX_BATCH_SIZE)
+)
+MAX_LATENCY_MS = float(
+    os.environ.get("CITIBIKE_MAX_LATENCY_MS", DEFAULT_MAX_LATENCY_MS)
+)
+
+batch_size_histogram = Histogram(
+    name="citibike_batch_size",
+    documentation="Rows predicted per coalesced booster call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048),
+)
+queue_time_histogram = Histogram(
+    name="citibike_batch_queue_seconds",
+    documentation="Time a request waits in the micro-batching queue",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+
+def observe_batch(batch_size: int, queue_times: List[float]):
+    batch_size_histogram.observe(batch_size)
+    for queue_time in queue_times:
+        queue_time_histogram.observe(queue_time)
+
+
+# Prediction cache in front of the model
+PREDICTION_CACHE_SIZE = int(
+    os.environ.get("CITIBIKE_PREDICTION_CACHE_SIZE", DEFAULT_MAX_SIZE)
+)
+PREDICTION_CACHE_TTL_SECONDS = float(
+    os.environ.get(
+        "CITIBIKE_PREDICTION_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS
+    )
+)
+# How often the model store is checked for a new :latest model
+MODEL_CHECK_INTERVAL_SECONDS = float(
+    os.environ.get("CITIBIKE_MODEL_CHECK_INTERVAL_SECONDS", 60)
+)
+# "xgboost" or "compiled" (flattened trees evaluated with numpy)
+PREDICTION_BACKEND = os.environ.get("CITIBIKE_PREDICTION_BACKEND", "xgboost")
+PREDICTION_BACKENDS = ["xgboost", "compiled"]
+# Rows sent through each endpoint before serving, 0 disables the warmup
+WARMUP_ROWS = int(os.environ.get("CITIBIKE_WARMUP_ROWS", 32))
+# Worker processes, booster threads per worker and CPU pinning ("", "auto"
+# or a CPU list like "0-7"), see worker_config
+WORKERS = int(os.environ.get("CITIBIKE_WORKERS", 1))
+NTHREAD = int(os.environ.get("CITIBIKE_NTHREAD", 2))
+CPU_AFFINITY = os.environ.get("CITIBIKE_CPU_AFFINITY", "")
+
+startup_seconds_gauge = Gauge(
+    name="citibike_startup_seconds",
+    documentation="Duration of each startup phase of the service",
+    labelnames=["phase"],
+    multiprocess_mode="mostrecent",
+)
+cache_lookups_counter = Counter(
+    name="citibike_prediction_cache_lookups",
+    documentation="Rows looked up in the prediction cache",
+    labelnames=["result"],
+)
+cache_evictions_counter = Counter(
+    name="citibike_prediction_cache_evictions",
+    documentation="Rows evicted from the prediction cache",
+)
+cache_hit_ratio_gauge = Gauge(
+    name="citibike_prediction_cache_hit_ratio",
+    documentation="Share of rows served from the prediction cache",
+    multiprocess_mode="mostrecent",
+)
+
+
+def to_days(dates: List[datetime.date]) -> np.ndarray:
+    """Convert dates or datetimes to ``datetime64[D]`` (local day)."""
+    return np.array(
+        [datetime.date(date.year, date.month, date.day) for date in dates],
+        dtype="datetime64[D]",
+    )
 
 
 def is_holiday(date: datetime.date) -> int:
     """Función para determinar si un día es festivo o no en función del año de la fecha"""
-    # Obtenemos los días festivos del año de la fecha proporcionada
-    us_holidays = holidays.US(years=date.year)
-    return 1 if date in us_holidays else 0
+    # Consultamos la caché de festivos compartida por todo el proceso
+    return get_holiday_cache().is_holiday(date)
 
 
 def get_datetime_features(trip_dt: datetime.date):
-    return {
-        "hr_sin": np.sin(trip_dt.hour * (2.0 * np.pi / 24)),
-        "hr_cos": np.cos(trip_dt.hour * (2.0 * np.pi / 24)),
-        "weekday_sin": np.sin(trip_dt.weekday() * (2.0 * np.pi / 7)),
-        "weekday_cos": np.cos(trip_dt.weekday() * (2.0 * np.pi / 7)),
-        "week_sin": np.sin((trip_dt.isocalendar()[1] - 1) * (2 * np.pi / 52)),
-        "week_cos": np.cos((trip_dt.isocalendar()[1] - 1) * (2 * np.pi / 52)),
-        "mnth_sin": np.sin((trip_dt.month - 1) * (2.0 * np.pi / 12)),
-        "mnth_cos": np.cos((trip_dt.month - 1) * (2.0 * np.pi / 12)),
-    }
+    features = get_calendar_table().lookup(to_days([trip_dt]), [trip_dt.hour])
+    return dict(zip(CYCLICAL_FEATURE_COLUMNS, features[0].tolist()))
+
+
+def build_trip_matrix(
+    dates: List[datetime.datetime],
+    tmax: List[float],
+    tmin: List[float],
+    snow: List[float],
+) -> np.ndarray:
+    """Compute the model features of a batch of trips in one pass.
+
+    Returns a float64 matrix with the columns in ``MODEL_FEATURE_COLUMNS``
+    order.
+    """
+    timestamps = np.asarray(dates, dtype="datetime64[h]")
+    days = timestamps.astype("datetime64[D]")
+    hours = (timestamps - days).astype("int64")
+
+    calendar_table = get_calendar_table()
+    features = np.empty((len(days), len(MODEL_FEATURE_COLUMNS)))
+    features[:, 0] = calendar_table.lookup_holidays(days)
+    features[:, 1] = np.asarray(tmax, dtype="float64")
+    features[:, 2] = np.asarray(tmin, dtype="float64")
+    features[:, 3] = np.asarray(snow, dtype="float64")
+    calendar_table.lookup(days, hours, out=features[:, 4:])
+    return features
+
+
+def build_trip_features(
+    dates: List[datetime.datetime],
+    tmax: List[float],
+    tmin: List[float],
+    snow: List[float],
+):
+    """``build_trip_matrix`` as a DataFrame of the model features."""
+    import pandas as pd
+
+    features = pd.DataFrame(
+        build_trip_matrix(dates, tmax, tmin, snow),
+        columns=MODEL_FEATURE_COLUMNS,
+    )
+    return features.astype({"holiday": "int64"})
+
+
+def build_input_features(input_data: List[BaseModel]) -> np.ndarray:
+    """Stack prepared inputs as rows in ``MODEL_FEATURE_COLUMNS`` order."""
+    return np.array(
+        [
+            [getattr(item, column) for column in MODEL_FEATURE_COLUMNS]
+            for item in input_data
+        ],
+        dtype="float64",
+    ).reshape(-1, len(MODEL_FEATURE_COLUMNS))
+
+
+def decode_input_features(records: List[Dict[str, float]]) -> np.ndarray:
+    """Decode the ``input_data`` records into a float32 matrix.
+
+    The records are plain dicts parsed by pydantic-core, so no Pydantic
+    objects or DataFrame are built. The values are written straight into a
+    C-contiguous matrix with the columns in ``MODEL_FEATURE_COLUMNS`` order.
+    """
+    try:
+        features = np.fromiter(
+            itertools.chain.from_iterable(map(get_record_features, records)),
+            dtype=np.float32,
+            count=len(records) * len(MODEL_FEATURE_COLUMNS),
+        )
+    except (KeyError, ValueError) as e:
+        raise InvalidArgument(f"Invalid input_data: {e!r}") from e
+    return features.reshape(-1, len(MODEL_FEATURE_COLUMNS))
+
+
+def encode_predictions(preds: np.ndarray) -> bytes:
+    """Serialize predictions as a single JSON list."""
+    return json.dumps(
+        {"model": MODEL_NAME, "predictions": preds.tolist()}
+    ).encode()
+
+
+class EncodedPredictions(BaseModel):
+    """Schema of the body written by ``encode_predictions``."""
+
+    model: str
+    predictions: List[float]
+
+
+class ColumnarPredictions(IORootModel[Path]):
+    """Schema of the file written by ``encode_columnar_predictions``.
+
+    BentoML has no public descriptor for binary answers; this one is what
+    it infers for a ``Path`` return.
+    """
+
+
+def read_columnar_features(path: Path) -> Tuple[np.ndarray, str]:
+    """Read a columnar payload into a float32 matrix in model order.
+
+    The payload is either an Arrow IPC file or stream with one column per
+    feature, or a ``.npy`` array of shape ``(n, 12)`` whose columns follow
+    ``COLUMNAR_FEATURE_COLUMNS``. Returns the matrix and the media type of
+    the payload, used to answer in the same format.
+    """
+    import pyarrow as pa
+
+    with open(path, "rb") as f:
+        magic = f.read(6)
+    try:
+        if magic == b"\x93NUMPY":
+            columnar = np.load(path, allow_pickle=False)
+            if columnar.ndim != 2 or columnar.shape[1] != len(
+                COLUMNAR_FEATURE_COLUMNS
+            ):
+                raise ValueError(
+                    f"Expected an (n, {len(COLUMNAR_FEATURE_COLUMNS)}) "
+                    f"array, got {columnar.shape}"
+                )
+            features = columnar[:, COLUMNAR_TO_MODEL_INDEX]
+            return features.astype(np.float32, copy=False), NPY_MEDIA_TYPE
+
+        if magic == b"ARROW1":
+            media_type, open_reader = ARROW_FILE_MEDIA_TYPE, pa.ipc.open_file
+        else:
+            media_type, open_reader = (
+                ARROW_STREAM_MEDIA_TYPE,
+                pa.ipc.open_stream,
+            )
+        with pa.memory_map(str(path)) as source:
+            table = open_reader(source).read_all()
+            features = np.empty(
+                (table.num_rows, len(MODEL_FEATURE_COLUMNS)), dtype=np.float32
+            )
+            for i, column in enumerate(MODEL_FEATURE_COLUMNS):
+                features[:, i] = table.column(column).to_numpy()
+        return features, media_type
+    except (KeyError, ValueError, pa.ArrowException) as e:
+        raise InvalidArgument(f"Invalid columnar payload: {e!r}") from e
+
+
+def encode_columnar_predictions(preds: np.ndarray, media_type: str) -> bytes:
+    """Serialize predictions in the format of the columnar request."""
+    import pyarrow as pa
+
+    preds = np.asarray(preds, dtype=np.float32)
+    if media_type == NPY_MEDIA_TYPE:
+        buffer = io.BytesIO()
+        np.save(buffer, preds, allow_pickle=False)
+        return buffer.getvalue()
+
+    table = pa.table({"prediction": preds})
+    sink = pa.BufferOutputStream()
+    if media_type == ARROW_FILE_MEDIA_TYPE:
+        writer = pa.ipc.new_file(sink, table.schema)
+    else:
+        writer = pa.ipc.new_stream(sink, table.schema)
+    with writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def check_feature_names(feature_names: List[str]):
+    """The service passes matrices, so the model must use its column order."""
+    if feature_names not in (None, MODEL_FEATURE_COLUMNS):
+        raise ValueError(
+            f"The model features {feature_names} don't "
+            f"match {MODEL_FEATURE_COLUMNS}"
+        )
+
+
+def compile_model(model) -> CompiledTreeEnsemble:
+    """Export the trees of ``model`` for the compiled backend."""
+    compiled_model = CompiledTreeEnsemble.from_model(model)
+    check_feature_names(compiled_model.feature_names)
+    return compiled_model
+
+
+def make_warmup_inputs(n_rows: int) -> Tuple[List[BaseModel], List[BaseModel]]:
+    """Synthetic ``predict`` and ``predict_trip`` inputs for the warmup."""
+    start = datetime.datetime.combine(datetime.date.today(), datetime.time())
+    dates = [start + datetime.timedelta(hours=hour) for hour in range(n_rows)]
+    raw_inputs = [
+        CitibikeService.inner.CitibikeRawInput(
+            date=date, TMAX=70.0, TMIN=55.0, SNOW=0.0
+        )
+        for date in dates
+    ]
+    features = build_trip_matrix(
+        dates, [70.0] * n_rows, [55.0] * n_rows, [0.0] * n_rows
+    )
+    inputs = [
+        CitibikeService.inner.CitibikeInput(
+            **dict(zip(MODEL_FEATURE_COLUMNS, row), holiday=int(row[0]))
+        )
+        for row in features.tolist()
+    ]
+    return inputs, raw_inputs
 
 
 @bentoml.service(
-    resources={"cpu": "2"},
+    workers=WORKERS,
+    resources={"cpu": str(WORKERS * NTHREAD)},
     traffic={"timeout": 10},
 )
 class CitibikeService:
 
     def __init__(self):
-        self.model = bentoml.xgboost.load_model(f"{MODEL_NAME}:latest")
+        if PREDICTION_BACKEND not in PREDICTION_BACKENDS:
+            raise ValueError(
+                f"Unknown prediction backend {PREDICTION_BACKEND}, "
+                f"expected one of {PREDICTION_BACKENDS}"
+            )
+        self.backend = PREDICTION_BACKEND
+        self.model_check_interval = MODEL_CHECK_INTERVAL_SECONDS
+        # Each worker gets its own booster threads (and CPUs when pinned)
+        self.nthread = NTHREAD
+        self.worker_cpus = worker_cpus(
+            bentoml.server_context.worker_index or 1, NTHREAD, CPU_AFFINITY
+        )
+        pin_worker(self.worker_cpus)
+        self.batcher = MicroBatcher(
+            self.predict_features,
+            max_batch_size=MAX_BATCH_SIZE,
+            max_latency_ms=MAX_LATENCY_MS,
+            on_batch=observe_batch,
+        )
+
+        timer = startup.StartupTimer()
+        timer.record("import", IMPORT_SECONDS)
+        with timer.phase("load"):
+            self.load_model(bentoml.models.get(f"{MODEL_NAME}:latest"))
+        with timer.phase("calendar"):
+            # Build the calendar table and holidays before the first request
+            get_calendar_table()
+            current_year = datetime.date.today().year
+            get_holiday_cache().warm_up(
+                range(current_year - 1, current_year + 2)
+            )
+        with timer.phase("warmup"):
+            # Synthetic rows aren't cached, the cache is created afterwards
+            self.prediction_cache = PredictionCache(max_size=0)
+            self.warm_up(WARMUP_ROWS)
+        self.prediction_cache = PredictionCache(
+            max_size=PREDICTION_CACHE_SIZE,
+            ttl_seconds=PREDICTION_CACHE_TTL_SECONDS,
+            on_lookup=self.observe_cache_lookup,
+        )
+
+        self.startup_timings = timer.timings
+        for phase, seconds in timer.timings.items():
+            startup_seconds_gauge.labels(phase=phase).set(seconds)
+        logger.info(
+            "CitibikeService started with %d booster threads on CPUs %s: %s",
+            self.nthread,
+            self.worker_cpus or "any",
+            timer.report(),
+        )
+
+    def warm_up(self, n_rows: int):
+        """Send ``n_rows`` synthetic rows through the prediction paths."""
+        if n_rows <= 0:
+            return
+        inputs, raw_inputs = make_warmup_inputs(n_rows)
+        self.predict(inputs)
+        self.predict_trip(raw_inputs)
+        self.predict_matrix(build_input_features(inputs).astype(np.float32))
+
+    def load_model(self, bento_model):
+        self.model = bentoml.xgboost.load_model(bento_model)
+        check_feature_names(self.model.get_booster().feature_names)
+        self.model.set_params(n_jobs=self.nthread)
+        self.compiled_model = None
+        if self.backend == "compiled":
+            self.compiled_model = compile_model(self.model)
+        self.model_version = bento_model.tag.version
+        self.model_checked_at = time.monotonic()
+
+    def refresh_model(self):
+        """Reload the model when the ``:latest`` tag points to a new one."""
+        if (
+            time.monotonic() - self.model_checked_at
+            < self.model_check_interval
+        ):
+            return
+        self.model_checked_at = time.monotonic()
+        bento_model = bentoml.models.get(f"{MODEL_NAME}:latest")
+        if bento_model.tag.version != self.model_version:
+            self.load_model(bento_model)
+            # Las predicciones del modelo anterior ya no son válidas
+            self.prediction_cache.invalidate()
+
+    def observe_cache_lookup(self, hits: int, misses: int, evictions: int):
+        cache_lookups_counter.labels(result="hit").inc(hits)
+        cache_lookups_counter.labels(result="miss").inc(misses)
+        cache_evictions_counter.inc(evictions)
+        cache_hit_ratio_gauge.set(self.prediction_cache.stats["hit_ratio"])
+
+    def predict_matrix(self, features: np.ndarray) -> np.ndarray:
+        """Predict a matrix whose columns follow ``MODEL_FEATURE_COLUMNS``."""
+        if self.compiled_model is not None:
+            return self.compiled_model.predict(features)
+        # The regressor predicts numpy arrays in place and honours
+        # best_iteration
+        return self.model.predict(features)
+
+    def predict_features(self, features: np.ndarray) -> np.ndarray:
+        self.refresh_model()
+        return self.prediction_cache.predict(
+            features, self.predict_matrix, self.model_version
+        )
 
     class CitibikeRawInput(BaseModel):
         date: datetime.datetime
@@ -68,16 +481,8 @@ class CitibikeService:
 
     @bentoml.api()
     def predict(self, input_data: List[CitibikeInput]) -> dict:
-        # Convertimos la lista de objetos Pydantic a una lista de dicts
-        input_dicts = [item.dict() for item in input_data]
-        print(input_dicts[0])
-
-        # Convertimos a DataFrame
-        df = pd.DataFrame(input_dicts)
-        print(df.head(1))
-
         # Predicción
-        preds = self.model.predict(df)
+        preds = self.predict_features(build_input_features(input_data))
 
         predictions = [
             {"model": MODEL_NAME, "prediction": pred}
@@ -87,24 +492,67 @@ class CitibikeService:
 
     @bentoml.api()
     def predict_trip(self, input_data: List[CitibikeRawInput]) -> dict:
-        input_dicts = [item.dict() for item in input_data]
-        pro_input_dicts = []
-        for item in input_dicts:
-            data = {
-                "holiday": is_holiday(item["date"]),
-                "TMAX": item["TMAX"],
-                "TMIN": item["TMIN"],
-                "SNOW": item["SNOW"],
-            }
-            data = data | get_datetime_features(item["date"])
-            pro_input_dicts.append(data)
-        print(input_dicts[0])
-        df = pd.DataFrame(pro_input_dicts)
-        print(input_dicts[0])
-        print(df.columns)
-        preds = self.model.predict(df)
+        # Local wall-clock time, like the hours of the training data
+        features = build_trip_matrix(
+            dates=[item.date.replace(tzinfo=None) for item in input_data],
+            tmax=[item.TMAX for item in input_data],
+            tmin=[item.TMIN for item in input_data],
+            snow=[item.SNOW for item in input_data],
+        )
+        preds = self.predict_features(features)
+        predictions = [
+            {"model": MODEL_NAME, "prediction": pred}
+            for pred in preds.tolist()
+        ]
+        return {"predictions": predictions}
+
+    @bentoml.api()
+    async def predict_batched(self, input_data: List[CitibikeInput]) -> dict:
+        # Concurrent requests share a single booster call
+        preds = await self.batcher.submit(build_input_features(input_data))
         predictions = [
             {"model": MODEL_NAME, "prediction": pred}
             for pred in preds.tolist()
         ]
         return {"predictions": predictions}
+
+    @bentoml.api()
+    async def predict_trip_batched(
+        self, input_data: List[CitibikeRawInput]
+    ) -> dict:
+        features = build_trip_matrix(
+            dates=[item.date.replace(tzinfo=None) for item in input_data],
+            tmax=[item.TMAX for item in input_data],
+            tmin=[item.TMIN for item in input_data],
+            snow=[item.SNOW for item in input_data],
+        )
+        preds = await self.batcher.submit(features)
+        predictions = [
+            {"model": MODEL_NAME, "prediction": pred}
+            for pred in preds.tolist()
+        ]
+        return {"predictions": predictions}
+
+    @bentoml.api(output_spec=EncodedPredictions)
+    def predict_fast(self, input_data: List[Dict[str, float]]) -> Response:
+        # Same body as /predict, decoded without Pydantic models or pandas
+        features = decode_input_features(input_data)
+        self.refresh_model()
+        preds = self.predict_matrix(features)
+        return Response(
+            encode_predictions(preds), media_type="application/json"
+        )
+
+    @bentoml.api(output_spec=ColumnarPredictions)
+    def predict_columnar(self, payload: Path) -> Response:
+        # Arrow IPC or .npy upload, answered in the same format
+        features, media_type = read_columnar_features(payload)
+        self.refresh_model()
+        preds = self.predict_matrix(features)
+        return Response(
+            encode_columnar_predictions(preds, media_type),
+            media_type=media_type,
+        )
+
+
+IMPORT_SECONDS = time.perf_counter() - startup.IMPORT_STARTED_AT
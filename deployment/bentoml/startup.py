@@ -0,0 +1,35 @@
+"""Startup timings of the BentoML service.
+
+``service.py`` imports this module before anything else, so
+``IMPORT_STARTED_AT`` marks the start of the service imports.
+"""
+
+import contextlib
+import time
+from typing import Dict
+
+IMPORT_STARTED_AT = time.perf_counter()
+
+
+class StartupTimer:
+    """Collect the duration of each startup phase, in seconds."""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    def record(self, phase: str, seconds: float):
+        self.timings[phase] = seconds
+
+    @contextlib.contextmanager
+    def phase(self, phase: str):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - started_at)
+
+    def report(self) -> str:
+        return ", ".join(
+            f"{phase} {seconds:.3f}s"
+            for phase, seconds in self.timings.items()
+        )
@@ -0,0 +1 @@
+../../utils/tree_helper.py
\ No newline at end of file
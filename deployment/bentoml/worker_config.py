@@ -0,0 +1,66 @@
+"""Process and thread layout of the BentoML service workers.
+
+Each worker process runs its own booster. Without coordination every
+booster uses all the cores of the machine, so ``workers`` processes end up
+running ``workers * cores`` threads. The layout gives each worker
+``nthread`` booster threads and, optionally, pins it to its own cores.
+"""
+
+import os
+from typing import List, Optional
+
+
+def parse_cpu_list(cpu_list: str) -> List[int]:
+    """Parse a Linux style CPU list, e.g. ``"0-3,8,10-11"``."""
+    cpus = []
+    for part in cpu_list.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def available_cpus() -> List[int]:
+    """CPUs the current process may run on."""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        # sched_getaffinity is only available on Linux
+        return list(range(os.cpu_count() or 1))
+
+
+def worker_cpus(
+    worker_index: int,
+    nthread: int,
+    cpu_affinity: str,
+    cpus: Optional[List[int]] = None,
+) -> Optional[List[int]]:
+    """CPUs a worker is pinned to, ``None`` when pinning is disabled.
+
+    Args:
+        worker_index: Index of the worker, starting at 1 like BentoML's.
+        nthread: Booster threads of each worker, i.e. CPUs per worker.
+        cpu_affinity: ``""`` disables pinning, ``"auto"`` splits the
+            available CPUs and a CPU list (``"0-7"``) splits those CPUs.
+            Workers get consecutive blocks of ``nthread`` CPUs, wrapping
+            around when there are more workers than blocks.
+        cpus: Available CPUs, the affinity of the process by default.
+    """
+    if not cpu_affinity:
+        return None
+    if cpu_affinity != "auto":
+        cpus = parse_cpu_list(cpu_affinity)
+    elif cpus is None:
+        cpus = available_cpus()
+    if not cpus:
+        raise ValueError(f"No CPUs to pin to in {cpu_affinity!r}")
+    start = (worker_index - 1) * nthread
+    return sorted({cpus[(start + i) % len(cpus)] for i in range(nthread)})
+
+
+def pin_worker(worker_cpus: Optional[List[int]]):
+    """Restrict the current process to ``worker_cpus``."""
+    if worker_cpus is not None:
+        os.sched_setaffinity(0, worker_cpus)
@@ -0,0 +1 @@
+from .arrow_materializer import ArrowDataFrameMaterializer
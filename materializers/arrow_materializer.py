@@ -0,0 +1,55 @@
+"""Materializer storing pandas data frames as Arrow IPC files."""
+
+import os
+import shutil
+from typing import Any, ClassVar, Tuple, Type
+import pandas as pd
+import pyarrow as pa
+from zenml.enums import ArtifactType
+from zenml.materializers.base_materializer import BaseMaterializer
+from zenml.logger import get_logger
+
+logger = get_logger(__name__)
+
+ARROW_FILENAME = "df.arrow"
+
+
+class ArrowDataFrameMaterializer(BaseMaterializer):
+    """Feature store materializer for the preprocessed data frames.
+
+    The data frame is written once as an uncompressed Arrow IPC (Feather v2)
+    file. Downstream steps memory-map the file, so numeric columns are
+    backed by the page cache instead of a private pandas copy. When the
+    artifact store is remote the file is first copied to a local temporary
+    directory.
+
+    Loaded columns are read-only: steps must assign new columns instead of
+    modifying the loaded ones in place.
+    """
+
+    ASSOCIATED_TYPES: ClassVar[Tuple[Type[Any], ...]] = (pd.DataFrame,)
+    ASSOCIATED_ARTIFACT_TYPE: ClassVar[ArtifactType] = ArtifactType.DATA
+
+    def load(self, data_type: Type[Any]) -> pd.DataFrame:
+        data_path = os.path.join(self.uri, ARROW_FILENAME)
+        if not os.path.exists(data_path):
+            with self.get_temporary_directory(delete_at_exit=False) as tmp:
+                local_path = os.path.join(tmp, ARROW_FILENAME)
+                with self.artifact_store.open(data_path, mode="rb") as source:
+                    with open(local_path, "wb") as target:
+                        shutil.copyfileobj(source, target)
+            data_path = local_path
+
+        # The buffers keep the mapping alive after the reader is gone
+        source = pa.memory_map(data_path, "r")
+        table = pa.ipc.open_file(source).read_all()
+        logger.debug(f"Memory mapped {data_path}: {table.nbytes} bytes")
+
+        return table.to_pandas(split_blocks=True)
+
+    def save(self, df: pd.DataFrame) -> None:
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        data_path = os.path.join(self.uri, ARROW_FILENAME)
+        with self.artifact_store.open(data_path, mode="wb") as target:
+            with pa.ipc.new_file(target, table.schema) as writer:
+                writer.write_table(table)
@@ -1,3 +1,4 @@
+from typing import Optional
 import datetime
 from zenml import pipeline
 from zenml.logger import get_logger
@@ -8,12 +9,14 @@ from steps.data_validator import (
 )
 from steps import (
     reference_data_loader,
+    reference_profile_loader,
     get_model_by_alias,
     data_preprocessor,
     citibike_data_drift_report,
     inference_predict,
     calculate_drift_metrics_step,
     create_table_step,
+    incremental_window_range_step,
     save_metrics_to_db_step,
 )
 
@@ -32,6 +35,25 @@ def batch_monitoring_backfill(
     end_reference_date: str,
     start_current_date: str,
     end_current_date: str,
+    fetch_max_workers: int = 1,
+    cache_dir: Optional[str] = None,
+    cache_max_size_mb: int = 1024,
+    cache_offline: bool = False,
+    lean_preprocessing: bool = False,
+    downcast_weather: bool = False,
+    prediction_backend: str = "xgboost",
+    prediction_chunk_size: int = 0,
+    prediction_max_workers: int = 1,
+    drift_max_workers: int = 1,
+    drift_engine: str = "evidently",
+    window_granularity: str = "week",
+    window_size: int = 1,
+    window_step: int = 1,
+    metrics_write_mode: str = "upsert",
+    metrics_batch_size: int = 1000,
+    incremental: bool = False,
+    incremental_lookback_windows: int = 1,
+    reference_profile_dir: Optional[str] = None,
 ):
     logger.info("Starting monitoring")
     logger.info(
@@ -57,6 +79,24 @@ def batch_monitoring_backfill(
     # Read
     create_table_step(host=host, port=port, database=database)
 
+    # Incremental: only load the windows after the last stored one, plus the
+    # last ones to check whether they changed. The range is queried when the
+    # run executes, so scheduled runs move forward
+    stored_hashes = None
+    if incremental:
+        start_current_date, stored_hashes = incremental_window_range_step(
+            host=host,
+            port=port,
+            database=database,
+            start_current_date=start_current_date,
+            end_current_date=end_current_date,
+            window_granularity=window_granularity,
+            window_size=window_size,
+            window_step=window_step,
+            lookback_windows=incremental_lookback_windows,
+            after=["create_table_step"],
+        )
+
     # Get model
     model = get_model_by_alias(
         model_name=model_name,
@@ -64,32 +104,78 @@ def batch_monitoring_backfill(
         after=["create_table_step"],
     )
 
+    # Reference: scored data and profile from the store, computed only when
+    # the model, the dates or the features changed
+    reference_profile = None
+    if reference_profile_dir:
+        reference_data, reference_profile = reference_profile_loader(
+            model=model,
+            base_url=data_url,
+            start_reference_date=start_reference_date,
+            end_reference_date=end_reference_date,
+            profile_dir=reference_profile_dir,
+            categorical_feats=DATASET_CATEGORICAL_COLUMNS,
+            numerical_feats=DATASET_NUMERICAL_COLUMNS,
+            fetch_max_workers=fetch_max_workers,
+            cache_dir=cache_dir,
+            cache_max_size_mb=cache_max_size_mb,
+            cache_offline=cache_offline,
+            lean_preprocessing=lean_preprocessing,
+            downcast_weather=downcast_weather,
+            prediction_backend=prediction_backend,
+            prediction_chunk_size=prediction_chunk_size,
+            prediction_max_workers=prediction_max_workers,
+        )
+
     # Retrieve
-    reference_data, comparison_data, target_col = reference_data_loader(
+    raw_reference_data, comparison_data, target_col = reference_data_loader(
         base_url=data_url,
         start_reference_date=start_reference_date,
         end_reference_date=end_reference_date,
         start_current_date=start_current_date,
         end_current_date=end_current_date,
+        fetch_max_workers=fetch_max_workers,
+        cache_dir=cache_dir,
+        cache_max_size_mb=cache_max_size_mb,
+        cache_offline=cache_offline,
+        load_reference=not reference_profile_dir,
         after=["get_model_by_alias"],
     )
 
     # Clean
-    reference_data = data_preprocessor(reference_data, is_reference=True)
-    comparison_data = data_preprocessor(comparison_data, is_reference=True)
+    if not reference_profile_dir:
+        reference_data = data_preprocessor(
+            raw_reference_data,
+            is_reference=True,
+            lean=lean_preprocessing,
+            downcast_weather=downcast_weather,
+        )
+    comparison_data = data_preprocessor(
+        comparison_data,
+        is_reference=True,
+        lean=lean_preprocessing,
+        downcast_weather=downcast_weather,
+    )
 
     # Inference
-    reference_data, _ = inference_predict(
-        model=model,
-        dataset_inf=reference_data,
-        categorical_feats=DATASET_CATEGORICAL_COLUMNS,
-        numerical_feats=DATASET_NUMERICAL_COLUMNS,
-    )
+    if not reference_profile_dir:
+        reference_data, _ = inference_predict(
+            model=model,
+            dataset_inf=reference_data,
+            categorical_feats=DATASET_CATEGORICAL_COLUMNS,
+            numerical_feats=DATASET_NUMERICAL_COLUMNS,
+            backend=prediction_backend,
+            chunk_size=prediction_chunk_size,
+            max_workers=prediction_max_workers,
+        )
     comparison_data, prediction_col = inference_predict(
         model=model,
         dataset_inf=comparison_data,
         categorical_feats=DATASET_CATEGORICAL_COLUMNS,
         numerical_feats=DATASET_NUMERICAL_COLUMNS,
+        backend=prediction_backend,
+        chunk_size=prediction_chunk_size,
+        max_workers=prediction_max_workers,
     )
 
     json_report, html_report = citibike_data_drift_report(
@@ -105,10 +191,23 @@ def batch_monitoring_backfill(
         prediction=prediction_col,
         categorical_feats=DATASET_CATEGORICAL_COLUMNS,
         numerical_feats=DATASET_NUMERICAL_COLUMNS,
+        max_workers=drift_max_workers,
+        engine=drift_engine,
+        window_granularity=window_granularity,
+        window_size=window_size,
+        window_step=window_step,
+        stored_hashes=stored_hashes,
+        reference_profile=reference_profile,
     )
 
     save_metrics_to_db_step(
-        host=host, port=port, database=database, metrics=metrics
+        host=host,
+        port=port,
+        database=database,
+        metrics=metrics,
+        write_mode=metrics_write_mode,
+        batch_size=metrics_batch_size,
+        window_granularity=window_granularity,
     )
 
     logger.info("End monitoring")
@@ -0,0 +1,15 @@
+from typing import Optional
+from zenml import pipeline
+from zenml.logger import get_logger
+from steps import data_partitioner
+
+logger = get_logger(__name__)
+
+
+@pipeline
+def citibike_data_partitioning_pipeline(
+    data_dir: str = "data/processed",
+    output_dir: Optional[str] = None,
+):
+    logger.info(f"Partitioning datasets of {data_dir} by month")
+    data_partitioner(data_dir=data_dir, output_dir=output_dir)
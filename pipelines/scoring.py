@@ -0,0 +1,42 @@
+import datetime
+from zenml import pipeline
+from zenml.logger import get_logger
+from steps import get_model_by_alias, batch_scorer
+
+logger = get_logger(__name__)
+
+
+@pipeline
+def citibike_batch_scoring_pipeline(
+    data_url: str,
+    model_name: str,
+    model_alias: str,
+    start_date: str,
+    end_date: str,
+    output_dir: str,
+    chunk_freq: str = "MS",
+    max_workers: int = 1,
+    lean_preprocessing: bool = False,
+    downcast_weather: bool = False,
+    prediction_backend: str = "xgboost",
+):
+    logger.info(
+        f"Scoring {start_date} to {end_date} with {model_name}@{model_alias}"
+    )
+    start_date = datetime.datetime.strptime(start_date, "%Y-%m-%d")
+    end_date = datetime.datetime.strptime(end_date, "%Y-%m-%d")
+
+    model = get_model_by_alias(model_name=model_name, model_alias=model_alias)
+
+    batch_scorer(
+        model=model,
+        base_url=data_url,
+        start_date=start_date,
+        end_date=end_date,
+        output_dir=output_dir,
+        chunk_freq=chunk_freq,
+        max_workers=max_workers,
+        lean_preprocessing=lean_preprocessing,
+        downcast_weather=downcast_weather,
+        prediction_backend=prediction_backend,
+    )
@@ -34,6 +34,12 @@ def citibike_training_pipeline(
     n_trials: int = 50,
     registered_model_name: str = "xgb-citibike-reg-model",
     threshold: float = 0.1,
+    fetch_max_workers: int = 1,
+    cache_dir: Optional[str] = None,
+    cache_max_size_mb: int = 1024,
+    cache_offline: bool = False,
+    lean_preprocessing: bool = False,
+    downcast_weather: bool = False,
 ):
     logger.info("train pipeline")
     logger.info(
@@ -45,7 +51,13 @@ def citibike_training_pipeline(
     ########## ETL stage ##########
     # Load dataset
     raw_data, target = data_loader(
-        base_url=data_url, start_date=start_train_date, end_date=end_train_date
+        base_url=data_url,
+        start_date=start_train_date,
+        end_date=end_train_date,
+        fetch_max_workers=fetch_max_workers,
+        cache_dir=cache_dir,
+        cache_max_size_mb=cache_max_size_mb,
+        cache_offline=cache_offline,
     )
 
     # Split data
@@ -57,8 +69,12 @@ def citibike_training_pipeline(
     )
 
     # Preprocess data
-    train = data_preprocessor(train)
-    test = data_preprocessor(test)
+    train = data_preprocessor(
+        train, lean=lean_preprocessing, downcast_weather=downcast_weather
+    )
+    test = data_preprocessor(
+        test, lean=lean_preprocessing, downcast_weather=downcast_weather
+    )
 
     ########## validation data stage ##########
 
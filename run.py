@@ -7,6 +7,8 @@ from pipelines.deployment import (
     local_citibike_deployment_pipeline,
 )
 from pipelines.monitoring import batch_monitoring_backfill
+from pipelines.partitioning import citibike_data_partitioning_pipeline
+from pipelines.scoring import citibike_batch_scoring_pipeline
 from zenml.logger import get_logger
 
 logger = get_logger(__name__)
@@ -23,6 +25,8 @@ TRAINING_PIPELINE_NAME = "training"
 MLFLOW_DEPLOYMENT_PIPELINE_NAME = "deploy-mlflow"
 BENTOML_DEPLOYMENT_PIPELINE_NAME = "deploy-bentoml"
 MONITORING_DEPLOYMENT_PIPELINE_NAME = "monitoring"
+PARTITIONING_PIPELINE_NAME = "partitioning"
+SCORING_PIPELINE_NAME = "score"
 
 
 @click.command(context_settings=dict(help_option_names=["-h", "--help"]))
@@ -88,6 +92,24 @@ def main(
         monitor_config = pipelines_config[pipeline]["parameters"]
         logger.info(monitor_config)
         batch_monitoring_backfill(**monitor_config)
+
+    elif pipeline == PARTITIONING_PIPELINE_NAME:
+        logger.info(f"Runing {pipeline} ...")
+        assert "parameters" in pipelines_config.get(
+            pipeline, {}
+        ), f"Don't found '{pipeline}' config"
+        partitioning_config = pipelines_config[pipeline]["parameters"]
+        logger.info(partitioning_config)
+        citibike_data_partitioning_pipeline(**partitioning_config)
+
+    elif pipeline == SCORING_PIPELINE_NAME:
+        logger.info(f"Runing {pipeline} ...")
+        assert "parameters" in pipelines_config.get(
+            pipeline, {}
+        ), f"Don't found '{pipeline}' config"
+        scoring_config = pipelines_config[pipeline]["parameters"]
+        logger.info(scoring_config)
+        citibike_batch_scoring_pipeline(**scoring_config)
     else:
         raise f"Don't recognize command {pipeline}"
 
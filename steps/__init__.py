@@ -5,6 +5,8 @@ from .data_loaders import (
     reference_data_loader,
 )
 
+from .data_partitioner import data_partitioner
+
 from .data_validator import citibike_data_report, citibike_data_test
 
 from .hpo_tuner import optimize_hyperparams
@@ -25,8 +27,12 @@ from .model_validator import citibike_data_drift_report
 
 from .inference_predict import inference_predict
 
+from .batch_scorer import batch_scorer
+
 from .model_monitor import (
     calculate_drift_metrics_step,
     create_table_step,
+    incremental_window_range_step,
+    reference_profile_loader,
     save_metrics_to_db_step,
 )
@@ -0,0 +1,227 @@
+"""Offline scoring of a date range of the processed datasets."""
+
+import datetime
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+import xgboost as xgb
+from typing_extensions import Annotated
+from zenml import step
+from zenml.logger import get_logger
+
+from steps.data_loaders import (
+    DATASET_CATEGORICAL_COLUMNS,
+    DATASET_NUMERICAL_COLUMNS,
+    DATASET_TARGET_COLUMN_NAME,
+    build_modeling_data,
+    data_preprocessor,
+    load_data_by_years,
+)
+from steps.inference_predict import inference_predict
+
+logger = get_logger(__name__)
+
+# Model and settings of the current scoring process, see ``init_scorer``
+_scorer: Dict = {}
+
+
+def split_date_range(
+    start_date: datetime.date, end_date: datetime.date, chunk_freq: str = "MS"
+) -> List[Tuple[datetime.date, datetime.date]]:
+    """Split ``[start_date, end_date]`` at every ``chunk_freq`` boundary.
+
+    Args:
+        start_date: First day (inclusive).
+        end_date: Last day (inclusive).
+        chunk_freq: Pandas frequency whose periods start a new chunk, e.g.
+            ``"MS"`` (months), ``"W-MON"`` (weeks) or ``"D"`` (days).
+
+    Returns:
+        The ``(first day, last day)`` of every chunk, in order.
+    """
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    starts = pd.date_range(start, end, freq=chunk_freq, normalize=True)
+    starts = starts[starts > start].insert(0, start)
+    ends = list(starts[1:] - pd.Timedelta(days=1)) + [end]
+    return [(s.date(), e.date()) for s, e in zip(starts, ends)]
+
+
+def init_scorer(model: xgb.XGBRegressor, settings: Dict):
+    """Keep the model and settings of the scoring process.
+
+    With ``settings["n_jobs"]`` the booster threads are set on the model of
+    this process, a copy in worker processes.
+    """
+    if settings.get("n_jobs"):
+        model.set_params(n_jobs=settings["n_jobs"])
+    _scorer["model"] = model
+    _scorer["settings"] = settings
+
+
+def clear_date_range(
+    output_dir: str, start_date: datetime.date, end_date: datetime.date
+) -> int:
+    """Drop the rows of ``[start_date, end_date]`` from previous part files.
+
+    Parts only holding rows of the range are removed and the others keep
+    their rows outside of it, so rescoring a range, even with another
+    ``chunk_freq``, doesn't leave stale predictions behind.
+
+    Returns:
+        The number of rows dropped.
+    """
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date) + pd.Timedelta(days=1)
+    dropped = 0
+    pattern = os.path.join(output_dir, "year=*", "month=*", "part-*.parquet")
+    for path in sorted(glob.glob(pattern)):
+        datetimes = pd.read_parquet(path, columns=["datetime"])["datetime"]
+        inside = ((datetimes >= start) & (datetimes < end)).to_numpy()
+        if inside.all():
+            os.remove(path)
+        elif inside.any():
+            part = pd.read_parquet(path)
+            part[~inside].to_parquet(path, index=False)
+        dropped += int(inside.sum())
+    return dropped
+
+
+def score_chunk(
+    chunk: Tuple[datetime.date, datetime.date],
+) -> Tuple[Optional[str], int]:
+    """Load, preprocess, predict and write the rows of one chunk.
+
+    Predictions are written under ``year=YYYY/month=MM`` of the output
+    directory, one ``part-<first day>-<last day>`` file per chunk, with the
+    ``datetime``, target and prediction columns.
+
+    Returns:
+        The path of the written file (``None`` when the chunk has no rows)
+        and its number of rows.
+    """
+    start_date, end_date = chunk
+    model, settings = _scorer["model"], _scorer["settings"]
+
+    trips_data_list, weather_data_list = load_data_by_years(
+        base_url=settings["base_url"],
+        years=list(range(start_date.year, end_date.year + 1)),
+        start_date=start_date,
+        end_date=end_date,
+    )
+    dataset = build_modeling_data(trips_data_list, weather_data_list)
+    if dataset.empty:
+        return None, 0
+
+    # Steps are called through their entrypoint: scoring processes don't
+    # run inside a step context
+    dataset = data_preprocessor.entrypoint(
+        dataset,
+        lean=settings["lean_preprocessing"],
+        downcast_weather=settings["downcast_weather"],
+    )
+    predictions, prediction_col = inference_predict.entrypoint(
+        model=model,
+        dataset_inf=dataset,
+        categorical_feats=DATASET_CATEGORICAL_COLUMNS,
+        numerical_feats=DATASET_NUMERICAL_COLUMNS,
+        backend=settings["prediction_backend"],
+    )
+
+    output = pd.DataFrame(
+        {
+            "datetime": predictions.index,
+            DATASET_TARGET_COLUMN_NAME: predictions[
+                DATASET_TARGET_COLUMN_NAME
+            ].to_numpy(),
+            prediction_col: predictions[prediction_col].to_numpy(),
+        }
+    )
+    partition_dir = os.path.join(
+        settings["output_dir"],
+        f"year={start_date.year}",
+        f"month={start_date.month:02d}",
+    )
+    os.makedirs(partition_dir, exist_ok=True)
+    path = os.path.join(
+        partition_dir, f"part-{start_date:%Y%m%d}-{end_date:%Y%m%d}.parquet"
+    )
+    output.to_parquet(path, index=False)
+    return path, len(output)
+
+
+@step(enable_cache=False)
+def batch_scorer(
+    model: xgb.XGBRegressor,
+    base_url: str,
+    start_date: datetime.date,
+    end_date: datetime.date,
+    output_dir: str,
+    chunk_freq: str = "MS",
+    max_workers: int = 1,
+    lean_preprocessing: bool = False,
+    downcast_weather: bool = False,
+    prediction_backend: str = "xgboost",
+) -> Annotated[List[str], "prediction_files"]:
+    """Score a date range chunk by chunk and write partitioned parquet.
+
+    Every chunk goes through ``data_preprocessor`` and ``inference_predict``
+    on its own and is written as soon as it is scored, so the memory used
+    depends on the chunk size and the number of workers, not on the date
+    range.
+
+    Args:
+        model: Model used to predict.
+        base_url: Base url of the processed datasets.
+        start_date: First day to score (inclusive).
+        end_date: Last day to score (inclusive).
+        output_dir: Directory of the ``year=/month=`` partitions.
+        chunk_freq: Pandas frequency the date range is split at.
+        max_workers: Processes scoring chunks at the same time, each with
+            ``cpu_count / max_workers`` booster threads. ``1`` scores the
+            chunks sequentially in the step process.
+        lean_preprocessing: ``lean`` option of ``data_preprocessor``.
+        downcast_weather: ``downcast_weather`` option of
+            ``data_preprocessor``.
+        prediction_backend: ``backend`` option of ``inference_predict``.
+
+    Returns:
+        The paths of the written files.
+    """
+    chunks = split_date_range(start_date, end_date, chunk_freq)
+    settings = {
+        "base_url": base_url,
+        "output_dir": output_dir,
+        "lean_preprocessing": lean_preprocessing,
+        "downcast_weather": downcast_weather,
+        "prediction_backend": prediction_backend,
+    }
+    logger.info(
+        f"Scoring {start_date} to {end_date} in {len(chunks)} chunks "
+        f"with {max_workers} workers into {output_dir}"
+    )
+    dropped = clear_date_range(output_dir, start_date, end_date)
+    if dropped:
+        logger.info(f"Dropped {dropped} previously scored rows of the range")
+
+    if max_workers <= 1:
+        init_scorer(model, settings)
+        results = [score_chunk(chunk) for chunk in chunks]
+    else:
+        # One booster thread per core across all the workers, set in each
+        # worker so the model of the step is left as it is
+        settings["n_jobs"] = max(1, (os.cpu_count() or 1) // max_workers)
+        with ProcessPoolExecutor(
+            max_workers=min(max_workers, len(chunks)),
+            initializer=init_scorer,
+            initargs=(model, settings),
+        ) as executor:
+            results = list(executor.map(score_chunk, chunks))
+
+    prediction_files = [path for path, _ in results if path is not None]
+    logger.info(
+        f"Scored {sum(rows for _, rows in results)} rows into "
+        f"{len(prediction_files)} files"
+    )
+    return prediction_files
@@ -1,17 +1,27 @@
 """Data loader steps for the Iris classification pipeline."""
 
 # import logging
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Union
 import time
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import datetime
 import pandas as pd
+import fsspec
+import pyarrow.dataset as ds
 
 # from sklearn.datasets import load_breast_cancer
 from sklearn.model_selection import train_test_split
 from typing_extensions import Annotated
 from zenml import step
 from zenml.logger import get_logger
+from materializers import ArrowDataFrameMaterializer
+from utils.cache_helper import DatasetCache
+from utils.calendar_helper import (
+    CYCLICAL_FEATURE_COLUMNS,
+    get_calendar_table,
+)
 
 logger = get_logger(__name__)
 
@@ -32,24 +42,210 @@ DATASET_NUMERICAL_COLUMNS = [
 ]  # numerical_features
 DATASET_CATEGORICAL_COLUMNS = ["holiday"]  # categorical_features
 
+TRIPS_DATE_COLUMN = "date"
+TRIPS_COLUMNS = [
+    TRIPS_DATE_COLUMN,
+    "hour",
+    DATASET_TARGET_COLUMN_NAME,
+    "holiday",
+]
+WEATHER_DATE_COLUMN = "DATE"
+WEATHER_FEATURE_COLUMNS = ["TMAX", "TMIN", "SNOW"]
+WEATHER_COLUMNS = [WEATHER_DATE_COLUMN] + WEATHER_FEATURE_COLUMNS
+
+
+def get_data_urls(base_url: str, year: int) -> Tuple[str, str]:
+    """Return the trips and weather parquet urls of a year."""
+    trip_url = base_url + "citibike/" + f"{year}-citibike-tripdata.parquet"
+    weather_url = base_url + "weather/" + f"{year}-weather.parquet"
+    return trip_url, weather_url
+
+
+def build_date_filter(
+    date_column: str,
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None,
+) -> Optional[ds.Expression]:
+    """Build the ``[start_date, end_date]`` filter on a date column.
+
+    Both bounds are inclusive and compared by day, like the filters on
+    ``index.date`` used by the monitoring loader.
+    """
+    date_filter = None
+    if start_date is not None:
+        date_filter = (
+            ds.field(date_column) >= pd.Timestamp(start_date).normalize()
+        )
+    if end_date is not None:
+        end_filter = ds.field(date_column) < pd.Timestamp(
+            end_date
+        ).normalize() + pd.Timedelta(days=1)
+        date_filter = (
+            end_filter if date_filter is None else date_filter & end_filter
+        )
+    return date_filter
+
+
+def read_data_url(
+    data_url: str,
+    columns: Optional[List[str]] = None,
+    date_column: Optional[str] = None,
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None,
+    cache: Optional[DatasetCache] = None,
+) -> pd.DataFrame:
+    """Read a parquet file pushing the column list and date range down.
 
-def load_data_by_year(base_url: str, year: int) -> Tuple[
+    The file is opened as a pyarrow dataset, so only the requested columns
+    are decoded and row groups whose statistics fall outside the date range
+    are skipped.
+
+    Args:
+        data_url: Url or local path of the parquet file.
+        columns: Columns to read. ``None`` reads all of them.
+        date_column: Column the date range applies to.
+        start_date: First day to keep (inclusive).
+        end_date: Last day to keep (inclusive).
+        cache: Local cache the remote file is read through.
+
+    Returns:
+        The filtered data.
+    """
+    if cache is not None:
+        # Keep the cached file until it is read, parallel fetches may evict
+        # it otherwise
+        with cache.pinned(data_url) as local_path:
+            return read_data_url(
+                local_path, columns, date_column, start_date, end_date
+            )
+    logger.info(f"Reading data from data url {data_url}...")
+    filesystem, path = fsspec.core.url_to_fs(data_url)
+    dataset = ds.dataset(path, filesystem=filesystem, format="parquet")
+    date_filter = (
+        build_date_filter(date_column, start_date, end_date)
+        if date_column
+        else None
+    )
+    return dataset.to_table(columns=columns, filter=date_filter).to_pandas()
+
+
+def load_data_by_year(
+    base_url: str,
+    year: int,
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None,
+) -> Tuple[
     Annotated[pd.DataFrame, "trips_data"],
     Annotated[pd.DataFrame, "weather_data"],
 ]:
-    # Read Trips data
-    i_trip_file = f"{year}-citibike-tripdata.parquet"
-    i_trip_url = base_url + "citibike/" + i_trip_file
-    logger.info(f"Reading data from data url {i_trip_url}...")
-    i_trips_data = pd.read_parquet(i_trip_url)
+    trips_data_list, weather_data_list = load_data_by_years(
+        base_url=base_url,
+        years=[year],
+        start_date=start_date,
+        end_date=end_date,
+    )
+    return trips_data_list[0], weather_data_list[0]
+
+
+def load_data_by_years(
+    base_url: str,
+    years: List[int],
+    max_workers: int = 1,
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None,
+    cache: Optional[DatasetCache] = None,
+) -> Tuple[
+    Annotated[List[pd.DataFrame], "trips_data_list"],
+    Annotated[List[pd.DataFrame], "weather_data_list"],
+]:
+    """Read the trips and weather files of several years.
 
-    # Read Weather data
-    i_weather_file = f"{year}-weather.parquet"
-    i_weather_url = base_url + "weather/" + i_weather_file
-    logger.info(f"Reading data from data url {i_weather_url}...")
-    i_weather_data = pd.read_parquet(i_weather_url)
+    Every (year, source) file is fetched by a bounded thread pool, so the
+    wall time is bounded by the slowest round-trip instead of their sum.
+    Results keep the order of ``years`` whatever the completion order.
 
-    return i_trips_data, i_weather_data
+    Args:
+        base_url: Base url of the processed datasets.
+        years: Years to read.
+        max_workers: Maximum number of files fetched at the same time.
+            ``1`` reads the files sequentially.
+        start_date: First day to read (inclusive).
+        end_date: Last day to read (inclusive).
+        cache: Local cache the remote files are read through.
+
+    Returns:
+        The trips and weather data frames, one per year.
+    """
+    read_trips = functools.partial(
+        read_data_url,
+        columns=TRIPS_COLUMNS,
+        date_column=TRIPS_DATE_COLUMN,
+        start_date=start_date,
+        end_date=end_date,
+        cache=cache,
+    )
+    read_weather = functools.partial(
+        read_data_url,
+        columns=WEATHER_COLUMNS,
+        date_column=WEATHER_DATE_COLUMN,
+        start_date=start_date,
+        end_date=end_date,
+        cache=cache,
+    )
+    read_tasks = []
+    for year in years:
+        trip_url, weather_url = get_data_urls(base_url=base_url, year=year)
+        read_tasks += [(read_trips, trip_url), (read_weather, weather_url)]
+
+    if max_workers <= 1:
+        data_frames = [read(data_url) for read, data_url in read_tasks]
+    else:
+        with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(read_tasks))
+        ) as executor:
+            data_frames = list(
+                executor.map(lambda task: task[0](task[1]), read_tasks)
+            )
+
+    return data_frames[0::2], data_frames[1::2]
+
+
+def build_datetime_index(
+    dates: pd.Series, hours: pd.Series
+) -> pd.DatetimeIndex:
+    """Combine a ``date`` column and an ``hour`` column into an hourly index.
+
+    The index is built with numpy datetime arithmetic over the whole column
+    instead of calling ``datetime.combine`` row by row.
+
+    Args:
+        dates: Dates of the trips (any time component is discarded).
+        hours: Hour of the day for every row.
+
+    Returns:
+        The hourly datetime index.
+    """
+    days = np.asarray(dates, dtype="datetime64[ns]").astype("datetime64[D]")
+    offsets = np.asarray(hours, dtype="int64").astype("timedelta64[h]")
+    return pd.DatetimeIndex((days + offsets).astype("datetime64[ns]"))
+
+
+def build_modeling_data(
+    trips_data_list: List[pd.DataFrame], weather_data_list: List[pd.DataFrame]
+) -> pd.DataFrame:
+    """Join the trips and weather of several years on an hourly index."""
+    # Concat data bu years
+    trips_data = pd.concat(trips_data_list, ignore_index=True)
+    weather_data = pd.concat(weather_data_list, ignore_index=True)
+
+    # Merge trips and weather data
+    modeling_data = trips_data.merge(
+        weather_data, how="inner", left_on="date", right_on="DATE"
+    )
+    modeling_data.index = build_datetime_index(
+        modeling_data["date"], modeling_data["hour"]
+    )
+    return modeling_data
 
 
 @step(enable_cache=False)
@@ -57,35 +253,36 @@ def data_loader(
     base_url: str,
     start_date: datetime.date,
     end_date: datetime.date,
+    fetch_max_workers: int = 1,
+    cache_dir: Optional[str] = None,
+    cache_max_size_mb: int = 1024,
+    cache_offline: bool = False,
 ) -> Tuple[Annotated[pd.DataFrame, "dataset"], Annotated[str, "target"]]:
     # ) -> Annotated[pd.DataFrame, "dataset"]:
     logger.info(f"Loading data from base_url {base_url}...")
     start_time = time.time()
 
-    trips_data_list = []
-    weather_data_list = []
-    for current_year in list(range(start_date.year, end_date.year + 1)):
-        # Read Trips data
-        i_trips_data, i_weather_data = load_data_by_year(
-            base_url=base_url, year=current_year
+    cache = None
+    if cache_dir:
+        cache = DatasetCache(
+            cache_dir=cache_dir,
+            max_size_bytes=cache_max_size_mb * 1024**2,
+            offline=cache_offline,
         )
-        trips_data_list.append(i_trips_data)
-        weather_data_list.append(i_weather_data)
-
-    # Concat data bu years
-    trips_data = pd.concat(trips_data_list, ignore_index=True)
-    weather_data = pd.concat(weather_data_list, ignore_index=True)
 
-    # Merge trips and weather data
-    modeling_data = trips_data.merge(
-        weather_data, how="inner", left_on="date", right_on="DATE"
-    )
-    modeling_data.index = modeling_data.apply(
-        lambda row: datetime.datetime.combine(
-            row.date.date(), datetime.time(row.hour)
-        ),
-        axis=1,
+    # Read Trips and Weather data
+    trips_data_list, weather_data_list = load_data_by_years(
+        base_url=base_url,
+        years=list(range(start_date.year, end_date.year + 1)),
+        max_workers=fetch_max_workers,
+        start_date=start_date,
+        end_date=end_date,
+        cache=cache,
     )
+    if cache is not None:
+        logger.info(f"Dataset cache {cache.cache_dir}: {cache.stats}")
+
+    modeling_data = build_modeling_data(trips_data_list, weather_data_list)
 
     # Print runing time
     end_time = time.time()
@@ -127,52 +324,90 @@ def data_splitter(
     return train, test
 
 
+def build_cyclical_features(
+    dates: pd.Series, hours: pd.Series, dtype: str = "float32"
+) -> np.ndarray:
+    """Look up the hour/weekday/ISO week/month sin-cos features.
+
+    The features come from the shared calendar table and are written
+    straight into one preallocated block, in the order of
+    ``CYCLICAL_FEATURE_COLUMNS``.
+
+    Args:
+        dates: Dates of the rows.
+        hours: Hour of the day of the rows.
+        dtype: Data type of the returned block.
+
+    Returns:
+        A ``(len(dates), 8)`` array with the cyclical features.
+    """
+    days = np.asarray(dates, dtype="datetime64[ns]").astype("datetime64[D]")
+    # Column-major so every feature is contiguous, like a pandas block
+    features = np.empty(
+        (len(days), len(CYCLICAL_FEATURE_COLUMNS)), dtype, order="F"
+    )
+    return get_calendar_table().lookup(days, hours, out=features)
+
+
+def downcast_weather_features(data: pd.DataFrame) -> pd.DataFrame:
+    for column in WEATHER_FEATURE_COLUMNS:
+        if column in data.columns:
+            data[column] = data[column].astype("float32")
+    return data
+
+
 @step(
     # enable_cache=False
+    output_materializers=ArrowDataFrameMaterializer,
 )
 def data_preprocessor(
-    dataset: pd.DataFrame, is_reference: bool = False
+    dataset: pd.DataFrame,
+    is_reference: bool = False,
+    lean: bool = False,
+    downcast_weather: bool = False,
 ) -> Annotated[pd.DataFrame, "clean_dataset"]:
-    # Copy
-    data = dataset.copy()
+    """Build the model features of the dataset.
 
-    # data['holiday'] = data['holiday'].map({1: 'Yes', 0: 'No'})
+    Args:
+        dataset: Trips and weather data with ``date`` and ``hour`` columns.
+        is_reference: Keep the ``datetime`` column for monitoring.
+        lean: Write the cyclical features as float32 in a single block,
+            without copying the dataset.
+        downcast_weather: Cast TMAX/TMIN/SNOW to float32.
 
-    # Create day of the week feature
-    data["weekday"] = data["date"].dt.dayofweek
+    Returns:
+        The dataset with the model features.
+    """
+    drop_columns = ["date", "hour", "DATE"]
+    if not is_reference and "datetime" in dataset.columns:
+        drop_columns = drop_columns + ["datetime"]
 
-    # Create day of the year feature
-    data["week_num"] = data["date"].dt.isocalendar().week
+    if lean:
+        features = pd.DataFrame(
+            build_cyclical_features(dataset["date"], dataset["hour"]),
+            columns=CYCLICAL_FEATURE_COLUMNS,
+            index=dataset.index,
+        )
+        data = pd.concat(
+            [dataset.drop(columns=drop_columns), features], axis=1
+        )
+        return downcast_weather_features(data) if downcast_weather else data
+
+    # Copy
+    data = dataset.copy()
 
-    # Create month number column
-    data["mnth"] = data["date"].dt.month
+    # data['holiday'] = data['holiday'].map({1: 'Yes', 0: 'No'})
 
     # New Features
-    data["hr_sin"] = np.sin(data.hour * (2.0 * np.pi / 24))
-    data["hr_cos"] = np.cos(data.hour * (2.0 * np.pi / 24))
-    data["weekday_sin"] = np.sin(data.weekday * (2.0 * np.pi / 7))
-    data["weekday_cos"] = np.cos(data.weekday * (2.0 * np.pi / 7))
-    data["week_sin"] = np.sin((data.week_num - 1) * (2 * np.pi / 52))
-    data["week_cos"] = np.cos((data.week_num - 1) * (2 * np.pi / 52))
-    data["mnth_sin"] = np.sin((data.mnth - 1) * (2.0 * np.pi / 12))
-    data["mnth_cos"] = np.cos((data.mnth - 1) * (2.0 * np.pi / 12))
-
-    data["week_sin"] = data["week_sin"].astype("float64")
-    data["week_cos"] = data["week_cos"].astype("float64")
+    data[CYCLICAL_FEATURE_COLUMNS] = build_cyclical_features(
+        data["date"], data["hour"], dtype="float64"
+    )
 
     # drop 'Start Station Name' y 'End Station Name' colums
     # Drop columns
-    drop_columns = [
-        "date",
-        "hour",
-        "weekday",
-        "mnth",
-        "week_num",
-        "DATE",
-    ]
-    if not is_reference and "datetime" in data.columns:
-        drop_columns = drop_columns + ["datetime"]
     data = data.drop(columns=drop_columns)
+    if downcast_weather:
+        data = downcast_weather_features(data)
 
     logger.debug(f"data: {data.dtypes}")
 
@@ -184,8 +419,13 @@ def reference_data_loader(
     base_url: str,
     start_reference_date: datetime.date,
     end_reference_date: datetime.date,
-    start_current_date: datetime.date,
+    start_current_date: Union[datetime.date, str],
     end_current_date: datetime.date,
+    fetch_max_workers: int = 1,
+    cache_dir: Optional[str] = None,
+    cache_max_size_mb: int = 1024,
+    cache_offline: bool = False,
+    load_reference: bool = True,
 ) -> Tuple[
     Annotated[pd.DataFrame, "reference_data"],
     Annotated[pd.DataFrame, "comparison_data"],
@@ -195,27 +435,33 @@ def reference_data_loader(
 ]:
     logger.info(f"Loading data from base_url {base_url}...")
     start_time = time.time()
-
-    reference_data, target = data_loader(
-        base_url=base_url,
-        start_date=start_reference_date,
-        end_date=end_reference_date,
-    )
-    reference_data = reference_data[
-        (reference_data.index.date >= start_reference_date)
-        & (reference_data.index.date <= end_reference_date)
-    ]
-    logger.info(f"reference_data: {reference_data.shape}")
+    # ISO 8601 when it comes from incremental_window_range_step
+    start_current_date = pd.Timestamp(start_current_date).to_pydatetime()
+
+    # Without load_reference the reference data comes from elsewhere, e.g.
+    # the reference profile store of the monitoring pipeline
+    reference_data = pd.DataFrame()
+    if load_reference:
+        reference_data, target = data_loader(
+            base_url=base_url,
+            start_date=start_reference_date,
+            end_date=end_reference_date,
+            fetch_max_workers=fetch_max_workers,
+            cache_dir=cache_dir,
+            cache_max_size_mb=cache_max_size_mb,
+            cache_offline=cache_offline,
+        )
+        logger.info(f"reference_data: {reference_data.shape}")
 
     comparison_data, target = data_loader(
         base_url=base_url,
         start_date=start_current_date,
         end_date=end_current_date,
+        fetch_max_workers=fetch_max_workers,
+        cache_dir=cache_dir,
+        cache_max_size_mb=cache_max_size_mb,
+        cache_offline=cache_offline,
     )
-    comparison_data = comparison_data[
-        (comparison_data.index.date >= start_current_date)
-        & (comparison_data.index.date <= end_current_date)
-    ]
     logger.info(f"reference_data: {comparison_data.shape}")
 
     # Print runing time
@@ -0,0 +1,92 @@
+"""Steps that lay out the processed parquet files for date pruning."""
+
+import os
+from typing import List, Optional
+import numpy as np
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from typing_extensions import Annotated
+from zenml import step
+from zenml.logger import get_logger
+
+from steps.data_loaders import TRIPS_DATE_COLUMN, WEATHER_DATE_COLUMN
+
+logger = get_logger(__name__)
+
+# Processed sub directory and its date column
+DATASET_DATE_COLUMNS = {
+    "citibike": TRIPS_DATE_COLUMN,
+    "weather": WEATHER_DATE_COLUMN,
+}
+
+
+def write_parquet_by_month(
+    source_path: str, target_path: str, date_column: str
+) -> int:
+    """Rewrite a parquet file with one row group per calendar month.
+
+    Rows are sorted by ``date_column`` so every row group carries tight
+    min/max statistics and a date filter can skip whole months.
+
+    Args:
+        source_path: Parquet file to read.
+        target_path: Parquet file to write. It may be ``source_path``.
+        date_column: Date column used to sort and split the rows.
+
+    Returns:
+        The number of row groups written.
+    """
+    table = pq.read_table(source_path).sort_by(date_column)
+    months = pc.strftime(table[date_column], format="%Y-%m").to_numpy(
+        zero_copy_only=False
+    )
+    # Offsets where a new month starts (the table is sorted)
+    boundaries = [0] + list(np.flatnonzero(months[1:] != months[:-1]) + 1)
+    boundaries.append(len(months))
+
+    tmp_path = target_path + ".tmp"
+    with pq.ParquetWriter(tmp_path, table.schema) as writer:
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            writer.write_table(
+                table.slice(start, end - start), row_group_size=end - start
+            )
+    os.replace(tmp_path, target_path)
+
+    return len(boundaries) - 1
+
+
+@step(enable_cache=False)
+def data_partitioner(
+    data_dir: str = "data/processed",
+    output_dir: Optional[str] = None,
+) -> Annotated[List[str], "partitioned_files"]:
+    """Rewrite the processed datasets with row groups partitioned by month.
+
+    Args:
+        data_dir: Local directory with the ``citibike`` and ``weather``
+            processed parquet files.
+        output_dir: Directory where the files are written. Defaults to
+            ``data_dir`` (files are rewritten in place).
+
+    Returns:
+        The paths of the rewritten files.
+    """
+    output_dir = output_dir or data_dir
+    partitioned_files = []
+    for source, date_column in DATASET_DATE_COLUMNS.items():
+        source_dir = os.path.join(data_dir, source)
+        target_dir = os.path.join(output_dir, source)
+        os.makedirs(target_dir, exist_ok=True)
+        for file_name in sorted(os.listdir(source_dir)):
+            if not file_name.endswith(".parquet"):
+                continue
+            target_path = os.path.join(target_dir, file_name)
+            num_row_groups = write_parquet_by_month(
+                source_path=os.path.join(source_dir, file_name),
+                target_path=target_path,
+                date_column=date_column,
+            )
+            logger.info(f"{target_path}: {num_row_groups} row groups")
+            partitioned_files.append(target_path)
+
+    return partitioned_files
@@ -1,4 +1,7 @@
-from typing_extensions import Tuple, Annotated, List
+from typing_extensions import Tuple, Annotated, Iterator, List
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import xgboost as xgb
 import pandas as pd
 from zenml import step
@@ -7,20 +10,36 @@ from zenml.integrations.mlflow.services.mlflow_deployment import (
 )
 from zenml.logger import get_logger
 
+from materializers import ArrowDataFrameMaterializer
 from steps.data_loaders import DATASET_PREDICTION_COLUMN_NAME
+from utils.tree_helper import CompiledTreeEnsemble
 
 logger = get_logger(__name__)
 
 
-@step
+def iter_chunks(
+    dataset: pd.DataFrame, columns: List[str], chunk_size: int
+) -> Iterator[Tuple[slice, pd.DataFrame]]:
+    """Yield the ``columns`` of consecutive ``chunk_size`` rows of the dataset.
+
+    Only one chunk of features is copied at a time.
+    """
+    for start in range(0, len(dataset), chunk_size):
+        rows = slice(start, start + chunk_size)
+        yield rows, dataset.iloc[rows][columns]
+
+
+@step(output_materializers={"predictions": ArrowDataFrameMaterializer})
 def inference_predict(
     model: xgb.XGBRegressor,
     dataset_inf: pd.DataFrame,
     categorical_feats: List[str] = [],
-	numerical_feats: List[str] = []
+    numerical_feats: List[str] = [],
+    backend: str = "xgboost",
+    chunk_size: int = 0,
+    max_workers: int = 1,
 ) -> Tuple[
-    Annotated[pd.DataFrame, "predictions"],
-    Annotated[str, "prediction"]
+    Annotated[pd.DataFrame, "predictions"], Annotated[str, "prediction"]
 ]:
     """Predictions step.
 
@@ -36,16 +55,69 @@ def inference_predict(
 
     Args:
         dataset_inf: The inference dataset.
+        backend: "xgboost" predicts with the model, "compiled" exports its
+            trees to a ``CompiledTreeEnsemble`` and evaluates them with numpy.
+        chunk_size: Predict ``chunk_size`` rows at a time into a preallocated
+            column instead of copying all the features at once. 0 predicts
+            the whole dataset in one call.
+        max_workers: Threads predicting chunks at the same time (the
+            predictors release the GIL). Only used with ``chunk_size``.
 
     Returns:
         The predictions as pandas series
     """
     ### ADD YOUR OWN CODE HERE - THIS IS JUST AN EXAMPLE ###
 
-    X = dataset_inf[categorical_feats + numerical_feats]
-   
-    dataset_inf[DATASET_PREDICTION_COLUMN_NAME] = model.predict(X)
+    feats = categorical_feats + numerical_feats
+
+    if backend == "compiled":
+        # The compiled trees read the features by position, unlike the
+        # booster they don't check the column names
+        feature_names = model.get_booster().feature_names
+        if feature_names not in (None, feats):
+            raise ValueError(
+                f"The model features {feature_names} don't match {feats}"
+            )
+        compiled_model = CompiledTreeEnsemble.from_model(model)
+
+        def predict(X):
+            return compiled_model.predict(
+                X.to_numpy(dtype=np.float32, na_value=np.nan)
+            )
+
+    elif backend == "xgboost":
+        predict = model.predict
+    else:
+        raise ValueError(f"Unknown prediction backend {backend}")
+
+    if chunk_size <= 0:
+        dataset_inf[DATASET_PREDICTION_COLUMN_NAME] = predict(
+            dataset_inf[feats]
+        )
+    else:
+        # Rows are predicted independently, so chunks give the same values
+        preds = np.empty(len(dataset_inf), dtype=np.float32)
+
+        def predict_chunk(chunk):
+            rows, X = chunk
+            preds[rows] = predict(X)
+
+        chunks = iter_chunks(dataset_inf, feats, chunk_size)
+        if max_workers <= 1:
+            for chunk in chunks:
+                predict_chunk(chunk)
+        else:
+            # At most two chunks per thread are copied at the same time
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                pending = deque()
+                for chunk in chunks:
+                    if len(pending) >= 2 * max_workers:
+                        pending.popleft().result()
+                    pending.append(executor.submit(predict_chunk, chunk))
+                for future in pending:
+                    future.result()
+        dataset_inf[DATASET_PREDICTION_COLUMN_NAME] = preds
 
     ### YOUR CODE ENDS HERE ###
 
-    return dataset_inf, DATASET_PREDICTION_COLUMN_NAME
\ No newline at end of file
+    return dataset_inf, DATASET_PREDICTION_COLUMN_NAME
@@ -1,8 +1,26 @@
-from typing import Tuple, Annotated, List
+from typing import Tuple, Annotated, Dict, List, Optional
 import datetime
+import functools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine, Column, Integer, Float, DateTime
+from sqlalchemy import (
+    bindparam,
+    create_engine,
+    delete,
+    func,
+    inspect,
+    select,
+    Column,
+    Integer,
+    Float,
+    DateTime,
+    String,
+    Table,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
 from sqlalchemy.ext.declarative import declarative_base
 from evidently.report import Report
 from evidently import ColumnMapping
@@ -15,6 +33,19 @@ from evidently.metrics import (
 from zenml import step
 from zenml.client import Client
 from zenml.logger import get_logger
+import xgboost as xgb
+from materializers import ArrowDataFrameMaterializer
+from steps.data_loaders import data_loader, data_preprocessor
+from steps.inference_predict import inference_predict
+from utils.drift_helper import ReferenceProfile, compute_windows_metrics
+from utils.profile_helper import ReferenceProfileStore, profile_key_fields
+from utils.window_helper import (
+    content_hash,
+    window_bounds,
+    window_key,
+    window_start,
+    window_timestamp,
+)
 
 SEND_TIMEOUT = 10
 
@@ -23,6 +54,9 @@ logger = get_logger(__name__)
 # Base de datos para los modelos de SQLAlchemy
 Base = declarative_base()
 
+# INSERT con ON CONFLICT de cada dialecto, ver upsert_metrics
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
 
 def daterange(start_date: datetime.date, end_date: datetime.date):
     days = int((end_date - start_date).days)
@@ -70,6 +104,30 @@ class CitibikeMetrics(Base):
     abs_perc_error_std_current = Column(Float)
 
 
+# Hash del contenido de cada ventana guardada, ver calculate_drift_metrics_step
+class CitibikeMetricsWindow(Base):
+    __tablename__ = "citibike_metrics_windows"
+
+    timestamp = Column(DateTime, primary_key=True)
+    content_hash = Column(String(64))
+
+
+def monitoring_database_url(host: str, port: int, database: str) -> str:
+    """URL de la base de datos de monitorización, con el secreto de ZenML."""
+    secret = Client().get_secret("pg_monitoring_secret")
+    return f'postgresql://{secret.secret_values["MONITORING_DB_USER"]}:{secret.secret_values["MONITORING_BD_PASSWORD"]}@{host}:{port}/{database}'
+
+
+@functools.lru_cache(maxsize=None)
+def get_engine(database_url: str) -> Engine:
+    """Engine (y su pool de conexiones) compartido por los pasos del proceso.
+
+    ``pool_pre_ping`` descarta las conexiones que la base de datos haya
+    cerrado entre pasos.
+    """
+    return create_engine(database_url, pool_pre_ping=True)
+
+
 # Crear la tabla en PostgreSQL si no existe
 @step(enable_cache=False)
 def create_table_step(host: str, port: int, database: str):
@@ -77,14 +135,400 @@ def create_table_step(host: str, port: int, database: str):
     Este paso asegura que la tabla 'citibike_metrics' exista en la base de datos.
     """
     # Configuración de SQLAlchemy
-    secret = Client().get_secret("pg_monitoring_secret")
-    DATABASE_URL = f'postgresql://{secret.secret_values["MONITORING_DB_USER"]}:{secret.secret_values["MONITORING_BD_PASSWORD"]}@{host}:{port}/{database}'
-
-    engine = create_engine(DATABASE_URL)
+    engine = get_engine(monitoring_database_url(host, port, database))
     Base.metadata.create_all(engine)
     logger.info("Tabla 'citibike_metrics' verificada o creada exitosamente.")
 
 
+def latest_metrics_timestamp(
+    engine: Engine,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+) -> Optional[datetime.datetime]:
+    """Último ``timestamp`` guardado en ``[since, until)``, ``None`` si no
+    hay métricas."""
+    if not inspect(engine).has_table(CitibikeMetrics.__tablename__):
+        return None
+    query = select(func.max(CitibikeMetrics.timestamp))
+    if since is not None:
+        query = query.where(CitibikeMetrics.timestamp >= since)
+    if until is not None:
+        query = query.where(CitibikeMetrics.timestamp < until)
+    with engine.connect() as connection:
+        return connection.execute(query).scalar()
+
+
+def stored_window_hashes(
+    engine: Engine, since: datetime.datetime
+) -> Dict[str, str]:
+    """Hash de contenido de las ventanas guardadas desde ``since``."""
+    if not inspect(engine).has_table(CitibikeMetricsWindow.__tablename__):
+        return {}
+    with engine.connect() as connection:
+        rows = connection.execute(
+            select(
+                CitibikeMetricsWindow.timestamp,
+                CitibikeMetricsWindow.content_hash,
+            ).where(CitibikeMetricsWindow.timestamp >= since)
+        )
+        return {window_key(timestamp): hash_ for timestamp, hash_ in rows}
+
+
+def incremental_window_range(
+    engine: Engine,
+    start_current_date: datetime.datetime,
+    end_current_date: datetime.datetime,
+    window_granularity: str = "week",
+    window_size: int = 1,
+    window_step: int = 1,
+    lookback_windows: int = 1,
+) -> Tuple[datetime.datetime, Dict[str, str]]:
+    """Rango a recalcular en modo incremental.
+
+    Empieza en la primera ventana después de la última guardada del rango,
+    o en las ``lookback_windows`` últimas ventanas guardadas para detectar
+    las que cambiaron (p. ej. una semana que estaba incompleta). Las
+    ventanas anteriores no se vuelven a cargar.
+
+    Returns:
+        El nuevo inicio de los datos actuales (nunca antes de
+        ``start_current_date``) y los hashes guardados desde entonces, para
+        ``calculate_drift_metrics_step``.
+    """
+    # Una ventana parcial se guarda con el final de su periodo, que puede
+    # ser posterior a end_current_date
+    latest = latest_metrics_timestamp(
+        engine,
+        since=start_current_date,
+        until=window_start(
+            end_current_date, window_granularity, shift=1
+        ).to_pydatetime(),
+    )
+    if latest is None:
+        return start_current_date, {}
+    shift = (
+        -(lookback_windows - 1) * window_step
+        if lookback_windows
+        else window_step
+    )
+    start = window_start(latest, window_granularity, window_size, shift)
+    start = max(start.to_pydatetime(), start_current_date)
+    return start, stored_window_hashes(engine, start)
+
+
+@step(enable_cache=False)
+def incremental_window_range_step(
+    host: str,
+    port: int,
+    database: str,
+    start_current_date: datetime.datetime,
+    end_current_date: datetime.datetime,
+    window_granularity: str = "week",
+    window_size: int = 1,
+    window_step: int = 1,
+    lookback_windows: int = 1,
+) -> Tuple[
+    Annotated[str, "start_current_date"],
+    Annotated[Dict[str, str], "stored_hashes"],
+]:
+    """
+    Este paso consulta en cada ejecución el rango del modo incremental, ver
+    ``incremental_window_range``.
+
+    El inicio se devuelve en ISO 8601 porque ZenML no tiene materializer
+    para fechas; ``reference_data_loader`` lo acepta así.
+    """
+    engine = get_engine(monitoring_database_url(host, port, database))
+    start, stored_hashes = incremental_window_range(
+        engine,
+        start_current_date,
+        end_current_date,
+        window_granularity=window_granularity,
+        window_size=window_size,
+        window_step=window_step,
+        lookback_windows=lookback_windows,
+    )
+    logger.info(
+        f"Incremental monitoring from {start}, "
+        f"{len(stored_hashes)} stored windows to check"
+    )
+    return start.isoformat(), stored_hashes
+
+
+def compute_window_metrics(
+    reference_data: pd.DataFrame,
+    current_data_day: pd.DataFrame,
+    target: str,
+    prediction: str,
+    categorical_feats: List[str],
+    numerical_feats: List[str],
+) -> Dict:
+    """Run the Evidently report of one window against the reference data.
+
+    Returns the fields of ``CitibikeMetrics``, timestamped with the last
+    day of the window.
+    """
+    # Configurar el reporte de Evidently
+    column_mapping = ColumnMapping(
+        prediction=prediction,
+        numerical_features=categorical_feats,
+        categorical_features=numerical_feats,
+        target=target,
+    )
+
+    # Definir las métricas que queremos calcular
+    report = Report(
+        metrics=[
+            ColumnDriftMetric(column_name=prediction),
+            DatasetDriftMetric(),
+            DatasetMissingValuesMetric(),
+            RegressionQualityMetric(),
+        ]
+    )
+
+    # Calcular las métricas de drift
+    report.run(
+        reference_data=reference_data,
+        current_data=current_data_day,
+        column_mapping=column_mapping,
+    )
+    result = report.as_dict()
+
+    # Extraer las métricas
+    prediction_drift = result["metrics"][0]["result"]["drift_score"]
+    num_drifted_columns = result["metrics"][1]["result"][
+        "number_of_drifted_columns"
+    ]
+    share_missing_values = result["metrics"][2]["result"]["current"][
+        "share_of_missing_values"
+    ]
+
+    # Métricas de RegressionQualityMetric
+    r2_score_reference = result["metrics"][3]["result"]["reference"][
+        "r2_score"
+    ]
+    r2_score_current = result["metrics"][3]["result"]["current"]["r2_score"]
+
+    rmse_score_reference = result["metrics"][3]["result"]["reference"]["rmse"]
+    rmse_score_current = result["metrics"][3]["result"]["current"]["rmse"]
+
+    mae_score_reference = result["metrics"][3]["result"]["reference"][
+        "mean_abs_error"
+    ]
+    mae_score_current = result["metrics"][3]["result"]["current"][
+        "mean_abs_error"
+    ]
+
+    mean_error_reference = result["metrics"][3]["result"]["reference"][
+        "mean_error"
+    ]
+    mean_error_current = result["metrics"][3]["result"]["current"][
+        "mean_error"
+    ]
+
+    abs_error_max_reference = result["metrics"][3]["result"]["reference"][
+        "abs_error_max"
+    ]
+    abs_error_max_current = result["metrics"][3]["result"]["current"][
+        "abs_error_max"
+    ]
+
+    mean_abs_perc_error_reference = result["metrics"][3]["result"][
+        "reference"
+    ]["mean_abs_perc_error"]
+    mean_abs_perc_error_current = result["metrics"][3]["result"]["current"][
+        "mean_abs_perc_error"
+    ]
+
+    underperformance_mean_error = result["metrics"][3]["result"]["reference"][
+        "underperformance"
+    ]["majority"]["mean_error"]
+    underperformance_std_error = result["metrics"][3]["result"]["reference"][
+        "underperformance"
+    ]["majority"]["std_error"]
+
+    underestimation_mean_error = result["metrics"][3]["result"]["reference"][
+        "underperformance"
+    ]["underestimation"]["mean_error"]
+    underestimation_std_error = result["metrics"][3]["result"]["reference"][
+        "underperformance"
+    ]["underestimation"]["std_error"]
+
+    overestimation_mean_error = result["metrics"][3]["result"]["reference"][
+        "underperformance"
+    ]["overestimation"]["mean_error"]
+    overestimation_std_error = result["metrics"][3]["result"]["reference"][
+        "underperformance"
+    ]["overestimation"]["std_error"]
+
+    error_std_reference = result["metrics"][3]["result"]["reference"][
+        "error_std"
+    ]
+    error_std_current = result["metrics"][3]["result"]["current"]["error_std"]
+
+    abs_error_std_reference = result["metrics"][3]["result"]["reference"][
+        "abs_error_std"
+    ]
+    abs_error_std_current = result["metrics"][3]["result"]["current"][
+        "abs_error_std"
+    ]
+
+    abs_perc_error_std_reference = result["metrics"][3]["result"]["reference"][
+        "abs_perc_error_std"
+    ]
+    abs_perc_error_std_current = result["metrics"][3]["result"]["current"][
+        "abs_perc_error_std"
+    ]
+
+    # Incluir el timestamp de este día
+    current_date = current_data_day.index[-1].date()
+    return {
+        "timestamp": current_date,
+        "prediction_drift": prediction_drift,
+        "num_drifted_columns": num_drifted_columns,
+        "share_missing_values": share_missing_values,
+        "r2_score_reference": r2_score_reference,
+        "r2_score_current": r2_score_current,
+        "rmse_score_reference": rmse_score_reference,
+        "rmse_score_current": rmse_score_current,
+        "mae_score_reference": mae_score_reference,
+        "mae_score_current": mae_score_current,
+        "mean_error_reference": mean_error_reference,
+        "mean_error_current": mean_error_current,
+        "abs_error_max_reference": abs_error_max_reference,
+        "abs_error_max_current": abs_error_max_current,
+        "mean_abs_perc_error_reference": mean_abs_perc_error_reference,
+        "mean_abs_perc_error_current": mean_abs_perc_error_current,
+        "underperformance_mean_error": underperformance_mean_error,
+        "underperformance_std_error": underperformance_std_error,
+        "underestimation_mean_error": underestimation_mean_error,
+        "underestimation_std_error": underestimation_std_error,
+        "overestimation_mean_error": overestimation_mean_error,
+        "overestimation_std_error": overestimation_std_error,
+        "error_std_reference": error_std_reference,
+        "error_std_current": error_std_current,
+        "abs_error_std_reference": abs_error_std_reference,
+        "abs_error_std_current": abs_error_std_current,
+        "abs_perc_error_std_reference": abs_perc_error_std_reference,
+        "abs_perc_error_std_current": abs_perc_error_std_current,
+    }
+
+
+# Reference data and settings of a drift worker process, see init_drift_worker
+_drift_worker: Dict = {}
+
+
+def init_drift_worker(reference_data: pd.DataFrame, settings: Dict):
+    """Keep the reference data, shipped once to every worker process."""
+    _drift_worker["reference_data"] = reference_data
+    _drift_worker["settings"] = settings
+
+
+def compute_worker_window_metrics(current_data_day: pd.DataFrame) -> Dict:
+    return compute_window_metrics(
+        _drift_worker["reference_data"],
+        current_data_day,
+        **_drift_worker["settings"],
+    )
+
+
+@step(
+    enable_cache=False,
+    output_materializers={"reference_data": ArrowDataFrameMaterializer},
+)
+def reference_profile_loader(
+    model: xgb.XGBRegressor,
+    base_url: str,
+    start_reference_date: datetime.date,
+    end_reference_date: datetime.date,
+    profile_dir: str,
+    categorical_feats: List[str] = [],
+    numerical_feats: List[str] = [],
+    fetch_max_workers: int = 1,
+    cache_dir: Optional[str] = None,
+    cache_max_size_mb: int = 1024,
+    cache_offline: bool = False,
+    lean_preprocessing: bool = False,
+    downcast_weather: bool = False,
+    prediction_backend: str = "xgboost",
+    prediction_chunk_size: int = 0,
+    prediction_max_workers: int = 1,
+) -> Tuple[
+    Annotated[pd.DataFrame, "reference_data"],
+    Annotated[Optional[ReferenceProfile], "reference_profile"],
+]:
+    """
+    Este paso devuelve los datos de referencia con predicciones y su
+    ``ReferenceProfile``, guardados en ``profile_dir``.
+
+    La entrada se identifica por el modelo, las fechas de referencia, las
+    features, el origen de los datos, las opciones de preprocesado y el
+    backend de predicción, ver ``utils.profile_helper``.
+    Si ya existe se lee del disco; si no, los datos se cargan, se
+    preprocesan y se puntúan como en el pipeline y se guardan con su
+    perfil. El perfil necesita más de 1000 filas de referencia; con menos
+    se guardan solo los datos y el perfil es ``None``.
+    """
+    store = ReferenceProfileStore(profile_dir)
+    key_fields = profile_key_fields(
+        model,
+        start_reference_date,
+        end_reference_date,
+        features=categorical_feats + numerical_feats,
+        settings={
+            "base_url": base_url,
+            "lean_preprocessing": lean_preprocessing,
+            "downcast_weather": downcast_weather,
+            "prediction_backend": prediction_backend,
+        },
+    )
+    entry = store.load(key_fields)
+    if entry is not None:
+        logger.info(f"Reference profile found in {store.store_dir}")
+        return entry
+
+    logger.info("Reference profile not found, scoring the reference data")
+    reference_data, target = data_loader.entrypoint(
+        base_url=base_url,
+        start_date=start_reference_date,
+        end_date=end_reference_date,
+        fetch_max_workers=fetch_max_workers,
+        cache_dir=cache_dir,
+        cache_max_size_mb=cache_max_size_mb,
+        cache_offline=cache_offline,
+    )
+    reference_data = data_preprocessor.entrypoint(
+        reference_data,
+        is_reference=True,
+        lean=lean_preprocessing,
+        downcast_weather=downcast_weather,
+    )
+    reference_data, prediction = inference_predict.entrypoint(
+        model=model,
+        dataset_inf=reference_data,
+        categorical_feats=categorical_feats,
+        numerical_feats=numerical_feats,
+        backend=prediction_backend,
+        chunk_size=prediction_chunk_size,
+        max_workers=prediction_max_workers,
+    )
+    # Evidently's column mapping swaps the feature types, see
+    # compute_window_metrics
+    try:
+        profile = ReferenceProfile(
+            reference_data,
+            target=target,
+            prediction=prediction,
+            numerical_columns=categorical_feats,
+            categorical_columns=numerical_feats,
+        )
+    except ValueError as e:
+        logger.warning(f"Reference profile not computed: {e}")
+        profile = None
+    store.save(key_fields, reference_data, profile)
+    return reference_data, profile
+
+
 @step(enable_cache=False)
 def calculate_drift_metrics_step(
     reference_data: pd.DataFrame,
@@ -93,194 +537,173 @@ def calculate_drift_metrics_step(
     prediction: str,
     categorical_feats: List[str] = [],
     numerical_feats: List[str] = [],
+    max_workers: int = 1,
+    engine: str = "evidently",
+    window_granularity: str = "week",
+    window_size: int = 1,
+    window_step: int = 1,
+    stored_hashes: Optional[Dict[str, str]] = None,
+    reference_profile: Optional[ReferenceProfile] = None,
 ) -> Annotated[pd.DataFrame, "metrics"]:
     """
     Este paso calcula las métricas de drift usando Evidently (model drift, column drift, missing values).
+
+    Las métricas se calculan por ventana de ``window_size`` periodos
+    (``window_granularity``: hour, day, week o month) que termina cada
+    ``window_step`` periodos, ver ``utils.window_helper``. Por defecto son
+    semanas ISO sin solapamiento.
+
+    Con ``max_workers`` > 1 las ventanas se calculan en paralelo en un pool
+    de procesos; los datos de referencia se envían una sola vez a cada
+    proceso y los resultados mantienen el orden de las ventanas.
+
+    Con ``engine="native"`` las métricas se calculan con
+    ``utils.drift_helper``: las estadísticas de referencia se calculan una
+    vez y todas las ventanas en una sola pasada, con los mismos valores que
+    Evidently (``max_workers`` no se usa). Si la referencia necesita tests
+    que el motor nativo no implementa (chi-cuadrado o Z con 1000 filas o
+    menos) las métricas se calculan con Evidently.
+
+    Cada ventana lleva el hash de su contenido (datos actuales con
+    predicciones y datos de referencia) en la columna ``content_hash``. Las
+    ventanas de ``stored_hashes`` (por ``window_key``) con el mismo hash no
+    han cambiado y no se vuelven a calcular.
+
+    El motor nativo usa ``reference_profile`` (ver
+    ``reference_profile_loader``) en lugar de volver a calcular las
+    estadísticas de referencia si corresponde a las mismas columnas.
     """
+    if engine not in ("evidently", "native"):
+        raise ValueError(
+            f"Unknown drift engine {engine!r}, "
+            "expected 'evidently' or 'native'"
+        )
     # Calculate predictions
     logger.info("Calculate predictions")
     feats = categorical_feats + numerical_feats
     feats = feats if len(feats) else reference_data.columns
-    current_data["week"] = current_data.index.isocalendar().week
-
-    metric_list = []
-    for week_num in range(52):
-        # Filtrar los datos actuales para el día específico
-        print(f"Get datas from {week_num}")
-        # current_data_day = current_data[current_data.index.date == current_date.date()]
-        current_data_day = current_data[current_data["week"] == week_num].drop(
-            columns=["week"]
-        )
-        if len(current_data_day) == 0:
-            print(f"Skipping {week_num}")
-            continue
 
-        # Configurar el reporte de Evidently
-        column_mapping = ColumnMapping(
-            prediction=prediction,
-            numerical_features=categorical_feats,
-            categorical_features=numerical_feats,
-            target=target,
+    # Ventanas: cortes contiguos de los datos ordenados por fecha
+    if not current_data.index.is_monotonic_increasing:
+        current_data = current_data.sort_index(kind="stable")
+    bounds = window_bounds(
+        current_data.index, window_granularity, window_size, window_step
+    )
+    logger.info(
+        f"{len(bounds)} windows of {window_size} {window_granularity}(s) "
+        f"every {window_step} {window_granularity}(s)"
+    )
+    metric_columns = [
+        column.name for column in CitibikeMetrics.__table__.columns
+    ]
+    current_data_days = [
+        current_data.iloc[start:stop] for start, stop in bounds
+    ]
+    timestamps = [
+        window_timestamp(current_data_day, window_granularity)
+        for current_data_day in current_data_days
+    ]
+    reference_hash = content_hash(reference_data)
+    hashes = [
+        content_hash(current_data_day, salt=reference_hash)
+        for current_data_day in current_data_days
+    ]
+
+    # Ventanas sin cambios desde que se guardaron sus métricas
+    if stored_hashes:
+        changed = [
+            i
+            for i, (timestamp, hash_) in enumerate(zip(timestamps, hashes))
+            if stored_hashes.get(window_key(timestamp)) != hash_
+        ]
+        logger.info(
+            f"{len(bounds) - len(changed)} windows unchanged, "
+            f"{len(changed)} to compute"
         )
-
-        # Definir las métricas que queremos calcular
-        report = Report(
-            metrics=[
-                ColumnDriftMetric(column_name=prediction),
-                DatasetDriftMetric(),
-                DatasetMissingValuesMetric(),
-                RegressionQualityMetric(),
-            ]
+        bounds = [bounds[i] for i in changed]
+        current_data_days = [current_data_days[i] for i in changed]
+        timestamps = [timestamps[i] for i in changed]
+        hashes = [hashes[i] for i in changed]
+    if not bounds:
+        return pd.DataFrame(columns=metric_columns + ["content_hash"])
+
+    profile = None
+    if engine == "native":
+        # Evidently's column mapping swaps the feature types, see
+        # compute_window_metrics
+        column_roles = {
+            "target": target,
+            "prediction": prediction,
+            "numerical_columns": categorical_feats,
+            "categorical_columns": numerical_feats,
+        }
+        if reference_profile is not None and reference_profile.matches(
+            **column_roles
+        ):
+            profile = reference_profile
+        else:
+            if reference_profile is not None:
+                logger.warning(
+                    "The reference profile was computed for other columns, "
+                    "computing it again"
+                )
+            try:
+                profile = ReferenceProfile(reference_data, **column_roles)
+            except ValueError as e:
+                logger.warning(
+                    f"Native drift engine not available ({e}), "
+                    "computing the metrics with Evidently"
+                )
+
+    if profile is not None:
+        # Overlapping windows repeat their shared rows
+        positions = np.concatenate(
+            [np.arange(start, stop) for start, stop in bounds]
         )
-
-        # Calcular las métricas de drift
-        report.run(
-            reference_data=reference_data,
-            current_data=current_data_day,
-            column_mapping=column_mapping,
+        windows = np.repeat(
+            np.arange(len(bounds)), [stop - start for start, stop in bounds]
         )
-        result = report.as_dict()
-
-        # Extraer las métricas
-        prediction_drift = result["metrics"][0]["result"]["drift_score"]
-        num_drifted_columns = result["metrics"][1]["result"][
-            "number_of_drifted_columns"
-        ]
-        share_missing_values = result["metrics"][2]["result"]["current"][
-            "share_of_missing_values"
-        ]
-
-        # Métricas de RegressionQualityMetric
-        r2_score_reference = result["metrics"][3]["result"]["reference"][
-            "r2_score"
-        ]
-        r2_score_current = result["metrics"][3]["result"]["current"][
-            "r2_score"
-        ]
-
-        rmse_score_reference = result["metrics"][3]["result"]["reference"][
-            "rmse"
-        ]
-        rmse_score_current = result["metrics"][3]["result"]["current"]["rmse"]
-
-        mae_score_reference = result["metrics"][3]["result"]["reference"][
-            "mean_abs_error"
-        ]
-        mae_score_current = result["metrics"][3]["result"]["current"][
-            "mean_abs_error"
-        ]
-
-        mean_error_reference = result["metrics"][3]["result"]["reference"][
-            "mean_error"
-        ]
-        mean_error_current = result["metrics"][3]["result"]["current"][
-            "mean_error"
-        ]
-
-        abs_error_max_reference = result["metrics"][3]["result"]["reference"][
-            "abs_error_max"
-        ]
-        abs_error_max_current = result["metrics"][3]["result"]["current"][
-            "abs_error_max"
-        ]
-
-        mean_abs_perc_error_reference = result["metrics"][3]["result"][
-            "reference"
-        ]["mean_abs_perc_error"]
-        mean_abs_perc_error_current = result["metrics"][3]["result"][
-            "current"
-        ]["mean_abs_perc_error"]
-
-        underperformance_mean_error = result["metrics"][3]["result"][
-            "reference"
-        ]["underperformance"]["majority"]["mean_error"]
-        underperformance_std_error = result["metrics"][3]["result"][
-            "reference"
-        ]["underperformance"]["majority"]["std_error"]
-
-        underestimation_mean_error = result["metrics"][3]["result"][
-            "reference"
-        ]["underperformance"]["underestimation"]["mean_error"]
-        underestimation_std_error = result["metrics"][3]["result"][
-            "reference"
-        ]["underperformance"]["underestimation"]["std_error"]
-
-        overestimation_mean_error = result["metrics"][3]["result"][
-            "reference"
-        ]["underperformance"]["overestimation"]["mean_error"]
-        overestimation_std_error = result["metrics"][3]["result"]["reference"][
-            "underperformance"
-        ]["overestimation"]["std_error"]
-
-        error_std_reference = result["metrics"][3]["result"]["reference"][
-            "error_std"
-        ]
-        error_std_current = result["metrics"][3]["result"]["current"][
-            "error_std"
-        ]
-
-        abs_error_std_reference = result["metrics"][3]["result"]["reference"][
-            "abs_error_std"
-        ]
-        abs_error_std_current = result["metrics"][3]["result"]["current"][
-            "abs_error_std"
-        ]
-
-        abs_perc_error_std_reference = result["metrics"][3]["result"][
-            "reference"
-        ]["abs_perc_error_std"]
-        abs_perc_error_std_current = result["metrics"][3]["result"]["current"][
-            "abs_perc_error_std"
+        metrics = compute_windows_metrics(
+            profile, current_data.iloc[positions], windows
+        )
+        metrics["timestamp"] = timestamps
+        metrics["content_hash"] = hashes
+        return metrics[metric_columns + ["content_hash"]]
+
+    settings = {
+        "target": target,
+        "prediction": prediction,
+        "categorical_feats": categorical_feats,
+        "numerical_feats": numerical_feats,
+    }
+    if max_workers <= 1 or len(current_data_days) <= 1:
+        metric_list = [
+            compute_window_metrics(
+                reference_data, current_data_day, **settings
+            )
+            for current_data_day in current_data_days
         ]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(max_workers, len(current_data_days)),
+            initializer=init_drift_worker,
+            initargs=(reference_data, settings),
+        ) as executor:
+            metric_list = list(
+                executor.map(compute_worker_window_metrics, current_data_days)
+            )
 
-        # Incluir el timestamp de este día
-        current_date = current_data_day.index[-1].date()
-        metrics = {
-            "timestamp": current_date,
-            "prediction_drift": prediction_drift,
-            "num_drifted_columns": num_drifted_columns,
-            "share_missing_values": share_missing_values,
-            "r2_score_reference": r2_score_reference,
-            "r2_score_current": r2_score_current,
-            "rmse_score_reference": rmse_score_reference,
-            "rmse_score_current": rmse_score_current,
-            "mae_score_reference": mae_score_reference,
-            "mae_score_current": mae_score_current,
-            "mean_error_reference": mean_error_reference,
-            "mean_error_current": mean_error_current,
-            "abs_error_max_reference": abs_error_max_reference,
-            "abs_error_max_current": abs_error_max_current,
-            "mean_abs_perc_error_reference": mean_abs_perc_error_reference,
-            "mean_abs_perc_error_current": mean_abs_perc_error_current,
-            "underperformance_mean_error": underperformance_mean_error,
-            "underperformance_std_error": underperformance_std_error,
-            "underestimation_mean_error": underestimation_mean_error,
-            "underestimation_std_error": underestimation_std_error,
-            "overestimation_mean_error": overestimation_mean_error,
-            "overestimation_std_error": overestimation_std_error,
-            "error_std_reference": error_std_reference,
-            "error_std_current": error_std_current,
-            "abs_error_std_reference": abs_error_std_reference,
-            "abs_error_std_current": abs_error_std_current,
-            "abs_perc_error_std_reference": abs_perc_error_std_reference,
-            "abs_perc_error_std_current": abs_perc_error_std_current,
-        }
-        metric_list.append(metrics)
+    metrics = pd.DataFrame(metric_list)
+    metrics["timestamp"] = timestamps
+    metrics["content_hash"] = hashes
+    return metrics
 
-    return pd.DataFrame(metric_list)
 
+def insert_metrics_orm(engine: Engine, metrics: pd.DataFrame):
+    """Inserta las métricas fila a fila con objetos ``CitibikeMetrics``.
 
-@step(enable_cache=False)
-def save_metrics_to_db_step(
-    host: str, port: int, database: str, metrics: pd.DataFrame  # metrics: dict
-):
+    Falla si algún ``timestamp`` ya está guardado.
     """
-    Este paso guarda las métricas de drift en la tabla 'citibike_metrics' de PostgreSQL usando SQLAlchemy.
-    """
-    # Configuración de SQLAlchemy
-    secret = Client().get_secret("pg_monitoring_secret")
-    DATABASE_URL = f'postgresql://{secret.secret_values["MONITORING_DB_USER"]}:{secret.secret_values["MONITORING_BD_PASSWORD"]}@{host}:{port}/{database}'
-    engine = create_engine(DATABASE_URL)
     Session = sessionmaker(bind=engine)
 
     # Usar el contexto 'with' para manejar la sesión automáticamente
@@ -331,4 +754,166 @@ def save_metrics_to_db_step(
         # Commit para guardar todos los cambios
         session.commit()
 
+
+def table_records(frame: pd.DataFrame, table: Table) -> List[Dict]:
+    """Filas de ``frame`` con las columnas de ``table`` en tipos de Python.
+
+    Los NaN se guardan como NULL y los timestamps como ``datetime``, el
+    único tipo que aceptan todos los dialectos para ``DateTime``.
+    """
+    columns = [column.name for column in table.columns]
+    records = frame[columns].astype(object)
+    records = records.where(frame[columns].notna(), None)
+    records["timestamp"] = [
+        timestamp.to_pydatetime()
+        for timestamp in pd.to_datetime(frame["timestamp"])
+    ]
+    return records.to_dict("records")
+
+
+def upsert_rows(
+    connection: Connection,
+    table: Table,
+    frame: pd.DataFrame,
+    batch_size: int = 1000,
+) -> int:
+    """``INSERT ... ON CONFLICT DO UPDATE`` de las filas en lotes."""
+    dialect_insert = UPSERT_INSERTS.get(connection.dialect.name)
+    if dialect_insert is None:
+        raise ValueError(
+            f"Upsert isn't supported on {connection.dialect.name}, "
+            f"expected one of {sorted(UPSERT_INSERTS)}"
+        )
+    statement = dialect_insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(table.primary_key.columns),
+        set_={
+            column.name: statement.excluded[column.name]
+            for column in table.columns
+            if not column.primary_key
+        },
+    )
+    records = table_records(frame, table)
+    for start in range(0, len(records), batch_size):
+        connection.execute(statement, records[start : start + batch_size])
+    return len(records)
+
+
+def delete_stale_windows(
+    connection: Connection, metrics: pd.DataFrame, window_granularity: str
+):
+    """Borra las filas guardadas en el último periodo de cada ventana de
+    ``metrics`` con un ``timestamp`` anterior al de la ventana.
+
+    Son ventanas guardadas con la fecha de su último dato, como las de una
+    semana incompleta o las de versiones anteriores de ``window_timestamp``,
+    que si no quedarían junto a la ventana completa. Los rangos se borran
+    con un único ``executemany`` por tabla.
+    """
+    ranges = [
+        {
+            "since": window_start(
+                timestamp, window_granularity
+            ).to_pydatetime(),
+            "until": timestamp.to_pydatetime(),
+        }
+        for timestamp in pd.to_datetime(metrics["timestamp"])
+    ]
+    if not ranges:
+        return
+    for table in [CitibikeMetrics.__table__, CitibikeMetricsWindow.__table__]:
+        connection.execute(
+            delete(table).where(
+                table.c.timestamp >= bindparam("since"),
+                table.c.timestamp < bindparam("until"),
+            ),
+            ranges,
+        )
+
+
+def upsert_metrics(
+    engine: Engine,
+    metrics: pd.DataFrame,
+    batch_size: int = 1000,
+    window_granularity: Optional[str] = None,
+) -> int:
+    """Inserta o actualiza las métricas por ``timestamp`` en lotes.
+
+    Usa ``INSERT ... ON CONFLICT (timestamp) DO UPDATE`` de SQLAlchemy Core,
+    disponible en PostgreSQL y SQLite, así que volver a ejecutar un
+    backfill sobrescribe las ventanas ya guardadas en lugar de fallar.
+    Cada lote se envía con un único ``executemany`` y todos los lotes en una
+    transacción, junto con el ``content_hash`` de las ventanas si
+    ``metrics`` lo incluye. Con ``window_granularity`` se borran antes las
+    filas guardadas con otro ``timestamp`` en el último periodo de cada
+    ventana, ver ``delete_stale_windows``.
+
+    Returns:
+        El número de filas escritas.
+    """
+    with engine.begin() as connection:
+        if window_granularity is not None:
+            delete_stale_windows(connection, metrics, window_granularity)
+        rows = upsert_rows(
+            connection, CitibikeMetrics.__table__, metrics, batch_size
+        )
+        if "content_hash" in metrics.columns:
+            upsert_rows(
+                connection,
+                CitibikeMetricsWindow.__table__,
+                metrics,
+                batch_size,
+            )
+    return rows
+
+
+@step(enable_cache=False)
+def save_metrics_to_db_step(
+    host: str,
+    port: int,
+    database: str,
+    metrics: pd.DataFrame,  # metrics: dict
+    write_mode: str = "upsert",
+    batch_size: int = 1000,
+    window_granularity: Optional[str] = None,
+):
+    """
+    Este paso guarda las métricas de drift en la tabla 'citibike_metrics' de PostgreSQL usando SQLAlchemy.
+
+    Con ``write_mode="upsert"`` las filas se escriben en lotes de
+    ``batch_size`` y las ventanas ya guardadas se actualizan, ver
+    ``upsert_metrics``. ``write_mode="orm"`` las inserta una a una y falla
+    si alguna ya existe.
+
+    Con ``window_granularity`` (la de ``calculate_drift_metrics_step``) se
+    borran antes las ventanas guardadas con otro ``timestamp`` en el mismo
+    periodo, ver ``delete_stale_windows``.
+    """
+    engine = get_engine(monitoring_database_url(host, port, database))
+    if write_mode == "upsert":
+        rows = upsert_metrics(
+            engine,
+            metrics,
+            batch_size=batch_size,
+            window_granularity=window_granularity,
+        )
+        logger.info(f"{rows} metrics upserted in table 'citibike_metrics'.")
+    elif write_mode == "orm":
+        if window_granularity is not None:
+            with engine.begin() as connection:
+                delete_stale_windows(connection, metrics, window_granularity)
+        insert_metrics_orm(engine, metrics)
+        if "content_hash" in metrics.columns:
+            with engine.begin() as connection:
+                upsert_rows(
+                    connection,
+                    CitibikeMetricsWindow.__table__,
+                    metrics,
+                    batch_size,
+                )
+    else:
+        raise ValueError(
+            f"Unknown write mode {write_mode!r}, expected 'upsert' or 'orm'"
+        )
+
     logger.info("End save tabla 'citibike_metrics'.")
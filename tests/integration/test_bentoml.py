@@ -1,5 +1,9 @@
+import io
 import os
+import time
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import json
 from dotenv import load_dotenv
 import requests
@@ -8,6 +12,24 @@ from deepdiff import DeepDiff, DeepSearch
 
 load_dotenv()
 
+# Layout del endpoint columnar:
+# DATASET_NUMERICAL_COLUMNS + DATASET_CATEGORICAL_COLUMNS
+COLUMNAR_FEATURE_COLUMNS = [
+    "TMAX",
+    "TMIN",
+    "SNOW",
+    "hr_sin",
+    "hr_cos",
+    "weekday_sin",
+    "weekday_cos",
+    "week_sin",
+    "week_cos",
+    "mnth_sin",
+    "mnth_cos",
+    "holiday",
+]
+MODEL_FEATURE_COLUMNS = ["holiday"] + COLUMNAR_FEATURE_COLUMNS[:-1]
+
 
 def within_percentage_threshold(actual, expected, threshold=5):
     # Calcular la diferencia porcentual entre el valor actual y esperado
@@ -154,3 +176,128 @@ def test_predict_trips():
         )
 
     print(f"All predictions are within the threshold {threshold}.")
+
+
+def post_columnar(endpoint_url, payload, media_type):
+    files = {"payload": ("payload", payload, media_type)}
+    response = requests.post(endpoint_url, files=files)
+    response.raise_for_status()
+    return response.content
+
+
+def measure_throughput(request, n_rows, repeat=3):
+    # Mejor tiempo de varias ejecuciones, en filas por segundo. Cada
+    # ejecución recibe su número para enviar filas distintas
+    elapsed = []
+    for i in range(repeat):
+        start_time = time.perf_counter()
+        result = request(i)
+        elapsed.append(time.perf_counter() - start_time)
+    return result, n_rows / min(elapsed)
+
+
+def build_payloads(X):
+    # Mismas filas en JSON, Arrow IPC y .npy
+    json_data = {
+        "input_data": X[MODEL_FEATURE_COLUMNS].to_dict(orient="records")
+    }
+    table = pa.Table.from_pandas(X, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    npy_buffer = io.BytesIO()
+    np.save(npy_buffer, X.to_numpy(dtype="float32"))
+    return json_data, sink.getvalue().to_pybytes(), npy_buffer.getvalue()
+
+
+def test_predict_columnar_throughput():
+
+    assert os.getenv("TEST_DATA_DIR") is not None, "Data dir is None"
+    for endpoint in [
+        "BENTOML_PREDICT_ENDPOINT_URL",
+        "BENTOML_PREDICT_FAST_ENDPOINT_URL",
+        "BENTOML_PREDICT_COLUMNAR_ENDPOINT_URL",
+    ]:
+        assert os.getenv(endpoint) is not None, f"{endpoint} is None"
+
+    test_dir = os.getenv("TEST_DATA_DIR")
+    citibike_test_path = os.path.join(test_dir, "test-modeling.parquet")
+    assert os.path.exists(
+        citibike_test_path
+    ), f"Don't found trips data {citibike_test_path}"
+
+    model_data = pd.read_parquet(citibike_test_path)
+
+    # Varios escenarios de la previsión horaria. Las temperaturas cambian
+    # en cada escenario y en cada ejecución, así la caché de predicciones
+    # de /predict no responde por el modelo y se compara la decodificación
+    # y la inferencia de cada formato
+    n_scenarios, repeat = 20, 3
+    payloads = []
+    for i in range(repeat):
+        X = pd.concat(
+            [model_data[COLUMNAR_FEATURE_COLUMNS]] * n_scenarios,
+            ignore_index=True,
+        ).astype(
+            {"holiday": "int64", "week_sin": "float64", "week_cos": "float64"}
+        )
+        offsets = 0.01 * np.repeat(
+            np.arange(n_scenarios) + i * n_scenarios, len(model_data)
+        )
+        X["TMAX"] += offsets
+        X["TMIN"] += offsets
+        payloads.append(build_payloads(X))
+    n_rows = len(X)
+
+    json_response, json_throughput = measure_throughput(
+        lambda i: requests.post(
+            os.getenv("BENTOML_PREDICT_ENDPOINT_URL"), json=payloads[i][0]
+        ).json(),
+        n_rows,
+        repeat,
+    )
+    fast_response, fast_throughput = measure_throughput(
+        lambda i: requests.post(
+            os.getenv("BENTOML_PREDICT_FAST_ENDPOINT_URL"),
+            json=payloads[i][0],
+        ).json(),
+        n_rows,
+        repeat,
+    )
+    arrow_response, arrow_throughput = measure_throughput(
+        lambda i: post_columnar(
+            os.getenv("BENTOML_PREDICT_COLUMNAR_ENDPOINT_URL"),
+            payloads[i][1],
+            "application/vnd.apache.arrow.stream",
+        ),
+        n_rows,
+        repeat,
+    )
+    npy_response, npy_throughput = measure_throughput(
+        lambda i: post_columnar(
+            os.getenv("BENTOML_PREDICT_COLUMNAR_ENDPOINT_URL"),
+            payloads[i][2],
+            "application/x-npy",
+        ),
+        n_rows,
+        repeat,
+    )
+
+    print(f"{'format':>12} {'rows/s':>12}")
+    for name, throughput in [
+        ("json", json_throughput),
+        ("json fast", fast_throughput),
+        ("arrow", arrow_throughput),
+        ("npy", npy_throughput),
+    ]:
+        print(f"{name:>12} {throughput:>12.0f}")
+
+    expected = np.array(
+        [p["prediction"] for p in json_response["predictions"]]
+    )
+    np.testing.assert_allclose(fast_response["predictions"], expected)
+    np.testing.assert_allclose(
+        pa.ipc.open_stream(arrow_response).read_all()["prediction"].to_numpy(),
+        expected,
+    )
+    np.testing.assert_allclose(np.load(io.BytesIO(npy_response)), expected)
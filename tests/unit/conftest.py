@@ -0,0 +1,119 @@
+import datetime
+import functools
+import os
+import sys
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+PROCESSED_DATA_DIR = "data/processed"
+
+
+@pytest.fixture
+def processed_data_url():
+    """Serve the processed datasets over HTTP like the LocalStack bucket."""
+    handler = functools.partial(
+        SimpleHTTPRequestHandler, directory=PROCESSED_DATA_DIR
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+# The BentoML service is not a package, import it from its build context
+SERVICE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    "deployment",
+    "bentoml",
+)
+sys.path.insert(0, SERVICE_DIR)
+
+
+def make_model(n_rows: int = 20_000, random_state: int = 42):
+    """Train a small regressor on synthetic rows of the model features."""
+    import service
+
+    rng = np.random.default_rng(random_state)
+    X = pd.DataFrame(
+        rng.normal(size=(n_rows, len(service.MODEL_FEATURE_COLUMNS))),
+        columns=service.MODEL_FEATURE_COLUMNS,
+    )
+    X["holiday"] = rng.integers(0, 2, n_rows)
+    y = X["TMAX"] * 30 + X["hr_sin"] * 500 + rng.normal(size=n_rows)
+    model = xgb.XGBRegressor(n_estimators=100, max_depth=6)
+    model.fit(X, y)
+    return model
+
+
+def make_service(
+    model=None, prediction_cache_size: int = 0, backend: str = "xgboost"
+):
+    """Build a ``CitibikeService`` instance around ``model``.
+
+    The model store, warm-up and pinning of the constructor are skipped.
+    The prediction cache is disabled unless ``prediction_cache_size`` is
+    given, so repeated calls measure the model.
+    """
+    import service
+
+    service_class = service.CitibikeService.inner
+    instance = object.__new__(service_class)
+    instance.backend = backend
+    instance.nthread = service.NTHREAD
+    instance.worker_cpus = None
+    instance.model = model if model is not None else make_model()
+    instance.compiled_model = None
+    if backend == "compiled":
+        instance.compiled_model = service.compile_model(instance.model)
+    instance.model_version = "test"
+    instance.model_checked_at = time.monotonic()
+    instance.model_check_interval = float("inf")
+    instance.prediction_cache = service.PredictionCache(
+        max_size=prediction_cache_size
+    )
+    instance.batcher = service.MicroBatcher(
+        instance.predict_features,
+        max_batch_size=service.MAX_BATCH_SIZE,
+        max_latency_ms=service.MAX_LATENCY_MS,
+    )
+    return instance
+
+
+def make_raw_inputs(batch_size: int, random_state: int = 42):
+    import service
+
+    rng = np.random.default_rng(random_state)
+    start = datetime.datetime(2025, 1, 1)
+    service_class = service.CitibikeService.inner
+    return [
+        service_class.CitibikeRawInput(
+            date=start + datetime.timedelta(hours=int(hour)),
+            TMAX=float(rng.normal(60, 15)),
+            TMIN=float(rng.normal(45, 15)),
+            SNOW=float(rng.exponential(0.1)),
+        )
+        for hour in rng.integers(0, 24 * 365, batch_size)
+    ]
+
+
+@pytest.fixture
+def model():
+    return make_model(n_rows=500)
+
+
+@pytest.fixture
+def model_store(tmp_path):
+    """Use an empty BentoML model store under ``tmp_path``."""
+    from bentoml._internal.configuration.containers import BentoMLContainer
+    from bentoml._internal.models import ModelStore
+
+    store = ModelStore(str(tmp_path))
+    with BentoMLContainer.model_store.patch(store):
+        yield store
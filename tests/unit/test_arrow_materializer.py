@@ -0,0 +1,39 @@
+import datetime
+import uuid
+import pandas as pd
+import pytest
+from zenml.artifact_stores import LocalArtifactStore, LocalArtifactStoreConfig
+from zenml.enums import StackComponentType
+from materializers import ArrowDataFrameMaterializer
+
+
+@pytest.fixture
+def artifact_store(tmp_path):
+    """Local artifact store in a temporary directory."""
+    now = datetime.datetime.now()
+    return LocalArtifactStore(
+        name="test",
+        id=uuid.uuid4(),
+        config=LocalArtifactStoreConfig(path=str(tmp_path)),
+        flavor="local",
+        type=StackComponentType.ARTIFACT_STORE,
+        user=None,
+        created=now,
+        updated=now,
+    )
+
+
+def test_arrow_materializer_round_trip_is_memory_mapped(artifact_store):
+    dataset = pd.read_parquet("data/test/test-modeling.parquet").astype(
+        {"week_sin": "float64", "week_cos": "float64"}
+    )
+    materializer = ArrowDataFrameMaterializer(
+        uri=artifact_store.path, artifact_store=artifact_store
+    )
+
+    materializer.save(dataset)
+    loaded = materializer.load(pd.DataFrame)
+
+    pd.testing.assert_frame_equal(loaded, dataset)
+    # Zero-copy columns are views on the read-only mapping
+    assert not loaded["TMAX"].to_numpy().flags.writeable
@@ -0,0 +1,96 @@
+import datetime
+import pandas as pd
+import pytest
+from steps.batch_scorer import batch_scorer, split_date_range
+from steps.data_loaders import (
+    DATASET_CATEGORICAL_COLUMNS,
+    DATASET_NUMERICAL_COLUMNS,
+    data_loader,
+    data_preprocessor,
+)
+from steps.inference_predict import inference_predict
+
+
+def test_split_date_range_by_month():
+    chunks = split_date_range(
+        datetime.date(2024, 12, 15), datetime.date(2025, 2, 10)
+    )
+
+    assert chunks == [
+        (datetime.date(2024, 12, 15), datetime.date(2024, 12, 31)),
+        (datetime.date(2025, 1, 1), datetime.date(2025, 1, 31)),
+        (datetime.date(2025, 2, 1), datetime.date(2025, 2, 10)),
+    ]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_batch_scorer_matches_whole_range(
+    processed_data_url, tmp_path, max_workers, model
+):
+    start_date = datetime.date(2025, 1, 20)
+    end_date = datetime.date(2025, 3, 5)
+
+    prediction_files = batch_scorer.entrypoint(
+        model=model,
+        base_url=processed_data_url,
+        start_date=start_date,
+        end_date=end_date,
+        output_dir=str(tmp_path),
+        max_workers=max_workers,
+    )
+
+    dataset, target = data_loader.entrypoint(
+        base_url=processed_data_url, start_date=start_date, end_date=end_date
+    )
+    expected, prediction_col = inference_predict.entrypoint(
+        model=model,
+        dataset_inf=data_preprocessor.entrypoint(dataset),
+        categorical_feats=DATASET_CATEGORICAL_COLUMNS,
+        numerical_feats=DATASET_NUMERICAL_COLUMNS,
+    )
+    assert prediction_files == [
+        str(tmp_path / f"year=2025/month={month}/part-{days}.parquet")
+        for month, days in [
+            ("01", "20250120-20250131"),
+            ("02", "20250201-20250228"),
+            ("03", "20250301-20250305"),
+        ]
+    ]
+    # The booster threads are only set in the workers
+    assert model.get_params()["n_jobs"] is None
+    scored = pd.read_parquet(tmp_path)
+    assert list(scored["month"].astype(int).unique()) == [1, 2, 3]
+    pd.testing.assert_index_equal(
+        pd.DatetimeIndex(scored["datetime"]),
+        expected.index,
+        check_names=False,
+    )
+    assert (scored[target].to_numpy() == expected[target].to_numpy()).all()
+    assert (
+        scored[prediction_col].to_numpy()
+        == expected[prediction_col].to_numpy()
+    ).all()
+
+
+def test_rescoring_drops_previous_rows(processed_data_url, tmp_path, model):
+    def score(start_date, end_date, chunk_freq):
+        return batch_scorer.entrypoint(
+            model=model,
+            base_url=processed_data_url,
+            start_date=start_date,
+            end_date=end_date,
+            output_dir=str(tmp_path),
+            chunk_freq=chunk_freq,
+        )
+
+    score(datetime.date(2025, 1, 1), datetime.date(2025, 2, 28), "MS")
+    monthly = pd.read_parquet(tmp_path).sort_values("datetime")
+    # Part of the range again, weekly
+    score(datetime.date(2025, 1, 15), datetime.date(2025, 2, 10), "W-MON")
+    rescored = pd.read_parquet(tmp_path).sort_values("datetime")
+
+    # Same rows as the first run, without the stale monthly ones
+    pd.testing.assert_series_equal(
+        rescored["datetime"].reset_index(drop=True),
+        monthly["datetime"].reset_index(drop=True),
+    )
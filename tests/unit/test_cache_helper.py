@@ -0,0 +1,73 @@
+import os
+import pandas as pd
+import pytest
+from utils.cache_helper import DatasetCache
+from conftest import PROCESSED_DATA_DIR
+
+TRIPS_FILE = "citibike/2024-citibike-tripdata.parquet"
+WEATHER_FILE = "weather/2024-weather.parquet"
+
+
+def test_cache_revalidates_cached_files(processed_data_url, tmp_path):
+    cache = DatasetCache(cache_dir=str(tmp_path))
+
+    first_path = cache.get(processed_data_url + TRIPS_FILE)
+    second_path = cache.get(processed_data_url + TRIPS_FILE)
+
+    assert first_path == second_path
+    assert cache.stats == {"hits": 1, "misses": 1, "evictions": 0}
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(first_path),
+        pd.read_parquet(os.path.join(PROCESSED_DATA_DIR, TRIPS_FILE)),
+    )
+
+
+def test_cache_offline_mode(processed_data_url, tmp_path):
+    DatasetCache(cache_dir=str(tmp_path)).get(processed_data_url + TRIPS_FILE)
+    cache = DatasetCache(cache_dir=str(tmp_path), offline=True)
+
+    assert os.path.exists(cache.get(processed_data_url + TRIPS_FILE))
+    assert cache.stats["hits"] == 1
+    with pytest.raises(FileNotFoundError):
+        cache.get(processed_data_url + WEATHER_FILE)
+
+
+def test_cache_evicts_least_recently_used(processed_data_url, tmp_path):
+    trips_size = os.path.getsize(os.path.join(PROCESSED_DATA_DIR, TRIPS_FILE))
+    cache = DatasetCache(cache_dir=str(tmp_path), max_size_bytes=trips_size)
+
+    trips_path = cache.get(processed_data_url + TRIPS_FILE)
+    weather_path = cache.get(processed_data_url + WEATHER_FILE)
+
+    assert cache.evictions == 1
+    assert not os.path.exists(trips_path)
+    assert os.path.exists(weather_path)
+
+
+def test_cache_keeps_pinned_files(processed_data_url, tmp_path):
+    trips_size = os.path.getsize(os.path.join(PROCESSED_DATA_DIR, TRIPS_FILE))
+    cache = DatasetCache(cache_dir=str(tmp_path), max_size_bytes=trips_size)
+
+    with cache.pinned(processed_data_url + TRIPS_FILE) as trips_path:
+        # A parallel fetch would evict the file before it is read
+        cache.get(processed_data_url + WEATHER_FILE)
+        assert cache.evictions == 0
+        pd.read_parquet(trips_path)
+
+    # Evicted once released
+    assert cache.evictions == 1
+    assert not os.path.exists(trips_path)
+
+
+def test_cache_processes_share_the_index(processed_data_url, tmp_path):
+    # Both caches are opened before either file is stored
+    first = DatasetCache(cache_dir=str(tmp_path))
+    second = DatasetCache(cache_dir=str(tmp_path))
+
+    first.get(processed_data_url + TRIPS_FILE)
+    second.get(processed_data_url + WEATHER_FILE)
+    cache = DatasetCache(cache_dir=str(tmp_path), offline=True)
+
+    cache.get(processed_data_url + TRIPS_FILE)
+    cache.get(processed_data_url + WEATHER_FILE)
+    assert cache.stats["hits"] == 2
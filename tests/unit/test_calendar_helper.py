@@ -0,0 +1,79 @@
+import datetime
+import holidays
+import numpy as np
+import pandas as pd
+from utils.calendar_helper import (
+    CYCLICAL_FEATURE_COLUMNS,
+    CalendarTable,
+    HolidayCache,
+    get_calendar_table,
+)
+
+
+def legacy_cyclical_features(timestamps: pd.DatetimeIndex) -> pd.DataFrame:
+    """Features as ``data_preprocessor`` computed them with pandas."""
+    data = pd.DataFrame({"date": timestamps.normalize()})
+    hour = pd.Series(timestamps.hour)
+    weekday = data["date"].dt.dayofweek
+    week_num = data["date"].dt.isocalendar().week
+    mnth = data["date"].dt.month
+    return pd.DataFrame(
+        {
+            "hr_sin": np.sin(hour * (2.0 * np.pi / 24)),
+            "hr_cos": np.cos(hour * (2.0 * np.pi / 24)),
+            "weekday_sin": np.sin(weekday * (2.0 * np.pi / 7)),
+            "weekday_cos": np.cos(weekday * (2.0 * np.pi / 7)),
+            "week_sin": np.sin((week_num - 1) * (2 * np.pi / 52)).astype(
+                "float64"
+            ),
+            "week_cos": np.cos((week_num - 1) * (2 * np.pi / 52)).astype(
+                "float64"
+            ),
+            "mnth_sin": np.sin((mnth - 1) * (2.0 * np.pi / 12)),
+            "mnth_cos": np.cos((mnth - 1) * (2.0 * np.pi / 12)),
+        }
+    )
+
+
+def test_lookup_matches_legacy_features():
+    # Includes hours before and after the precomputed range
+    timestamps = pd.DatetimeIndex(
+        np.random.default_rng(42).choice(
+            pd.date_range("2010-01-01", "2040-12-31 23:00", freq="h"), 5000
+        )
+    )
+    days = timestamps.to_numpy().astype("datetime64[D]")
+
+    features = get_calendar_table().lookup(days, timestamps.hour)
+
+    np.testing.assert_array_equal(
+        features,
+        legacy_cyclical_features(timestamps)[
+            CYCLICAL_FEATURE_COLUMNS
+        ].to_numpy(),
+    )
+
+
+def test_lookup_holidays_matches_holidays_package():
+    table = CalendarTable(start_date="2024-01-01", end_date="2024-12-31")
+    dates = [
+        datetime.date(2024, 7, 4),
+        datetime.date(2024, 7, 5),
+        datetime.date(2025, 12, 25),
+        datetime.date(2023, 1, 2),
+    ]
+
+    flags = table.lookup_holidays(np.array(dates, dtype="datetime64[D]"))
+
+    expected = [int(date in holidays.US(years=date.year)) for date in dates]
+    assert flags.tolist() == expected
+
+
+def test_holiday_cache_is_bounded_by_years():
+    holiday_cache = HolidayCache(max_years=2)
+
+    holiday_cache.warm_up([2023, 2024, 2025])
+
+    assert holiday_cache.is_holiday(datetime.date(2025, 7, 4)) == 1
+    assert holiday_cache.is_holiday(datetime.datetime(2025, 7, 5, 10)) == 0
+    assert sorted(holiday_cache._years) == [2024, 2025]
@@ -0,0 +1,121 @@
+import datetime
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from steps.data_loaders import (
+    CYCLICAL_FEATURE_COLUMNS,
+    data_preprocessor,
+    build_datetime_index,
+    load_data_by_years,
+    read_data_url,
+)
+from steps.data_partitioner import write_parquet_by_month
+from conftest import PROCESSED_DATA_DIR
+
+
+def test_build_datetime_index_matches_row_combine():
+    data = pd.DataFrame(
+        {
+            "date": pd.to_datetime(
+                ["2023-12-31", "2024-01-01", "2024-01-01", "2024-02-29"]
+            ),
+            "hour": pd.Series([23, 0, 13, 7], dtype="int32"),
+        }
+    )
+    expected = pd.DatetimeIndex(
+        data.apply(
+            lambda row: datetime.datetime.combine(
+                row.date.date(), datetime.time(row.hour)
+            ),
+            axis=1,
+        )
+    )
+
+    index = build_datetime_index(data["date"], data["hour"])
+
+    assert index.equals(expected)
+    assert index.dtype == expected.dtype
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_load_data_by_years_keeps_year_order(processed_data_url, max_workers):
+    years = [2025, 2024]
+
+    trips_data_list, weather_data_list = load_data_by_years(
+        base_url=processed_data_url, years=years, max_workers=max_workers
+    )
+
+    for year, trips_data, weather_data in zip(
+        years, trips_data_list, weather_data_list
+    ):
+        pd.testing.assert_frame_equal(
+            trips_data,
+            pd.read_parquet(
+                f"{PROCESSED_DATA_DIR}/citibike/"
+                f"{year}-citibike-tripdata.parquet"
+            ),
+        )
+        pd.testing.assert_frame_equal(
+            weather_data,
+            pd.read_parquet(
+                f"{PROCESSED_DATA_DIR}/weather/{year}-weather.parquet"
+            ),
+        )
+
+
+def test_read_data_url_pushes_date_range_down(tmp_path):
+    source_path = (
+        f"{PROCESSED_DATA_DIR}/citibike/2024-citibike-tripdata.parquet"
+    )
+    target_path = str(tmp_path / "2024-citibike-tripdata.parquet")
+
+    num_row_groups = write_parquet_by_month(
+        source_path=source_path, target_path=target_path, date_column="date"
+    )
+
+    # 2024 plus the 2023-12-31 boundary rows
+    assert num_row_groups == 13
+    assert pq.ParquetFile(target_path).metadata.num_row_groups == 13
+
+    data = read_data_url(
+        target_path,
+        columns=["date", "trips"],
+        date_column="date",
+        start_date=datetime.date(2024, 2, 1),
+        end_date=datetime.date(2024, 2, 29),
+    )
+    expected = pd.read_parquet(source_path)
+    expected = expected[
+        (expected["date"] >= "2024-02-01") & (expected["date"] <= "2024-02-29")
+    ][["date", "trips"]]
+
+    assert list(data.columns) == ["date", "trips"]
+    pd.testing.assert_frame_equal(
+        data.reset_index(drop=True), expected.reset_index(drop=True)
+    )
+
+
+def test_lean_preprocessor_matches_default_features():
+    dates = pd.date_range("2015-12-25", "2027-01-05", freq="D")
+    dataset = pd.DataFrame(
+        {
+            "date": dates.repeat(2),
+            "hour": [0, 13] * len(dates),
+            "trips": 1,
+            "holiday": 0,
+            "DATE": dates.repeat(2),
+            "TMAX": 50.0,
+            "TMIN": 40.0,
+            "SNOW": 0.0,
+        }
+    )
+
+    expected = data_preprocessor.entrypoint(dataset)
+    data = data_preprocessor.entrypoint(
+        dataset, lean=True, downcast_weather=True
+    )
+
+    assert list(data.columns) == list(expected.columns)
+    assert (data[CYCLICAL_FEATURE_COLUMNS].dtypes == "float32").all()
+    assert (data[["TMAX", "TMIN", "SNOW"]].dtypes == "float32").all()
+    pd.testing.assert_frame_equal(data, expected, check_dtype=False, atol=1e-6)
@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+import xgboost as xgb
+from steps.data_loaders import (
+    DATASET_CATEGORICAL_COLUMNS,
+    DATASET_NUMERICAL_COLUMNS,
+    DATASET_TARGET_COLUMN_NAME,
+)
+from steps.inference_predict import inference_predict
+
+MODEL_COLUMNS = DATASET_CATEGORICAL_COLUMNS + DATASET_NUMERICAL_COLUMNS
+
+
+@pytest.fixture(scope="module")
+def dataset_and_model():
+    dataset = pd.read_parquet("data/test/test-modeling.parquet")
+    model = xgb.XGBRegressor(n_estimators=30, max_depth=4)
+    model.fit(dataset[MODEL_COLUMNS], dataset[DATASET_TARGET_COLUMN_NAME])
+    return dataset, model
+
+
+@pytest.mark.parametrize("backend", ["xgboost", "compiled"])
+@pytest.mark.parametrize("chunk_size,max_workers", [(1000, 1), (777, 4)])
+def test_chunked_predictions_match_whole_dataset(
+    dataset_and_model, backend, chunk_size, max_workers
+):
+    dataset, model = dataset_and_model
+    expected, _ = inference_predict.entrypoint(
+        model,
+        dataset.copy(),
+        categorical_feats=DATASET_CATEGORICAL_COLUMNS,
+        numerical_feats=DATASET_NUMERICAL_COLUMNS,
+        backend=backend,
+    )
+
+    actual, _ = inference_predict.entrypoint(
+        model,
+        dataset.copy(),
+        categorical_feats=DATASET_CATEGORICAL_COLUMNS,
+        numerical_feats=DATASET_NUMERICAL_COLUMNS,
+        backend=backend,
+        chunk_size=chunk_size,
+        max_workers=max_workers,
+    )
+
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_compiled_backend_checks_feature_order(dataset_and_model):
+    dataset, model = dataset_and_model
+
+    with pytest.raises(ValueError, match="don't match"):
+        inference_predict.entrypoint(
+            model,
+            dataset.copy(),
+            categorical_feats=DATASET_NUMERICAL_COLUMNS,
+            numerical_feats=DATASET_CATEGORICAL_COLUMNS,
+            backend="compiled",
+        )
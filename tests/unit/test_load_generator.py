@@ -0,0 +1,63 @@
+from benchmarks.load_generator import (
+    InProcessTarget,
+    check_thresholds,
+    run_closed_loop,
+    run_open_loop,
+    summarize,
+)
+from benchmarks.request_mix import default_request_mix
+
+
+def test_summarize_counts_errors_and_buckets():
+    records = [
+        ("predict", 0.0005, True),
+        ("predict", 0.003, True),
+        ("predict_trip", 0.3, False),
+    ]
+
+    report = summarize(records, elapsed=1.0)
+
+    assert report["requests"] == 3
+    assert report["errors"] == 1
+    assert report["throughput_rps"] == 2.0
+    # <= 1ms, <= 5ms and <= 500ms buckets
+    assert (
+        report["histogram_ms"]["counts"]
+        == [1, 0, 1, 0, 0, 0, 0, 0, 1] + [0] * 4
+    )
+    assert report["endpoints"]["predict_trip"]["error_rate"] == 1.0
+    assert check_thresholds(report, max_p99_ms=1000, max_error_rate=0.5) == []
+    assert len(check_thresholds(report, max_p99_ms=1, max_error_rate=0.1)) == 2
+
+
+def test_in_process_replay_of_the_default_mix():
+    from tests.unit.conftest import make_model, make_service
+
+    request_mix = default_request_mix()
+    request_mix.append(
+        {"endpoint": "predict_batched", "payload": request_mix[0]["payload"]}
+    )
+    request_mix.append({"endpoint": "predict", "payload": {"input_data": 1}})
+    target = InProcessTarget(make_service(make_model(n_rows=200)))
+    try:
+        closed_loop = run_closed_loop(
+            target, request_mix, concurrency=2, duration=0.5
+        )
+        open_loop = run_open_loop(target, request_mix, qps=50, duration=0.4)
+    finally:
+        target.close()
+
+    assert open_loop["requests"] == 20
+    for report in [closed_loop, open_loop]:
+        assert set(report["endpoints"]) == {
+            "predict",
+            "predict_batched",
+            "predict_trip",
+        }
+        assert report["endpoints"]["predict_batched"]["errors"] == 0
+        assert report["endpoints"]["predict_trip"]["errors"] == 0
+        # Only the invalid payload fails
+        assert 0 < report["endpoints"]["predict"]["errors"]
+        assert report["endpoints"]["predict"]["errors"] < (
+            report["endpoints"]["predict"]["requests"]
+        )
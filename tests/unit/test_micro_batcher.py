@@ -0,0 +1,78 @@
+import asyncio
+import numpy as np
+import pytest
+from micro_batcher import MicroBatcher
+
+
+def run_concurrently(batcher, requests):
+    async def main():
+        try:
+            return await asyncio.gather(
+                *(batcher.submit(features) for features in requests),
+                return_exceptions=True,
+            )
+        finally:
+            await batcher.close()
+
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_share_one_call():
+    calls = []
+    realized = []
+
+    def predict(features):
+        calls.append(len(features))
+        return features.sum(axis=1)
+
+    batcher = MicroBatcher(
+        predict,
+        max_batch_size=100,
+        max_latency_ms=50,
+        on_batch=lambda size, queue_times: realized.append(
+            (size, len(queue_times))
+        ),
+    )
+    requests = [np.full((i + 1, 3), float(i)) for i in range(5)]
+
+    results = run_concurrently(batcher, requests)
+
+    assert calls == [15]
+    assert realized == [(15, 5)]
+    for i, preds in enumerate(results):
+        np.testing.assert_array_equal(preds, np.full(i + 1, 3.0 * i))
+
+
+def test_batches_are_bounded_by_max_batch_size():
+    calls = []
+
+    def predict(features):
+        calls.append(len(features))
+        return features[:, 0]
+
+    batcher = MicroBatcher(predict, max_batch_size=4, max_latency_ms=50)
+    requests = [np.full((2, 1), float(i)) for i in range(5)] + [
+        np.full((6, 1), 5.0)
+    ]
+
+    results = run_concurrently(batcher, requests)
+
+    assert calls == [4, 4, 2, 6]
+    for i, preds in enumerate(results):
+        np.testing.assert_array_equal(preds, np.full(len(requests[i]), i))
+
+
+def test_errors_are_raised_to_every_request_of_the_batch():
+    def predict(features):
+        raise ValueError("booster failure")
+
+    batcher = MicroBatcher(predict, max_batch_size=10, max_latency_ms=50)
+
+    results = run_concurrently(batcher, [np.ones((1, 2))] * 3)
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_invalid_configuration():
+    with pytest.raises(ValueError):
+        MicroBatcher(lambda x: x, max_batch_size=0)
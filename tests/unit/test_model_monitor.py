@@ -0,0 +1,366 @@
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+from sqlalchemy import create_engine
+import steps.model_monitor
+from steps.data_loaders import (
+    DATASET_CATEGORICAL_COLUMNS,
+    DATASET_NUMERICAL_COLUMNS,
+    DATASET_PREDICTION_COLUMN_NAME,
+    DATASET_TARGET_COLUMN_NAME,
+)
+from steps.model_monitor import (
+    Base,
+    CitibikeMetrics,
+    calculate_drift_metrics_step,
+    get_engine,
+    incremental_window_range,
+    incremental_window_range_step,
+    reference_profile_loader,
+    upsert_metrics,
+)
+from utils.drift_helper import ReferenceProfile
+from utils.window_helper import window_key
+
+MODEL_COLUMNS = DATASET_CATEGORICAL_COLUMNS + DATASET_NUMERICAL_COLUMNS
+
+
+@pytest.fixture(scope="module")
+def monitoring_data():
+    """Scored reference (2024) and current (2025 Q1) data."""
+    reference_data = pd.read_parquet("data/test/train-modeling.parquet")
+    current_data = pd.read_parquet("data/test/test-modeling.parquet")
+    model = xgb.XGBRegressor(n_estimators=20, max_depth=4)
+    model.fit(
+        reference_data[MODEL_COLUMNS],
+        reference_data[DATASET_TARGET_COLUMN_NAME],
+    )
+    for data in [reference_data, current_data]:
+        data[DATASET_PREDICTION_COLUMN_NAME] = model.predict(
+            data[MODEL_COLUMNS]
+        )
+    columns = MODEL_COLUMNS + [
+        DATASET_TARGET_COLUMN_NAME,
+        DATASET_PREDICTION_COLUMN_NAME,
+    ]
+    return reference_data[columns], current_data[columns]
+
+
+def calculate_drift_metrics(reference_data, current_data, **kwargs):
+    return calculate_drift_metrics_step.entrypoint(
+        reference_data=reference_data,
+        current_data=current_data.copy(),
+        target=DATASET_TARGET_COLUMN_NAME,
+        prediction=DATASET_PREDICTION_COLUMN_NAME,
+        categorical_feats=DATASET_CATEGORICAL_COLUMNS,
+        numerical_feats=DATASET_NUMERICAL_COLUMNS,
+        **kwargs,
+    )
+
+
+def test_parallel_drift_metrics_match_serial(monitoring_data):
+    reference_data, current_data = monitoring_data
+
+    serial = calculate_drift_metrics(reference_data, current_data)
+    parallel = calculate_drift_metrics(
+        reference_data, current_data, max_workers=3
+    )
+
+    # ISO weeks 1 to 14 of 2025
+    assert len(serial) == 14
+    pd.testing.assert_frame_equal(parallel, serial)
+
+
+@pytest.mark.parametrize(
+    "window",
+    [
+        {},
+        # Sliding windows of two weeks every week
+        {"window_granularity": "day", "window_size": 14, "window_step": 7},
+    ],
+)
+def test_native_drift_metrics_match_evidently(monitoring_data, window):
+    reference_data, current_data = monitoring_data
+
+    evidently = calculate_drift_metrics(reference_data, current_data, **window)
+    native = calculate_drift_metrics(
+        reference_data, current_data, engine="native", **window
+    )
+
+    # Evidently computes some statistics on the float32 predictions
+    pd.testing.assert_frame_equal(
+        native, evidently, check_exact=False, rtol=1e-6
+    )
+
+
+def test_native_engine_falls_back_to_evidently_on_small_reference(
+    monitoring_data,
+):
+    reference_data, current_data = monitoring_data
+    # Too few rows for the tests the native engine implements
+    reference_data = reference_data.iloc[:500]
+    current_data = current_data[:"2025-01-26"]
+
+    evidently = calculate_drift_metrics(reference_data, current_data)
+    native = calculate_drift_metrics(
+        reference_data, current_data, engine="native"
+    )
+
+    pd.testing.assert_frame_equal(native, evidently)
+
+
+def test_native_drift_metrics_reuse_reference_profile(monitoring_data):
+    reference_data, current_data = monitoring_data
+    profile = ReferenceProfile(
+        reference_data,
+        target=DATASET_TARGET_COLUMN_NAME,
+        prediction=DATASET_PREDICTION_COLUMN_NAME,
+        numerical_columns=DATASET_CATEGORICAL_COLUMNS,
+        categorical_columns=DATASET_NUMERICAL_COLUMNS,
+    )
+
+    native = calculate_drift_metrics(
+        reference_data, current_data, engine="native"
+    )
+    reused = calculate_drift_metrics(
+        reference_data,
+        current_data,
+        engine="native",
+        reference_profile=profile,
+    )
+
+    pd.testing.assert_frame_equal(reused, native)
+
+
+def test_reference_profile_is_loaded_from_the_store(
+    processed_data_url, tmp_path, monkeypatch
+):
+    reference_data = pd.read_parquet("data/test/train-modeling.parquet")
+    model = xgb.XGBRegressor(n_estimators=5, max_depth=3)
+    model.fit(
+        reference_data[MODEL_COLUMNS],
+        reference_data[DATASET_TARGET_COLUMN_NAME],
+    )
+
+    loads = []
+    load_data = steps.model_monitor.data_loader.entrypoint
+
+    def counting_load_data(**kwargs):
+        loads.append(kwargs)
+        return load_data(**kwargs)
+
+    monkeypatch.setattr(
+        "steps.model_monitor.data_loader.entrypoint", counting_load_data
+    )
+
+    def load_reference_profile(**kwargs):
+        return reference_profile_loader.entrypoint(
+            model=model,
+            base_url=processed_data_url,
+            start_reference_date=datetime.date(2024, 1, 1),
+            end_reference_date=datetime.date(2024, 2, 29),
+            profile_dir=str(tmp_path),
+            categorical_feats=DATASET_CATEGORICAL_COLUMNS,
+            numerical_feats=DATASET_NUMERICAL_COLUMNS,
+            **kwargs,
+        )
+
+    scored, profile = load_reference_profile()
+    # A matching entry is read back without loading the data again
+    stored, stored_profile = load_reference_profile()
+    assert len(loads) == 1
+    # Another prediction backend scores the data again
+    load_reference_profile(prediction_backend="compiled")
+    assert len(loads) == 2
+
+    assert DATASET_PREDICTION_COLUMN_NAME in scored.columns
+    pd.testing.assert_frame_equal(stored, scored, check_freq=False)
+    assert stored_profile.reference_fields() == profile.reference_fields()
+
+
+def make_metrics(n_rows, value):
+    columns = [column.name for column in CitibikeMetrics.__table__.columns]
+    metrics = pd.DataFrame(
+        {column: value for column in columns[1:]}, index=range(n_rows)
+    )
+    metrics["timestamp"] = [
+        datetime.date(2025, 1, 5) + datetime.timedelta(weeks=i)
+        for i in range(n_rows)
+    ]
+    metrics["num_drifted_columns"] = 3
+    return metrics[columns]
+
+
+def test_upsert_metrics_overwrites_stored_windows():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+
+    upsert_metrics(engine, make_metrics(5, 0.5), batch_size=2)
+    # A rerun over an overlapping range updates the stored windows
+    rerun = make_metrics(7, 1.5)
+    rerun.loc[6, "r2_score_current"] = np.nan
+    assert upsert_metrics(engine, rerun, batch_size=2) == 7
+
+    stored = pd.read_sql_table("citibike_metrics", engine)
+    assert len(stored) == 7
+    assert (stored["prediction_drift"] == 1.5).all()
+    assert stored["r2_score_current"].isna().sum() == 1
+    assert (stored["num_drifted_columns"] == 3).all()
+
+
+def test_engine_is_shared():
+    assert get_engine("sqlite://") is get_engine("sqlite://")
+
+
+def test_only_changed_windows_are_computed(monitoring_data):
+    reference_data, current_data = monitoring_data
+    metrics = calculate_drift_metrics(
+        reference_data, current_data, engine="native"
+    )
+    stored_hashes = dict(
+        zip(map(window_key, metrics["timestamp"]), metrics["content_hash"])
+    )
+
+    # A late correction of the trips of one day of the third week
+    current_data = current_data.copy()
+    current_data.loc["2025-01-14", DATASET_TARGET_COLUMN_NAME] += 1
+    changed = calculate_drift_metrics(
+        reference_data,
+        current_data,
+        engine="native",
+        stored_hashes=stored_hashes,
+    )
+
+    assert changed["timestamp"].tolist() == [metrics["timestamp"][2]]
+    assert changed["content_hash"][0] != metrics["content_hash"][2]
+
+
+def test_incremental_window_range():
+    engine = create_engine("sqlite://")
+    start = datetime.datetime(2025, 1, 1)
+    end = datetime.datetime(2025, 3, 31)
+
+    assert incremental_window_range(engine, start, end) == (start, {})
+
+    Base.metadata.create_all(engine)
+    metrics = make_metrics(3, 0.5)
+    metrics["content_hash"] = ["a", "b", "c"]
+    upsert_metrics(engine, metrics)
+
+    # The last stored week, Monday 2025-01-13 to Sunday 2025-01-19, is
+    # checked again
+    assert incremental_window_range(engine, start, end) == (
+        datetime.datetime(2025, 1, 13),
+        {"2025-01-19T00:00:00": "c"},
+    )
+    assert incremental_window_range(
+        engine, start, end, lookback_windows=0
+    ) == (datetime.datetime(2025, 1, 20), {})
+
+
+def test_incremental_range_is_queried_when_the_step_runs(
+    tmp_path, monkeypatch
+):
+    url = f"sqlite:///{tmp_path / 'monitoring.db'}"
+    monkeypatch.setattr(
+        "steps.model_monitor.monitoring_database_url",
+        lambda host, port, database: url,
+    )
+    engine = get_engine(url)
+    Base.metadata.create_all(engine)
+    start = datetime.datetime(2025, 1, 1)
+
+    def incremental_range():
+        return incremental_window_range_step.entrypoint(
+            host="monitoring-db",
+            port=5433,
+            database="monitoring",
+            start_current_date=start,
+            end_current_date=datetime.datetime(2025, 3, 31),
+        )
+
+    assert incremental_range() == (start.isoformat(), {})
+    # The next run starts from the windows stored since
+    metrics = make_metrics(3, 0.5)
+    metrics["content_hash"] = ["a", "b", "c"]
+    upsert_metrics(engine, metrics)
+    assert incremental_range() == (
+        "2025-01-13T00:00:00",
+        {"2025-01-19T00:00:00": "c"},
+    )
+
+
+def test_partial_window_is_completed_by_incremental_run(monitoring_data):
+    reference_data, current_data = monitoring_data
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    start = datetime.datetime(2025, 1, 1)
+
+    # First run with data up to Wednesday 2025-01-15
+    upsert_metrics(
+        engine,
+        calculate_drift_metrics(
+            reference_data, current_data[:"2025-01-15"], engine="native"
+        ),
+    )
+    # Incremental run once the rest of the week arrived
+    end = datetime.datetime(2025, 1, 26)
+    incremental_start, stored_hashes = incremental_window_range(
+        engine, start, end
+    )
+    upsert_metrics(
+        engine,
+        calculate_drift_metrics(
+            reference_data,
+            current_data[incremental_start:"2025-01-26"],
+            engine="native",
+            stored_hashes=stored_hashes,
+        ),
+    )
+
+    stored = pd.read_sql_table("citibike_metrics", engine)
+    full = calculate_drift_metrics(
+        reference_data, current_data[:"2025-01-26"], engine="native"
+    )
+    # The partial week was overwritten, not stored next to the full one
+    assert incremental_start == datetime.datetime(2025, 1, 13)
+    assert stored["timestamp"].dt.date.tolist() == [
+        datetime.date(2025, 1, day) for day in [5, 12, 19, 26]
+    ]
+    assert stored["prediction_drift"].tolist() == pytest.approx(
+        full["prediction_drift"].tolist()
+    )
+
+
+def test_windows_stored_by_last_data_day_are_replaced(monitoring_data):
+    reference_data, current_data = monitoring_data
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    start = datetime.datetime(2025, 1, 1)
+
+    # Earlier runs keyed a window on its last data day and stored no hash,
+    # here Wednesday 2025-01-15 for the partial third week
+    baseline = calculate_drift_metrics(
+        reference_data, current_data[:"2025-01-15"], engine="native"
+    ).drop(columns="content_hash")
+    baseline.loc[baseline.index[-1], "timestamp"] = datetime.date(2025, 1, 15)
+    upsert_metrics(engine, baseline)
+
+    end = datetime.datetime(2025, 1, 26)
+    incremental_start, stored_hashes = incremental_window_range(
+        engine, start, end
+    )
+    metrics = calculate_drift_metrics(
+        reference_data,
+        current_data[incremental_start:"2025-01-26"],
+        engine="native",
+        stored_hashes=stored_hashes,
+    )
+    upsert_metrics(engine, metrics, window_granularity="week")
+
+    stored = pd.read_sql_table("citibike_metrics", engine)
+    assert stored["timestamp"].dt.date.tolist() == [
+        datetime.date(2025, 1, day) for day in [5, 12, 19, 26]
+    ]
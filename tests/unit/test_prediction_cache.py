@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+import prediction_cache
+from prediction_cache import PredictionCache
+
+
+class CountingModel:
+    def __init__(self, offset=0.0):
+        self.offset = offset
+        self.rows = []
+
+    def __call__(self, features):
+        self.rows.append(len(features))
+        return (features.sum(axis=1) + self.offset).astype(np.float32)
+
+
+def test_repeated_rows_are_served_from_cache():
+    cache = PredictionCache(max_size=10)
+    model = CountingModel()
+    features = np.arange(12, dtype="float64").reshape(4, 3)
+
+    first = cache.predict(features, model, "v1")
+    # Same rows, as float32, plus a new one
+    second = cache.predict(
+        np.vstack([features[1:].astype(np.float32), [[1.0, 1.0, 1.0]]]),
+        model,
+        "v1",
+    )
+
+    np.testing.assert_array_equal(first, model(features))
+    np.testing.assert_array_equal(second, [12, 21, 30, 3])
+    assert model.rows[:2] == [4, 1]
+    assert cache.stats == {
+        "hits": 3,
+        "misses": 5,
+        "evictions": 0,
+        "hit_ratio": 3 / 8,
+    }
+
+
+def test_close_rows_keep_their_own_predictions():
+    cache = PredictionCache(max_size=10)
+
+    def model(features):
+        # A split between two values that a 4 decimal key would merge
+        return np.where(features[:, 0] < 0.50001, 1.0, 2.0).astype(np.float32)
+
+    below = cache.predict(np.array([[0.5]]), model, "v1")
+    above = cache.predict(np.array([[0.50002]]), model, "v1")
+
+    assert (below[0], above[0]) == (1.0, 2.0)
+    assert cache.stats["hits"] == 0
+
+
+def test_least_recently_used_rows_are_evicted():
+    evictions = []
+    cache = PredictionCache(
+        max_size=2, on_lookup=lambda h, m, e: evictions.append(e)
+    )
+    model = CountingModel()
+    rows = np.eye(3)
+
+    cache.predict(rows[[0, 1]], model, "v1")
+    cache.predict(rows[[0]], model, "v1")
+    cache.predict(rows[[2]], model, "v1")
+    cache.predict(rows[[0]], model, "v1")
+
+    assert evictions == [0, 0, 1, 0]
+    assert len(cache) == 2
+    assert cache.stats["hits"] == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(prediction_cache.time, "monotonic", lambda: now[0])
+    cache = PredictionCache(max_size=10, ttl_seconds=60)
+    model = CountingModel()
+    features = np.ones((1, 3))
+
+    cache.predict(features, model, "v1")
+    now[0] += 59
+    cache.predict(features, model, "v1")
+    now[0] += 2
+    cache.predict(features, model, "v1")
+
+    assert model.rows == [1, 1]
+
+
+def test_entries_are_keyed_on_model_version():
+    cache = PredictionCache(max_size=10)
+    features = np.ones((1, 3))
+
+    assert cache.predict(features, CountingModel(), "v1")[0] == 3
+    assert cache.predict(features, CountingModel(offset=1), "v2")[0] == 4
+
+
+def test_disabled_cache_always_predicts():
+    cache = PredictionCache(max_size=0)
+    model = CountingModel()
+
+    for _ in range(2):
+        cache.predict(np.ones((2, 3)), model, "v1")
+
+    assert model.rows == [2, 2]
+    assert len(cache) == 0
+
+
+def test_invalid_size():
+    with pytest.raises(ValueError):
+        PredictionCache(max_size=-1)
@@ -0,0 +1,87 @@
+import datetime
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from utils.drift_helper import ReferenceProfile
+from utils.profile_helper import (
+    ReferenceProfileStore,
+    profile_key,
+    profile_key_fields,
+)
+
+FEATURES = ["a", "b"]
+
+
+def make_model(n_estimators=2):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.random((50, 2)), columns=FEATURES)
+    model = xgb.XGBRegressor(n_estimators=n_estimators, max_depth=2)
+    return model.fit(X, X["a"] + X["b"])
+
+
+def make_reference(n_rows=2000):
+    rng = np.random.default_rng(1)
+    reference_data = pd.DataFrame(
+        rng.random((n_rows, 4)), columns=FEATURES + ["target", "prediction"]
+    )
+    reference_data.index = pd.date_range(
+        "2024-01-01", periods=n_rows, freq="h"
+    )
+    return reference_data
+
+
+def test_profile_key_changes_with_its_inputs():
+    model = make_model()
+    start, end = datetime.date(2024, 1, 1), datetime.date(2024, 3, 31)
+    key = profile_key(profile_key_fields(model, start, end, FEATURES))
+
+    # Dates and datetimes of the same day give the same key
+    assert key == profile_key(
+        profile_key_fields(
+            make_model(),
+            datetime.datetime(2024, 1, 1),
+            datetime.datetime(2024, 3, 31),
+            FEATURES,
+        )
+    )
+    assert key != profile_key(
+        profile_key_fields(make_model(3), start, end, FEATURES)
+    )
+    assert key != profile_key(
+        profile_key_fields(model, start, datetime.date(2024, 4, 30), FEATURES)
+    )
+    assert key != profile_key(
+        profile_key_fields(model, start, end, FEATURES[::-1])
+    )
+    assert key != profile_key(
+        profile_key_fields(model, start, end, FEATURES, {"lean": True})
+    )
+
+
+def test_store_round_trip(tmp_path):
+    store = ReferenceProfileStore(str(tmp_path))
+    key_fields = profile_key_fields(
+        make_model(), "2024-01-01", "2024-03-31", FEATURES
+    )
+    reference_data = make_reference()
+    profile = ReferenceProfile(
+        reference_data,
+        target="target",
+        prediction="prediction",
+        numerical_columns=FEATURES,
+        categorical_columns=[],
+    )
+
+    assert store.load(key_fields) is None
+    store.save(key_fields, reference_data, profile)
+    stored_data, stored_profile = ReferenceProfileStore(str(tmp_path)).load(
+        key_fields
+    )
+
+    pd.testing.assert_frame_equal(
+        stored_data, reference_data, check_freq=False
+    )
+    assert stored_profile.reference_fields() == profile.reference_fields()
+    assert stored_profile.matches("target", "prediction", FEATURES, [])
+    assert not stored_profile.matches("target", "prediction", [], FEATURES)
+    assert (store.hits, store.misses) == (0, 1)
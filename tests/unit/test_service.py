@@ -0,0 +1,304 @@
+import asyncio
+import datetime
+import io
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+import subprocess
+import sys
+from types import SimpleNamespace
+import bentoml.models
+from bentoml.exceptions import InvalidArgument
+import service
+
+
+def test_build_trip_features_matches_row_features():
+    dates = [
+        datetime.datetime(2024, 7, 4, 15, 30),
+        datetime.datetime(2025, 1, 1, 0),
+        datetime.datetime(2025, 12, 29, 23),
+    ]
+
+    features = service.build_trip_features(
+        dates=dates, tmax=[80.0, 40.0, 30.0], tmin=[70, 30, 20], snow=[0, 0, 1]
+    )
+
+    expected = pd.DataFrame(
+        [
+            {
+                "holiday": service.is_holiday(date),
+                "TMAX": tmax,
+                "TMIN": tmin,
+                "SNOW": snow,
+            }
+            | service.get_datetime_features(date)
+            for date, tmax, tmin, snow in zip(
+                dates, [80.0, 40.0, 30.0], [70.0, 30.0, 20.0], [0.0, 0.0, 1.0]
+            )
+        ]
+    )
+    pd.testing.assert_frame_equal(features, expected)
+
+
+def test_batched_endpoints_match_unbatched(model):
+    from tests.unit.conftest import make_raw_inputs, make_service
+
+    instance = make_service(model)
+    raw_inputs = make_raw_inputs(20)
+    inputs = [
+        instance.CitibikeInput(**row)
+        for row in service.build_trip_features(
+            dates=[item.date for item in raw_inputs],
+            tmax=[item.TMAX for item in raw_inputs],
+            tmin=[item.TMIN for item in raw_inputs],
+            snow=[item.SNOW for item in raw_inputs],
+        ).to_dict("records")
+    ]
+
+    async def main():
+        return await asyncio.gather(
+            instance.predict_trip_batched(raw_inputs[:7]),
+            instance.predict_trip_batched(raw_inputs[7:]),
+            instance.predict_batched(inputs),
+        )
+
+    first, second, prepared = asyncio.run(main())
+
+    expected = instance.predict_trip(raw_inputs)["predictions"]
+    assert first["predictions"] + second["predictions"] == expected
+    assert prepared["predictions"] == expected
+
+
+def test_predict_fast_matches_predict(model):
+    from tests.unit.conftest import make_service
+
+    instance = make_service(model)
+    rng = np.random.default_rng(0)
+    records = [
+        dict(zip(service.MODEL_FEATURE_COLUMNS, row))
+        for row in rng.normal(size=(10, len(service.MODEL_FEATURE_COLUMNS)))
+    ]
+    for record in records:
+        record["holiday"] = int(record["holiday"] > 0)
+    # Parse the body like the server does
+    input_spec = service.CitibikeService.apis["predict_fast"].input_spec
+    body = json.dumps({"input_data": records}).encode()
+
+    response = instance.predict_fast(
+        input_spec.model_validate_json(body).input_data
+    )
+
+    expected = instance.predict(
+        [instance.CitibikeInput(**record) for record in records]
+    )["predictions"]
+    actual = json.loads(response.body)
+    assert actual["model"] == service.MODEL_NAME
+    assert actual["predictions"] == [p["prediction"] for p in expected]
+
+
+def test_decode_input_features_rejects_missing_columns():
+    with pytest.raises(InvalidArgument):
+        service.decode_input_features([{"holiday": 0}])
+
+
+def test_columnar_layout_matches_processed_datasets():
+    from steps.data_loaders import (
+        DATASET_CATEGORICAL_COLUMNS,
+        DATASET_NUMERICAL_COLUMNS,
+    )
+
+    assert service.COLUMNAR_FEATURE_COLUMNS == (
+        DATASET_NUMERICAL_COLUMNS + DATASET_CATEGORICAL_COLUMNS
+    )
+
+
+@pytest.mark.parametrize(
+    "payload_format", ["arrow_stream", "arrow_file", "npy"]
+)
+def test_predict_columnar_matches_predict(tmp_path, payload_format, model):
+    from tests.unit.conftest import make_service
+
+    instance = make_service(model)
+    rng = np.random.default_rng(0)
+    columnar = pd.DataFrame(
+        rng.normal(size=(10, len(service.COLUMNAR_FEATURE_COLUMNS))),
+        columns=service.COLUMNAR_FEATURE_COLUMNS,
+    )
+    columnar["holiday"] = rng.integers(0, 2, len(columnar))
+
+    payload = tmp_path / "payload"
+    if payload_format == "npy":
+        np.save(payload, columnar.to_numpy(dtype="float32"))
+        payload = payload.with_suffix(".npy")
+    else:
+        table = pa.Table.from_pandas(columnar, preserve_index=False)
+        new_writer = (
+            pa.ipc.new_file
+            if payload_format == "arrow_file"
+            else pa.ipc.new_stream
+        )
+        with pa.OSFile(str(payload), "wb") as sink:
+            with new_writer(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    response = instance.predict_columnar(payload)
+
+    expected = instance.predict(
+        [
+            instance.CitibikeInput(**record)
+            for record in columnar.to_dict("records")
+        ]
+    )["predictions"]
+    if payload_format == "npy":
+        actual = np.load(io.BytesIO(response.body))
+    else:
+        actual = (
+            (
+                pa.ipc.open_stream(response.body)
+                if payload_format == "arrow_stream"
+                else pa.ipc.open_file(pa.BufferReader(response.body))
+            )
+            .read_all()["prediction"]
+            .to_numpy()
+        )
+    np.testing.assert_array_equal(actual, [p["prediction"] for p in expected])
+
+
+def test_read_columnar_features_rejects_missing_columns(tmp_path):
+    payload = tmp_path / "payload.npy"
+    np.save(payload, np.ones((2, 3), dtype="float32"))
+
+    with pytest.raises(InvalidArgument):
+        service.read_columnar_features(payload)
+
+
+def test_new_latest_model_invalidates_prediction_cache(monkeypatch):
+    from tests.unit.conftest import make_model, make_service
+
+    models = {"v1": make_model(n_rows=200), "v2": make_model(n_rows=300)}
+    latest = ["v1"]
+    monkeypatch.setattr(
+        bentoml.models,
+        "get",
+        lambda tag: SimpleNamespace(tag=SimpleNamespace(version=latest[0])),
+    )
+    monkeypatch.setattr(
+        service.bentoml.xgboost,
+        "load_model",
+        lambda bento_model: models[bento_model.tag.version],
+    )
+    instance = make_service(models["v1"], prediction_cache_size=100)
+    instance.model_version = "v1"
+    instance.model_check_interval = 0
+    features = service.build_input_features(
+        [
+            instance.CitibikeInput(**record)
+            for record in pd.DataFrame(
+                np.ones((2, len(service.MODEL_FEATURE_COLUMNS))),
+                columns=service.MODEL_FEATURE_COLUMNS,
+            )
+            .astype({"holiday": "int64"})
+            .to_dict("records")
+        ]
+    )
+
+    first = instance.predict_features(features)
+    cached = instance.predict_features(features)
+    latest[0] = "v2"
+    reloaded = instance.predict_features(features)
+
+    np.testing.assert_array_equal(cached, first)
+    assert instance.prediction_cache.stats["hits"] == 2
+    assert instance.model is models["v2"]
+    np.testing.assert_array_equal(reloaded, instance.predict_matrix(features))
+    assert not np.array_equal(reloaded, first)
+
+
+def test_compiled_backend_matches_xgboost(model):
+    from tests.unit.conftest import make_raw_inputs, make_service
+
+    raw_inputs = make_raw_inputs(50)
+
+    expected = make_service(model).predict_trip(raw_inputs)
+    actual = make_service(model, backend="compiled").predict_trip(raw_inputs)
+
+    assert actual == expected
+
+
+def test_import_defers_heavy_modules():
+    from tests.unit.conftest import SERVICE_DIR
+
+    code = (
+        "import sys, service; "
+        "print(sorted({'pandas', 'pyarrow', 'holidays'} & set(sys.modules)))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=SERVICE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+    assert service.IMPORT_SECONDS > 0
+
+
+def test_startup_warms_up_and_reports_timings(monkeypatch, model_store):
+    from tests.unit.conftest import make_model
+
+    saved = bentoml.xgboost.save_model(
+        service.MODEL_NAME, make_model(n_rows=200)
+    )
+    monkeypatch.setattr(service, "WARMUP_ROWS", 8)
+    predicted_rows = []
+    original_predict_matrix = service.CitibikeService.inner.predict_matrix
+
+    def predict_matrix(self, features):
+        predicted_rows.append(len(features))
+        return original_predict_matrix(self, features)
+
+    monkeypatch.setattr(
+        service.CitibikeService.inner, "predict_matrix", predict_matrix
+    )
+
+    instance = service.CitibikeService.inner()
+
+    # predict, predict_trip and the matrix path
+    assert predicted_rows == [8, 8, 8]
+    assert list(instance.startup_timings) == [
+        "import",
+        "load",
+        "calendar",
+        "warmup",
+    ]
+    # Synthetic rows don't end up in the prediction cache
+    assert len(instance.prediction_cache) == 0
+    assert instance.prediction_cache.max_size == service.PREDICTION_CACHE_SIZE
+    assert instance.model.get_params()["n_jobs"] == service.NTHREAD
+    assert instance.model_version == saved.tag.version
+    assert instance.worker_cpus is None
+
+
+def test_service_serves_the_saved_model(model_store, model):
+    from tests.unit.conftest import make_raw_inputs, make_service
+
+    bentoml.xgboost.save_model(service.MODEL_NAME, model)
+    raw_inputs = make_raw_inputs(20)
+
+    instance = service.CitibikeService.inner()
+
+    async def main():
+        return await asyncio.gather(
+            instance.predict_trip_batched(raw_inputs[:7]),
+            instance.predict_trip_batched(raw_inputs[7:]),
+        )
+
+    first, second = asyncio.run(main())
+    expected = make_service(model).predict_trip(raw_inputs)["predictions"]
+    assert instance.predict_trip(raw_inputs)["predictions"] == expected
+    assert instance.predict_trip(raw_inputs)["predictions"] == expected
+    assert first["predictions"] + second["predictions"] == expected
+    assert instance.prediction_cache.stats["hits"] > 0
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+from steps.data_loaders import (
+    DATASET_CATEGORICAL_COLUMNS,
+    DATASET_NUMERICAL_COLUMNS,
+    DATASET_PREDICTION_COLUMN_NAME,
+    DATASET_TARGET_COLUMN_NAME,
+)
+from steps.inference_predict import inference_predict
+from utils.tree_helper import CompiledTreeEnsemble
+
+MODEL_COLUMNS = DATASET_CATEGORICAL_COLUMNS + DATASET_NUMERICAL_COLUMNS
+
+
+def make_features(n_rows, random_state=0):
+    rng = np.random.default_rng(random_state)
+    X = pd.DataFrame(
+        rng.normal(size=(n_rows, len(MODEL_COLUMNS))), columns=MODEL_COLUMNS
+    )
+    X["holiday"] = rng.integers(0, 2, n_rows)
+    y = X["TMAX"] * 30 + X["hr_sin"] * 500 + rng.normal(size=n_rows)
+    return X, y
+
+
+@pytest.mark.parametrize("max_depth", [1, 3, 8])
+def test_compiled_model_matches_xgboost(max_depth):
+    X, y = make_features(2000)
+    # Missing values while training give the splits a learned direction
+    X.loc[X.sample(frac=0.1, random_state=0).index, "TMIN"] = np.nan
+    model = xgb.XGBRegressor(n_estimators=50, max_depth=max_depth)
+    model.fit(X, y)
+    compiled_model = CompiledTreeEnsemble.from_model(model)
+
+    features, _ = make_features(1000, random_state=1)
+    features = features.to_numpy(dtype=np.float32)
+    features[::7, 2] = np.nan
+    features[::11, 1] = np.inf
+
+    np.testing.assert_array_equal(
+        compiled_model.predict(features),
+        model.get_booster().inplace_predict(features),
+    )
+    assert compiled_model.feature_names == MODEL_COLUMNS
+
+
+def test_compiled_model_honours_early_stopping(tmp_path):
+    X, y = make_features(1000)
+    model = xgb.XGBRegressor(
+        n_estimators=200, early_stopping_rounds=2, learning_rate=0.5
+    )
+    model.fit(X[:800], y[:800], eval_set=[(X[800:], y[800:])], verbose=False)
+    assert model.best_iteration < 199
+
+    compiled_model = CompiledTreeEnsemble.from_model(model)
+    compiled_model.save(tmp_path / "model.npz")
+    loaded_model = CompiledTreeEnsemble.load(tmp_path / "model.npz")
+
+    assert compiled_model.n_trees == model.best_iteration + 1
+    np.testing.assert_array_equal(
+        loaded_model.predict(X.to_numpy()), model.predict(X)
+    )
+    assert loaded_model.feature_names == MODEL_COLUMNS
+
+
+def test_inference_predict_compiled_backend_matches_xgboost():
+    dataset = pd.read_parquet("data/test/test-modeling.parquet")
+    model = xgb.XGBRegressor(n_estimators=30, max_depth=4)
+    model.fit(dataset[MODEL_COLUMNS], dataset[DATASET_TARGET_COLUMN_NAME])
+
+    expected, _ = inference_predict.entrypoint(
+        model,
+        dataset.copy(),
+        categorical_feats=DATASET_CATEGORICAL_COLUMNS,
+        numerical_feats=DATASET_NUMERICAL_COLUMNS,
+    )
+    actual, _ = inference_predict.entrypoint(
+        model,
+        dataset.copy(),
+        categorical_feats=DATASET_CATEGORICAL_COLUMNS,
+        numerical_feats=DATASET_NUMERICAL_COLUMNS,
+        backend="compiled",
+    )
+
+    pd.testing.assert_series_equal(
+        actual[DATASET_PREDICTION_COLUMN_NAME],
+        expected[DATASET_PREDICTION_COLUMN_NAME],
+    )
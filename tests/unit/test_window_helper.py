@@ -0,0 +1,86 @@
+import datetime
+import pandas as pd
+import pytest
+from utils.window_helper import window_bounds, window_timestamp
+
+
+def hourly_index(start, end):
+    return pd.date_range(start, end, freq="h", inclusive="left")
+
+
+def window_days(index, bounds):
+    return [
+        (index[start].date(), index[stop - 1].date()) for start, stop in bounds
+    ]
+
+
+def test_weeks_keep_week_53_and_years_apart():
+    # 2020 has an ISO week 53, from Dec 28 to Jan 3
+    index = hourly_index("2020-12-21", "2022-01-10")
+
+    days = window_days(index, window_bounds(index, "week"))
+
+    assert days[0] == (
+        datetime.date(2020, 12, 21),
+        datetime.date(2020, 12, 27),
+    )
+    assert days[1] == (datetime.date(2020, 12, 28), datetime.date(2021, 1, 3))
+    # ISO week 1 of 2021 and 2022 are different windows
+    assert len(days) == len(set(days)) == 55
+
+
+def test_sliding_windows_overlap():
+    index = hourly_index("2025-01-01", "2025-01-11")
+
+    bounds = window_bounds(index, "day", size=7, step=1)
+
+    # Only windows of 7 full days of data
+    assert window_days(index, bounds) == [
+        (datetime.date(2025, 1, day), datetime.date(2025, 1, day + 6))
+        for day in range(1, 5)
+    ]
+    assert all(stop - start == 7 * 24 for start, stop in bounds)
+
+
+@pytest.mark.parametrize(
+    "granularity, size, step, expected",
+    [("hour", 1, 1, 24 * 90), ("day", 1, 7, 13), ("month", 1, 1, 3)],
+)
+def test_window_counts(granularity, size, step, expected):
+    index = hourly_index("2025-01-01", "2025-04-01")
+
+    assert len(window_bounds(index, granularity, size, step)) == expected
+
+
+def test_missing_periods_have_no_window():
+    index = hourly_index("2025-01-01", "2025-01-03").append(
+        hourly_index("2025-01-05", "2025-01-06")
+    )
+
+    bounds = window_bounds(index, "day")
+
+    assert [index[start].day for start, _ in bounds] == [1, 2, 5]
+
+
+def test_window_timestamp():
+    window = pd.DataFrame(index=hourly_index("2025-01-06", "2025-01-13"))
+
+    assert window_timestamp(window, "week") == datetime.date(2025, 1, 12)
+    assert window_timestamp(window, "hour") == datetime.datetime(
+        2025, 1, 12, 23
+    )
+    # A partial week or month ends with its period, not with its data
+    partial = pd.DataFrame(index=hourly_index("2025-01-13", "2025-01-16"))
+    assert window_timestamp(partial, "week") == datetime.date(2025, 1, 19)
+    assert window_timestamp(partial, "month") == datetime.date(2025, 1, 31)
+
+
+def test_invalid_windows():
+    index = hourly_index("2025-01-01", "2025-01-02")
+
+    with pytest.raises(ValueError, match="granularity"):
+        window_bounds(index, "year")
+    with pytest.raises(ValueError, match="at least 1"):
+        window_bounds(index, "day", size=0)
+    with pytest.raises(ValueError, match="sorted"):
+        window_bounds(index[::-1], "day")
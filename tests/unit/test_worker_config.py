@@ -0,0 +1,23 @@
+import pytest
+from worker_config import parse_cpu_list, worker_cpus
+
+
+def test_parse_cpu_list():
+    assert parse_cpu_list("0-3,8,10-11") == [0, 1, 2, 3, 8, 10, 11]
+    assert parse_cpu_list("") == []
+
+
+def test_worker_cpus_splits_cpus_in_blocks():
+    cpus = list(range(8))
+
+    assert worker_cpus(1, 2, "auto", cpus) == [0, 1]
+    assert worker_cpus(4, 2, "auto", cpus) == [6, 7]
+    # More workers than blocks wrap around
+    assert worker_cpus(5, 2, "auto", cpus) == [0, 1]
+    assert worker_cpus(2, 3, "4-7") == [4, 5, 7]
+
+
+def test_worker_cpus_disabled_or_empty():
+    assert worker_cpus(1, 2, "") is None
+    with pytest.raises(ValueError):
+        worker_cpus(1, 2, "auto", [])
@@ -0,0 +1,268 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from typing import Dict, Iterator, Optional
+from zenml.logger import get_logger
+
+
+logger = get_logger(__name__)
+
+INDEX_FILE = "index.json"
+PINS_FILE = "pins.json"
+LOCK_FILE = "index.lock"
+BLOBS_DIR = "blobs"
+
+
+class DatasetCache:
+    """On-disk cache for remote dataset files.
+
+    Files are stored under a key derived from the url and its ``ETag`` /
+    ``Last-Modified`` validators. Cached entries are revalidated with a
+    conditional request, so a ``304 Not Modified`` answer is served from
+    disk. When the total size goes over ``max_size_bytes`` the least
+    recently used files are evicted. In offline mode the server is never
+    contacted and only cached files are served.
+
+    Threads and processes can share a cache directory: the index is read
+    again under a file lock before every update, so concurrent writers merge
+    their entries instead of overwriting them. Files handed out by
+    ``pinned`` are neither evicted nor replaced by a newer version until the
+    block exits, or ``pin_timeout`` seconds pass if the reader died.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_size_bytes: int = 1024**3,
+        offline: bool = False,
+        timeout: float = 60.0,
+        pin_timeout: float = 3600.0,
+    ):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_size_bytes = max_size_bytes
+        self.offline = offline
+        self.timeout = timeout
+        self.pin_timeout = pin_timeout
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(self.cache_dir, BLOBS_DIR), exist_ok=True)
+        with self._shared_index(write=False):
+            pass
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    @contextlib.contextmanager
+    def pinned(self, url: str) -> Iterator[str]:
+        """Local path of ``url`` (see ``get``), kept until the block exits."""
+        token = uuid.uuid4().hex
+        path = self.get(url, pin=token)
+        try:
+            yield path
+        finally:
+            if path != url:
+                with self._shared_index():
+                    self._unpin(os.path.basename(path), token)
+                    self._evict()
+
+    def get(self, url: str, pin: Optional[str] = None) -> str:
+        """Return the local path of ``url``, downloading it if needed.
+
+        Local paths are returned unchanged. With ``pin``, the file is pinned
+        under that token before its path is returned, see ``pinned``.
+        """
+        if not url.startswith(("http://", "https://")):
+            return url
+
+        with self._shared_index(write=False) as index:
+            entry = index.get(url)
+        if entry and not os.path.exists(self._blob_path(entry["key"])):
+            entry = None
+
+        if self.offline:
+            if entry is None:
+                raise FileNotFoundError(
+                    f"{url} is not cached and the cache is in offline mode"
+                )
+            return self._hit(url, entry, pin)
+
+        request = urllib.request.Request(url)
+        if entry and entry.get("etag"):
+            request.add_header("If-None-Match", entry["etag"])
+        if entry and entry.get("last_modified"):
+            request.add_header("If-Modified-Since", entry["last_modified"])
+
+        try:
+            with urllib.request.urlopen(
+                request, timeout=self.timeout
+            ) as response:
+                return self._store(url, response, pin)
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and entry:
+                return self._hit(url, entry, pin)
+            raise
+        except urllib.error.URLError as e:
+            if entry is None:
+                raise
+            logger.warning(
+                f"Revalidation of {url} failed ({e}), serving cache"
+            )
+            return self._hit(url, entry, pin)
+
+    def _hit(self, url: str, entry: Dict, pin: Optional[str]) -> str:
+        with self._shared_index() as index:
+            # Another process may have evicted it since it was looked up
+            evicted = not os.path.exists(self._blob_path(entry["key"]))
+            if not evicted:
+                self.hits += 1
+                entry["last_access"] = time.time()
+                index[url] = entry
+                self._pin(entry["key"], pin)
+        if evicted:
+            return self.get(url, pin)
+        return self._blob_path(entry["key"])
+
+    def _store(self, url: str, response, pin: Optional[str]) -> str:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        key = hashlib.sha256(
+            f"{url}\n{etag}\n{last_modified}".encode()
+        ).hexdigest()
+
+        # Download to a temporary file first so readers never see partial
+        # files
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(fd, "wb") as tmp_file:
+            shutil.copyfileobj(response, tmp_file)
+
+        with self._shared_index() as index:
+            os.replace(tmp_path, self._blob_path(key))
+            self.misses += 1
+            previous = index.get(url)
+            index[url] = {
+                "key": key,
+                "etag": etag,
+                "last_modified": last_modified,
+                "size": os.path.getsize(self._blob_path(key)),
+                "last_access": time.time(),
+            }
+            self._pin(key, pin)
+            if previous and previous["key"] != key:
+                self._remove_blob(previous["key"])
+            self._evict(keep=url)
+
+        return self._blob_path(key)
+
+    def _evict(self, keep: Optional[str] = None):
+        """Drop least recently used entries until the cache fits.
+
+        Pinned entries are skipped, so the cache can stay over its size
+        until they are released.
+        """
+        total_size = sum(entry["size"] for entry in self._index.values())
+        lru_urls = sorted(
+            self._index, key=lambda url: self._index[url]["last_access"]
+        )
+        for url in lru_urls:
+            if total_size <= self.max_size_bytes:
+                break
+            if url == keep or self._is_pinned(self._index[url]["key"]):
+                continue
+            entry = self._index.pop(url)
+            self._remove_blob(entry["key"])
+            total_size -= entry["size"]
+            self.evictions += 1
+
+    @contextlib.contextmanager
+    def _shared_index(self, write: bool = True) -> Iterator[Dict[str, Dict]]:
+        """Lock the index across threads and processes and read it again.
+
+        With ``write`` the index and the pins are written back on exit.
+        """
+        lock_path = os.path.join(self.cache_dir, LOCK_FILE)
+        with self._lock, open(lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._index = self._read_json(INDEX_FILE)
+            pins = self._read_json(PINS_FILE)
+            self._pins = pins.get("pins", {})
+            self._retired = pins.get("retired", [])
+            yield self._index
+            if write:
+                self._release_expired_pins()
+                self._write_json(INDEX_FILE, self._index)
+                self._write_json(
+                    PINS_FILE, {"pins": self._pins, "retired": self._retired}
+                )
+
+    def _pin(self, key: str, token: Optional[str]):
+        if token is not None:
+            self._pins.setdefault(key, {})[token] = (
+                time.time() + self.pin_timeout
+            )
+
+    def _unpin(self, key: str, token: str):
+        self._pins.get(key, {}).pop(token, None)
+
+    def _is_pinned(self, key: str) -> bool:
+        now = time.time()
+        return any(expiry > now for expiry in self._pins.get(key, {}).values())
+
+    def _release_expired_pins(self):
+        """Forget expired pins and remove the released retired blobs."""
+        now = time.time()
+        self._pins = {
+            key: {
+                token: expiry
+                for token, expiry in tokens.items()
+                if expiry > now
+            }
+            for key, tokens in self._pins.items()
+        }
+        self._pins = {
+            key: tokens for key, tokens in self._pins.items() if tokens
+        }
+        retired = self._retired
+        self._retired = []
+        in_use = {entry["key"] for entry in self._index.values()}
+        for key in retired:
+            if key not in in_use:
+                self._remove_blob(key)
+
+    def _blob_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, BLOBS_DIR, key)
+
+    def _remove_blob(self, key: str):
+        """Remove a blob, or retire it until it is no longer pinned."""
+        if self._is_pinned(key):
+            self._retired.append(key)
+        elif os.path.exists(self._blob_path(key)):
+            os.remove(self._blob_path(key))
+
+    def _read_json(self, name: str) -> Dict:
+        path = os.path.join(self.cache_dir, name)
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r") as file:
+            return json.load(file)
+
+    def _write_json(self, name: str, data: Dict):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(fd, "w") as file:
+            json.dump(data, file)
+        os.replace(tmp_path, os.path.join(self.cache_dir, name))
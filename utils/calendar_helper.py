@@ -0,0 +1,203 @@
+"""Calendar features shared by the training pipeline and the service.
+
+The cyclical hour/weekday/ISO week/month features and the holiday flag
+only depend on the calendar hour, so they are precomputed once per day
+(plus one row per hour of the day) and looked up by integer offset.
+Training and serving use the same table, which guarantees identical
+features.
+
+This module only depends on numpy and holidays because it is shipped
+with the BentoML service (``deployment/bentoml/calendar_helper.py`` is a
+symlink to it).
+"""
+
+import datetime
+import functools
+import threading
+from typing import Dict, FrozenSet, Iterable, Optional
+import numpy as np
+
+CALENDAR_START_DATE = "2013-01-01"
+CALENDAR_END_DATE = "2035-12-31"
+
+HOUR_FEATURE_COLUMNS = ["hr_sin", "hr_cos"]
+DAY_FEATURE_COLUMNS = [
+    "weekday_sin",
+    "weekday_cos",
+    "week_sin",
+    "week_cos",
+    "mnth_sin",
+    "mnth_cos",
+]
+CYCLICAL_FEATURE_COLUMNS = HOUR_FEATURE_COLUMNS + DAY_FEATURE_COLUMNS
+
+
+def compute_hour_features(hours: np.ndarray) -> np.ndarray:
+    """Compute the ``(n, 2)`` hour sin-cos features."""
+    angle = np.asarray(hours) * (2.0 * np.pi / 24)
+    return np.column_stack([np.sin(angle), np.cos(angle)])
+
+
+def compute_day_features(days: np.ndarray) -> np.ndarray:
+    """Compute the ``(n, 6)`` weekday/ISO week/month sin-cos features.
+
+    Args:
+        days: ``datetime64[D]`` dates.
+    """
+    # 1970-01-01 is a Thursday, Monday is 0 like ``dt.dayofweek``
+    weekday = (days.astype("int64") + 3) % 7
+    # ISO week: week of the year of the Thursday of the same week
+    thursday = days - weekday + 3
+    year_start = thursday.astype("datetime64[Y]").astype("datetime64[D]")
+    week = (thursday - year_start).astype("int64") // 7
+    month = days.astype("datetime64[M]").astype("int64") % 12
+
+    features = []
+    for values, period in [(weekday, 7), (week, 52), (month, 12)]:
+        angle = values * (2.0 * np.pi / period)
+        features += [np.sin(angle), np.cos(angle)]
+    return np.column_stack(features)
+
+
+# ``datetime.date(1970, 1, 1).toordinal()``
+EPOCH_ORDINAL = 719163
+
+
+class HolidayCache:
+    """Process-wide US holiday calendar keyed by year.
+
+    Each year is built lazily as a frozenset of ordinal days, so checking a
+    day is a set membership test. Reads never take the lock: the mapping
+    is replaced as a whole (copy-on-write) when a year is added, and only
+    builders serialize on the lock. At most ``max_years`` years are kept,
+    the first built ones are dropped first.
+    """
+
+    def __init__(self, max_years: int = 32):
+        self.max_years = max_years
+        self._years: Dict[int, FrozenSet[int]] = {}
+        self._lock = threading.Lock()
+
+    def get_year(self, year: int) -> FrozenSet[int]:
+        """Return the ordinal days of the holidays of ``year``."""
+        days = self._years.get(year)
+        if days is not None:
+            return days
+        with self._lock:
+            days = self._years.get(year)
+            if days is None:
+                # Imported on first use to keep the service import fast
+                import holidays
+
+                days = frozenset(
+                    day.toordinal() for day in holidays.US(years=year)
+                )
+                years = dict(self._years)
+                years[year] = days
+                while len(years) > self.max_years:
+                    del years[next(iter(years))]
+                self._years = years
+        return days
+
+    def warm_up(self, years: Iterable[int]):
+        for year in years:
+            self.get_year(year)
+
+    def is_holiday(self, date: datetime.date) -> int:
+        return int(date.toordinal() in self.get_year(date.year))
+
+
+@functools.lru_cache(maxsize=None)
+def get_holiday_cache() -> HolidayCache:
+    """Return the process-wide holiday cache."""
+    return HolidayCache()
+
+
+def compute_holidays(days: np.ndarray) -> np.ndarray:
+    """Return 1 for the US holidays of ``days`` (``datetime64[D]``)."""
+    holiday_cache = get_holiday_cache()
+    years = np.unique(days.astype("datetime64[Y]").astype("int64") + 1970)
+    holiday_ordinals = np.array(
+        [
+            day
+            for year in years.tolist()
+            for day in holiday_cache.get_year(year)
+        ],
+        dtype="int64",
+    )
+    return np.isin(
+        days.astype("int64") + EPOCH_ORDINAL, holiday_ordinals
+    ).astype("int8")
+
+
+class CalendarTable:
+    """Precomputed calendar features indexed by day offset.
+
+    Dates outside ``[start_date, end_date]`` are still supported: their
+    features are computed on the fly.
+    """
+
+    def __init__(
+        self,
+        start_date: str = CALENDAR_START_DATE,
+        end_date: str = CALENDAR_END_DATE,
+    ):
+        self.start_day = np.datetime64(start_date, "D")
+        self.end_day = np.datetime64(end_date, "D")
+        days = np.arange(self.start_day, self.end_day + 1)
+        self.day_features = compute_day_features(days)
+        self.holidays = compute_holidays(days)
+        self.hour_features = compute_hour_features(np.arange(24))
+
+    def _day_positions(self, days: np.ndarray):
+        positions = (days - self.start_day).astype("int64")
+        in_range = (positions >= 0) & (positions < len(self.day_features))
+        return positions, in_range
+
+    def lookup(
+        self,
+        days: np.ndarray,
+        hours: np.ndarray,
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Look up the cyclical features of ``(day, hour)`` pairs.
+
+        Args:
+            days: ``datetime64[D]`` dates.
+            hours: Hours of the day.
+            out: Optional ``(n, 8)`` array the features are written into.
+                Its dtype may differ from float64 (e.g. float32).
+
+        Returns:
+            The ``(n, 8)`` features in ``CYCLICAL_FEATURE_COLUMNS`` order.
+        """
+        days = np.asarray(days, dtype="datetime64[D]")
+        if out is None:
+            out = np.empty((len(days), len(CYCLICAL_FEATURE_COLUMNS)))
+        n_hour = len(HOUR_FEATURE_COLUMNS)
+        out[:, :n_hour] = self.hour_features[np.asarray(hours, dtype="int64")]
+
+        positions, in_range = self._day_positions(days)
+        if in_range.all():
+            out[:, n_hour:] = self.day_features[positions]
+        else:
+            out[in_range, n_hour:] = self.day_features[positions[in_range]]
+            out[~in_range, n_hour:] = compute_day_features(days[~in_range])
+        return out
+
+    def lookup_holidays(self, days: np.ndarray) -> np.ndarray:
+        """Look up the holiday flag of ``days`` (``datetime64[D]``)."""
+        days = np.asarray(days, dtype="datetime64[D]")
+        positions, in_range = self._day_positions(days)
+        if in_range.all():
+            return self.holidays[positions]
+        flags = np.empty(len(days), dtype="int8")
+        flags[in_range] = self.holidays[positions[in_range]]
+        flags[~in_range] = compute_holidays(days[~in_range])
+        return flags
+
+
+@functools.lru_cache(maxsize=None)
+def get_calendar_table() -> CalendarTable:
+    """Return the process-wide calendar table, built on first use."""
+    return CalendarTable()
@@ -0,0 +1,462 @@
+"""Drift and regression metrics of many windows against one reference.
+
+``calculate_drift_metrics_step`` runs an Evidently ``Report`` per window,
+which recomputes every reference statistic each time. ``ReferenceProfile``
+computes them once (sorted values, standard deviations, value frequencies
+and regression metrics) and ``compute_windows_metrics`` evaluates every
+window of the current data in one pass: one sort per column for the
+distances between distributions and one groupby for the value counts,
+missing values and regression metrics.
+
+The metrics reproduce the ``CitibikeMetrics`` fields of Evidently 0.4
+(``ColumnDriftMetric``, ``DatasetDriftMetric``, ``DatasetMissingValuesMetric``
+and ``RegressionQualityMetric`` with their default options), including the
+statistical test Evidently picks for each column and window:
+
+- Numerical columns with more than 5 distinct values: normed Wasserstein
+  distance, or the K-S test when the reference has up to 1000 rows.
+- Other columns: Jensen-Shannon distance of the value frequencies. On
+  references of up to 1000 rows Evidently uses chi-square and Z tests
+  instead, which aren't implemented here.
+"""
+
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from scipy import stats
+from scipy.spatial import distance
+
+# Evidently picks distance based tests above this many reference rows
+LARGE_REFERENCE_ROWS = 1000
+# Numerical columns with at most this many distinct values are discrete
+MAX_DISCRETE_VALUES = 5
+
+# Default thresholds of the Evidently tests
+WASSERSTEIN_THRESHOLD = 0.1
+JENSENSHANNON_THRESHOLD = 0.1
+KS_THRESHOLD = 0.05
+
+# Share of the largest errors counted as under or overestimation
+UNDERPERFORMANCE_QUANTILE = 0.05
+
+# Values counted as missing on top of nulls
+MISSING_VALUES = ["", np.inf, -np.inf]
+
+
+def clean_values(values: pd.Series) -> pd.Series:
+    """Drop the missing and infinite values, like Evidently's drift tests."""
+    return values.replace([-np.inf, np.inf], np.nan).dropna()
+
+
+def regression_metrics(target: np.ndarray, prediction: np.ndarray) -> Dict:
+    """``RegressionQualityMetric`` values of one dataset."""
+    error = prediction - target
+    abs_error = np.abs(error)
+    abs_perc_error = abs_error / np.maximum(target, np.finfo(np.float64).eps)
+    total_sum_squares = np.sum((target - target.mean()) ** 2)
+    residual_sum_squares = np.sum(error**2)
+    if total_sum_squares:
+        r2_score = 1 - residual_sum_squares / total_sum_squares
+    else:
+        # scikit-learn's value for a constant target
+        r2_score = 1.0 if residual_sum_squares == 0 else 0.0
+    return {
+        "r2_score": float(r2_score),
+        "rmse": float(np.sqrt(residual_sum_squares / len(error))),
+        "mean_abs_error": float(abs_error.mean()),
+        "mean_error": float(error.mean()),
+        "abs_error_max": float(abs_error.max()),
+        "mean_abs_perc_error": float(100.0 * abs_perc_error.mean()),
+        "error_std": float(np.std(error, ddof=1)),
+        "abs_error_std": float(np.std(abs_error, ddof=1)),
+        "abs_perc_error_std": float(np.std(abs_perc_error, ddof=1)),
+    }
+
+
+def underperformance_metrics(target: np.ndarray, prediction: np.ndarray):
+    """Mean and std of the errors below, between and above the quantiles."""
+    error = prediction - target
+    quantile_top = np.quantile(error, UNDERPERFORMANCE_QUANTILE)
+    quantile_other = np.quantile(error, 1 - UNDERPERFORMANCE_QUANTILE)
+    groups = {
+        "majority": error[(error > quantile_top) & (error < quantile_other)],
+        "underestimation": error[error <= quantile_top],
+        "overestimation": error[error >= quantile_other],
+    }
+    return {
+        name: {
+            "mean_error": float(np.mean(values)),
+            "std_error": float(np.std(values, ddof=1)),
+        }
+        for name, values in groups.items()
+    }
+
+
+def regression_rows(data: pd.DataFrame, target: str, prediction: str):
+    """Target and prediction of the rows where both are finite."""
+    values = data[[target, prediction]].astype(np.float64)
+    valid = np.isfinite(values).all(axis=1).to_numpy()
+    return (
+        values[target].to_numpy()[valid],
+        values[prediction].to_numpy()[valid],
+        valid,
+    )
+
+
+class ReferenceProfile:
+    """Statistics of the reference data shared by every window.
+
+    The columns keep Evidently's roles: ``target`` and ``prediction`` are
+    numerical, ``numerical_columns`` may switch to value frequencies when a
+    window has few distinct values and ``categorical_columns`` are always
+    compared by value frequencies.
+
+    Args:
+        reference_data: Scored reference data.
+        target: Target column.
+        prediction: Prediction column.
+        numerical_columns: Numerical features.
+        categorical_columns: Categorical features.
+    """
+
+    def __init__(
+        self,
+        reference_data: pd.DataFrame,
+        target: str,
+        prediction: str,
+        numerical_columns: List[str],
+        categorical_columns: List[str],
+    ):
+        self.target = target
+        self.prediction = prediction
+        self.n_rows = len(reference_data)
+        self.column_types = self.column_roles(
+            target, prediction, numerical_columns, categorical_columns
+        )
+        self.sorted_values: Dict[str, np.ndarray] = {}
+        self.stds: Dict[str, float] = {}
+        self.frequencies: Dict[str, pd.Series] = {}
+        for column, column_type in self.column_types.items():
+            values = clean_values(reference_data[column])
+            if values.empty:
+                raise ValueError(f"Reference column '{column}' is empty")
+            frequencies = values.value_counts() / len(values)
+            if self.n_rows <= LARGE_REFERENCE_ROWS and (
+                column_type == "cat" or len(frequencies) <= MAX_DISCRETE_VALUES
+            ):
+                raise ValueError(
+                    f"Column '{column}' needs a chi-square or Z test on a "
+                    f"reference of {self.n_rows} rows, which the native "
+                    "engine doesn't implement"
+                )
+            self.frequencies[column] = frequencies
+            if column_type == "num":
+                sorted_values = np.sort(values.to_numpy(dtype=np.float64))
+                self.sorted_values[column] = sorted_values
+                self.stds[column] = float(np.std(sorted_values))
+
+        y_true, y_pred, _ = regression_rows(reference_data, target, prediction)
+        self.regression = regression_metrics(y_true, y_pred)
+        self.underperformance = underperformance_metrics(y_true, y_pred)
+
+    @staticmethod
+    def column_roles(
+        target: str,
+        prediction: str,
+        numerical_columns: List[str],
+        categorical_columns: List[str],
+    ) -> Dict[str, str]:
+        """Type of every column compared, ``"num"`` or ``"cat"``."""
+        return {
+            target: "num",
+            prediction: "num",
+            **{column: "num" for column in numerical_columns},
+            **{column: "cat" for column in categorical_columns},
+        }
+
+    def matches(
+        self,
+        target: str,
+        prediction: str,
+        numerical_columns: List[str],
+        categorical_columns: List[str],
+    ) -> bool:
+        """Whether the profile was computed for these columns."""
+        return (
+            self.target == target
+            and self.prediction == prediction
+            and self.column_types
+            == self.column_roles(
+                target, prediction, numerical_columns, categorical_columns
+            )
+        )
+
+    def reference_fields(self) -> Dict:
+        """``CitibikeMetrics`` fields that only depend on the reference."""
+        underperformance = self.underperformance
+        return {
+            "r2_score_reference": self.regression["r2_score"],
+            "rmse_score_reference": self.regression["rmse"],
+            "mae_score_reference": self.regression["mean_abs_error"],
+            "mean_error_reference": self.regression["mean_error"],
+            "abs_error_max_reference": self.regression["abs_error_max"],
+            "mean_abs_perc_error_reference": self.regression[
+                "mean_abs_perc_error"
+            ],
+            "underperformance_mean_error": underperformance["majority"][
+                "mean_error"
+            ],
+            "underperformance_std_error": underperformance["majority"][
+                "std_error"
+            ],
+            "underestimation_mean_error": underperformance["underestimation"][
+                "mean_error"
+            ],
+            "underestimation_std_error": underperformance["underestimation"][
+                "std_error"
+            ],
+            "overestimation_mean_error": underperformance["overestimation"][
+                "mean_error"
+            ],
+            "overestimation_std_error": underperformance["overestimation"][
+                "std_error"
+            ],
+            "error_std_reference": self.regression["error_std"],
+            "abs_error_std_reference": self.regression["abs_error_std"],
+            "abs_perc_error_std_reference": self.regression[
+                "abs_perc_error_std"
+            ],
+        }
+
+
+def wasserstein_distances(
+    reference_sorted: np.ndarray,
+    values: np.ndarray,
+    window_codes: np.ndarray,
+    n_windows: int,
+) -> np.ndarray:
+    """Wasserstein distance between the reference and every window.
+
+    The values are sorted once by window and value; each window is then a
+    contiguous sorted slice whose distance is the area between both
+    empirical CDFs, like ``scipy.stats.wasserstein_distance``.
+    """
+    order = np.lexsort((values, window_codes))
+    values, window_codes = values[order], window_codes[order]
+    bounds = np.searchsorted(window_codes, np.arange(n_windows + 1))
+    distances = np.full(n_windows, np.nan)
+    for window in range(n_windows):
+        window_sorted = values[bounds[window] : bounds[window + 1]]
+        if not len(window_sorted):
+            continue
+        all_values = np.sort(np.concatenate([reference_sorted, window_sorted]))
+        deltas = np.diff(all_values)
+        reference_cdf = np.searchsorted(
+            reference_sorted, all_values[:-1], side="right"
+        ) / len(reference_sorted)
+        window_cdf = np.searchsorted(
+            window_sorted, all_values[:-1], side="right"
+        ) / len(window_sorted)
+        distances[window] = np.sum(np.abs(reference_cdf - window_cdf) * deltas)
+    return distances
+
+
+def ks_pvalues(
+    reference_sorted: np.ndarray,
+    values: np.ndarray,
+    window_codes: np.ndarray,
+    n_windows: int,
+) -> np.ndarray:
+    """K-S test p-value of every window against the reference."""
+    pvalues = np.full(n_windows, np.nan)
+    for window in range(n_windows):
+        window_values = values[window_codes == window]
+        if len(window_values):
+            pvalues[window] = stats.ks_2samp(
+                reference_sorted, window_values
+            ).pvalue
+    return pvalues
+
+
+def jensenshannon_distances(
+    reference_frequencies: pd.Series, value_counts: pd.DataFrame
+) -> np.ndarray:
+    """Jensen-Shannon distance between the reference and every window.
+
+    Args:
+        reference_frequencies: Share of each value in the reference.
+        value_counts: Windows by values count matrix.
+    """
+    values = value_counts.columns.union(reference_frequencies.index)
+    window_counts = value_counts.reindex(columns=values, fill_value=0)
+    window_frequencies = window_counts.to_numpy(dtype=np.float64)
+    window_frequencies /= window_frequencies.sum(axis=1, keepdims=True)
+    reference = reference_frequencies.reindex(values, fill_value=0.0)
+    reference = np.broadcast_to(
+        reference.to_numpy(dtype=np.float64), window_frequencies.shape
+    )
+    return distance.jensenshannon(reference, window_frequencies, axis=1)
+
+
+def column_drift_scores(
+    profile: ReferenceProfile,
+    column: str,
+    values: pd.Series,
+    window_codes: np.ndarray,
+    n_windows: int,
+):
+    """Drift score and detection of one column in every window."""
+    values = values.replace([-np.inf, np.inf], np.nan)
+    valid = values.notna().to_numpy()
+    if (np.bincount(window_codes[valid], minlength=n_windows) == 0).any():
+        raise ValueError(f"Column '{column}' is empty in some window")
+    values, window_codes = values[valid], window_codes[valid]
+    reference_frequencies = profile.frequencies[column]
+
+    # Distinct values of the reference and each window together
+    distinct = pd.DataFrame({"window": window_codes, "value": values.values})
+    distinct = distinct.drop_duplicates()
+    new_values = ~distinct["value"].isin(reference_frequencies.index)
+    n_values = len(reference_frequencies) + np.bincount(
+        distinct["window"][new_values.to_numpy()], minlength=n_windows
+    )
+
+    scores = np.full(n_windows, np.nan)
+    drifted = np.zeros(n_windows, dtype=bool)
+    if profile.column_types[column] == "num":
+        continuous = n_values > MAX_DISCRETE_VALUES
+    else:
+        continuous = np.zeros(n_windows, dtype=bool)
+
+    if continuous.any():
+        reference_sorted = profile.sorted_values[column]
+        array = values.to_numpy(dtype=np.float64)
+        if profile.n_rows > LARGE_REFERENCE_ROWS:
+            norm = max(profile.stds[column], 0.001)
+            distances = (
+                wasserstein_distances(
+                    reference_sorted, array, window_codes, n_windows
+                )
+                / norm
+            )
+            scores[continuous] = distances[continuous]
+            drifted[continuous] = distances[continuous] >= (
+                WASSERSTEIN_THRESHOLD
+            )
+        else:
+            pvalues = ks_pvalues(
+                reference_sorted, array, window_codes, n_windows
+            )
+            scores[continuous] = pvalues[continuous]
+            drifted[continuous] = pvalues[continuous] <= KS_THRESHOLD
+
+    if not continuous.all():
+        value_counts = (
+            pd.DataFrame({"window": window_codes, "value": values.values})
+            .groupby(["window", "value"])
+            .size()
+            .unstack(fill_value=0)
+            .reindex(range(n_windows), fill_value=0)
+        )
+        distances = jensenshannon_distances(
+            reference_frequencies, value_counts
+        )
+        discrete = ~continuous
+        scores[discrete] = distances[discrete]
+        drifted[discrete] = distances[discrete] >= JENSENSHANNON_THRESHOLD
+    return scores, drifted
+
+
+def compute_windows_metrics(
+    profile: ReferenceProfile,
+    current_data: pd.DataFrame,
+    windows: pd.Series,
+) -> pd.DataFrame:
+    """``CitibikeMetrics`` fields of every window of ``current_data``.
+
+    Args:
+        profile: Profile of the reference data.
+        current_data: Scored data of all the windows.
+        windows: Window label of each row of ``current_data``.
+
+    Returns:
+        One row per window in label order, timestamped with the date of the
+        last row of the window, like ``compute_window_metrics``.
+    """
+    window_codes, labels = pd.factorize(windows, sort=True)
+    n_windows = len(labels)
+    grouper = pd.Series(window_codes, index=current_data.index)
+
+    # Missing values over every cell of the window
+    missing = current_data.isna() | current_data.isin(MISSING_VALUES)
+    missing_cells = missing.sum(axis=1).groupby(window_codes).sum()
+    window_rows = grouper.groupby(window_codes).size()
+    share_missing_values = missing_cells / (
+        window_rows * len(current_data.columns)
+    )
+
+    drifted_columns = np.zeros(n_windows, dtype=int)
+    for column in profile.column_types:
+        scores, drifted = column_drift_scores(
+            profile, column, current_data[column], window_codes, n_windows
+        )
+        drifted_columns += drifted
+        if column == profile.prediction:
+            prediction_drift = scores
+
+    # Regression metrics of the finite rows of each window
+    y_true, y_pred, valid = regression_rows(
+        current_data, profile.target, profile.prediction
+    )
+    errors = pd.DataFrame({"target": y_true, "error": y_pred - y_true})
+    errors["abs_error"] = errors["error"].abs()
+    errors["abs_perc_error"] = errors["abs_error"] / np.maximum(
+        y_true, np.finfo(np.float64).eps
+    )
+    errors["squared_error"] = errors["error"] ** 2
+    groups = errors.groupby(window_codes[valid])
+    errors["target_deviation"] = (
+        errors["target"] - groups["target"].transform("mean")
+    ) ** 2
+    groups = errors.groupby(window_codes[valid])
+    # Windows without finite rows get NaN metrics
+    all_windows = pd.RangeIndex(n_windows)
+    sums = groups[["squared_error", "target_deviation"]].sum()
+    sums = sums.reindex(all_windows)
+    means = groups[["error", "abs_error", "abs_perc_error"]].mean()
+    means = means.reindex(all_windows)
+    stds = groups[["error", "abs_error", "abs_perc_error"]].std(ddof=1)
+    stds = stds.reindex(all_windows)
+    r2_score = np.where(
+        sums["target_deviation"] != 0,
+        1 - sums["squared_error"] / sums["target_deviation"].replace(0, 1),
+        (sums["squared_error"] == 0).astype(float),
+    )
+
+    last_rows = pd.Series(current_data.index).groupby(window_codes).last()
+    metrics = pd.DataFrame(
+        {
+            "timestamp": [timestamp.date() for timestamp in last_rows],
+            "prediction_drift": prediction_drift,
+            "num_drifted_columns": drifted_columns,
+            "share_missing_values": share_missing_values.to_numpy(),
+            "r2_score_current": r2_score,
+            "rmse_score_current": np.sqrt(
+                sums["squared_error"] / groups.size().reindex(all_windows)
+            ).to_numpy(),
+            "mae_score_current": means["abs_error"].to_numpy(),
+            "mean_error_current": means["error"].to_numpy(),
+            "abs_error_max_current": groups["abs_error"]
+            .max()
+            .reindex(all_windows)
+            .to_numpy(),
+            "mean_abs_perc_error_current": 100.0
+            * means["abs_perc_error"].to_numpy(),
+            "error_std_current": stds["error"].to_numpy(),
+            "abs_error_std_current": stds["abs_error"].to_numpy(),
+            "abs_perc_error_std_current": stds["abs_perc_error"].to_numpy(),
+        }
+    )
+    for field, value in profile.reference_fields().items():
+        metrics[field] = value
+    return metrics
@@ -0,0 +1,126 @@
+"""On-disk store of scored reference data and their drift profiles.
+
+The reference period of the monitoring pipeline only changes when the
+champion model, the reference dates or the features change, yet every run
+used to load, preprocess, score and profile it again. A stored entry holds
+the scored reference frame (``reference.parquet``) and its
+``ReferenceProfile`` (``profile.pkl``) under a key derived from those
+inputs, so a matching run reads them back instead. ``key.json`` records
+the inputs of the key for humans.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+import xgboost as xgb
+from zenml.logger import get_logger
+
+from utils.drift_helper import ReferenceProfile
+
+logger = get_logger(__name__)
+
+REFERENCE_FILE = "reference.parquet"
+PROFILE_FILE = "profile.pkl"
+KEY_FILE = "key.json"
+
+
+def model_fingerprint(model: xgb.XGBRegressor) -> str:
+    """SHA-256 of the serialized booster, i.e. of the model version."""
+    raw = model.get_booster().save_raw(raw_format="ubj")
+    return hashlib.sha256(bytes(raw)).hexdigest()
+
+
+def profile_key_fields(
+    model: xgb.XGBRegressor,
+    start_reference_date,
+    end_reference_date,
+    features: List[str],
+    settings: Optional[Dict] = None,
+) -> Dict:
+    """Inputs a stored reference profile depends on.
+
+    Args:
+        model: Model scoring the reference data.
+        start_reference_date: First day of the reference data.
+        end_reference_date: Last day of the reference data.
+        features: Features of the profile, in order.
+        settings: Other options changing the scored frame, e.g. the
+            dataset url, the preprocessing options or the prediction
+            backend.
+    """
+    return {
+        "model": model_fingerprint(model),
+        "start_reference_date": pd.Timestamp(start_reference_date).isoformat(),
+        "end_reference_date": pd.Timestamp(end_reference_date).isoformat(),
+        "features": list(features),
+        "settings": settings or {},
+    }
+
+
+def profile_key(key_fields: Dict) -> str:
+    """Name of the store entry of ``key_fields``."""
+    return hashlib.sha256(
+        json.dumps(key_fields, sort_keys=True).encode()
+    ).hexdigest()
+
+
+class ReferenceProfileStore:
+    """Directory of scored reference frames and profiles by key.
+
+    Entries are written to a temporary directory and renamed into place, so
+    concurrent runs never read partial entries. Entries are small (one per
+    model and reference range) and are never evicted.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = os.path.expanduser(store_dir)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def load(
+        self, key_fields: Dict
+    ) -> Optional[Tuple[pd.DataFrame, Optional[ReferenceProfile]]]:
+        """Stored reference frame and profile of ``key_fields``.
+
+        ``None`` when nothing is stored for them.
+        """
+        entry_dir = self._entry_dir(key_fields)
+        if not os.path.exists(os.path.join(entry_dir, PROFILE_FILE)):
+            self.misses += 1
+            return None
+        reference_data = pd.read_parquet(
+            os.path.join(entry_dir, REFERENCE_FILE)
+        )
+        with open(os.path.join(entry_dir, PROFILE_FILE), "rb") as file:
+            profile = pickle.load(file)
+        self.hits += 1
+        return reference_data, profile
+
+    def save(
+        self,
+        key_fields: Dict,
+        reference_data: pd.DataFrame,
+        profile: Optional[ReferenceProfile],
+    ) -> str:
+        """Store an entry, replacing any previous one with the same key."""
+        entry_dir = self._entry_dir(key_fields)
+        tmp_dir = tempfile.mkdtemp(dir=self.store_dir)
+        reference_data.to_parquet(os.path.join(tmp_dir, REFERENCE_FILE))
+        with open(os.path.join(tmp_dir, PROFILE_FILE), "wb") as file:
+            pickle.dump(profile, file)
+        with open(os.path.join(tmp_dir, KEY_FILE), "w") as file:
+            json.dump(key_fields, file, indent=2)
+        if os.path.exists(entry_dir):
+            shutil.rmtree(entry_dir)
+        os.replace(tmp_dir, entry_dir)
+        logger.info(f"Reference profile stored in {entry_dir}")
+        return entry_dir
+
+    def _entry_dir(self, key_fields: Dict) -> str:
+        return os.path.join(self.store_dir, profile_key(key_fields))
@@ -0,0 +1,225 @@
+"""Flattened tree ensemble evaluator for the XGBoost regressor.
+
+The trees of the booster trained by ``xgb_trainer`` are exported into flat
+NumPy arrays of nodes (feature, threshold, children, default direction and
+leaf value). Prediction walks every tree of every row at once, one level per
+iteration, so the cost only depends on the depth of the ensemble.
+
+This module only depends on numpy because it is shipped with the BentoML
+service (``deployment/bentoml/tree_helper.py`` is a symlink to it).
+"""
+
+import json
+from typing import List, Optional
+import numpy as np
+
+# Rows walked at once by ``CompiledTreeEnsemble.predict``
+ROW_BLOCK_SIZE = 1024
+
+# Objectives whose prediction is the raw margin
+IDENTITY_OBJECTIVES = {
+    "reg:squarederror",
+    "reg:absoluteerror",
+    "reg:pseudohubererror",
+    "reg:quantileerror",
+}
+
+
+class CompiledTreeEnsemble:
+    """Array-of-nodes representation of a gradient boosted tree ensemble.
+
+    Every tree is laid out as a perfect binary tree of depth ``max_depth``:
+    the children of node ``i`` are ``2i + 1`` and ``2i + 2``, so walking a
+    level is arithmetic plus two lookups. Leaves above the last level are
+    pushed down by pass-through nodes that send every value to a copy of the
+    leaf. Memory grows as ``n_trees * 2 ** max_depth``, which is small for
+    the shallow ensembles trained here.
+
+    Args:
+        feature: ``(n_trees, 2 ** max_depth - 1)`` split feature of each node.
+        threshold: Split threshold of each node, values below go left.
+        default_left: Direction of missing values at each node.
+        leaf_value: ``(n_trees, 2 ** max_depth)`` value of each leaf.
+        base_score: Global bias of the ensemble.
+        feature_names: Feature order expected by ``predict``.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        default_left: np.ndarray,
+        leaf_value: np.ndarray,
+        base_score: float,
+        feature_names: Optional[List[str]] = None,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.default_left = default_left
+        self.leaf_value = leaf_value
+        self.base_score = np.float32(base_score)
+        self.feature_names = feature_names
+        self.n_trees, n_nodes = feature.shape
+        self.max_depth = int(np.log2(n_nodes + 1))
+        # Flat views and the offset of each tree in them
+        self._feature = feature.ravel()
+        self._threshold = threshold.ravel()
+        self._default_left = default_left.ravel()
+        self._tree_offsets = np.arange(self.n_trees, dtype=np.intp) * n_nodes
+
+    @classmethod
+    def from_booster(
+        cls, booster, iteration_range: Optional[tuple] = None
+    ) -> "CompiledTreeEnsemble":
+        """Export the trees of an ``xgboost.Booster``.
+
+        Args:
+            booster: Booster of a single target ``gbtree`` regressor.
+            iteration_range: Boosting rounds to export, ``(0, n)`` exports
+                the first ``n`` rounds. All rounds by default.
+        """
+        learner = json.loads(booster.save_raw("json"))["learner"]
+        objective = learner["objective"]["name"]
+        if objective not in IDENTITY_OBJECTIVES:
+            raise ValueError(f"Objective {objective} is not supported")
+        gradient_booster = learner["gradient_booster"]
+        if gradient_booster["name"] != "gbtree":
+            raise ValueError(
+                f"Booster {gradient_booster['name']} is not supported"
+            )
+        model = gradient_booster["model"]
+        trees = model["trees"]
+        if iteration_range is not None and iteration_range[1] > 0:
+            indptr = model["iteration_indptr"]
+            trees = trees[
+                indptr[iteration_range[0]] : indptr[iteration_range[1]]
+            ]
+        if any(any(tree["split_type"]) for tree in trees):
+            raise ValueError("Categorical splits are not supported")
+
+        # base_score is stored as "5.2E2" or "[5.2E2]" depending on the version
+        base_score = float(
+            learner["learner_model_param"]["base_score"].strip("[]")
+        )
+
+        max_depth = max(
+            tree_depth(tree["left_children"], tree["right_children"])
+            for tree in trees
+        )
+        n_nodes = 2**max_depth - 1
+        feature = np.zeros((len(trees), n_nodes), dtype=np.int32)
+        # Pass-through nodes send every value left (NaN included)
+        threshold = np.full((len(trees), n_nodes), np.inf, dtype=np.float32)
+        default_left = np.ones((len(trees), n_nodes), dtype=bool)
+        leaf_value = np.zeros((len(trees), n_nodes + 1), dtype=np.float32)
+        for t, tree in enumerate(trees):
+            left, right = tree["left_children"], tree["right_children"]
+            # The leaf value is stored in split_conditions
+            conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+            stack = [(0, 0, 0)]  # tree node, perfect tree node, depth
+            while stack:
+                node, position, depth = stack.pop()
+                if depth == max_depth:
+                    leaf_value[t, position - n_nodes] = conditions[node]
+                elif left[node] == -1:
+                    # Copy the leaf to both subtrees (+inf goes right)
+                    stack.append((node, 2 * position + 1, depth + 1))
+                    stack.append((node, 2 * position + 2, depth + 1))
+                else:
+                    feature[t, position] = tree["split_indices"][node]
+                    threshold[t, position] = conditions[node]
+                    default_left[t, position] = tree["default_left"][node]
+                    stack.append((left[node], 2 * position + 1, depth + 1))
+                    stack.append((right[node], 2 * position + 2, depth + 1))
+
+        return cls(
+            feature=feature,
+            threshold=threshold,
+            default_left=default_left,
+            leaf_value=leaf_value,
+            base_score=base_score,
+            feature_names=booster.feature_names,
+        )
+
+    @classmethod
+    def from_model(cls, model) -> "CompiledTreeEnsemble":
+        """Export an ``xgboost.XGBRegressor``, honouring early stopping."""
+        try:
+            iteration_range = (0, model.best_iteration + 1)
+        except AttributeError:
+            iteration_range = None
+        return cls.from_booster(model.get_booster(), iteration_range)
+
+    def save(self, path: str):
+        """Write the node arrays to a ``.npz`` file."""
+        np.savez(
+            path,
+            feature=self.feature,
+            threshold=self.threshold,
+            default_left=self.default_left,
+            leaf_value=self.leaf_value,
+            base_score=self.base_score,
+            feature_names=np.asarray(self.feature_names or [], dtype=str),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledTreeEnsemble":
+        with np.load(path) as arrays:
+            return cls(
+                feature=arrays["feature"],
+                threshold=arrays["threshold"],
+                default_left=arrays["default_left"],
+                leaf_value=arrays["leaf_value"],
+                base_score=float(arrays["base_score"]),
+                feature_names=arrays["feature_names"].tolist() or None,
+            )
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Predict an ``(n, k)`` matrix whose columns follow the booster.
+
+        Missing values (NaN) follow the default direction of each split,
+        like XGBoost. Rows are walked in blocks so the intermediate
+        ``(rows, n_trees)`` arrays stay in cache.
+        """
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        preds = np.empty(len(features), dtype=np.float32)
+        for start in range(0, len(features), ROW_BLOCK_SIZE):
+            block = slice(start, start + ROW_BLOCK_SIZE)
+            preds[block] = self._predict_block(features[block])
+        return preds
+
+    def _predict_block(self, features: np.ndarray) -> np.ndarray:
+        n_rows, n_features = features.shape
+        flat_features = features.ravel()
+        has_missing = np.isnan(flat_features).any()
+        row_offsets = np.arange(n_rows, dtype=np.intp)[:, None] * n_features
+
+        # (n_rows, n_trees) position of each row in each tree
+        positions = np.zeros((n_rows, self.n_trees), dtype=np.intp)
+        for _ in range(self.max_depth):
+            nodes = positions + self._tree_offsets
+            values = flat_features[row_offsets + self._feature[nodes]]
+            go_right = values >= self._threshold[nodes]
+            if has_missing:
+                go_right |= np.isnan(values) & ~self._default_left[nodes]
+            positions = 2 * positions + 1 + go_right
+        leaves = self.leaf_value[
+            np.arange(self.n_trees), positions - len(self.feature[0])
+        ]
+
+        # Trees are added in order in float32 after the bias, like XGBoost
+        margins = np.empty((n_rows, self.n_trees + 1), dtype=np.float32)
+        margins[:, 0] = self.base_score
+        margins[:, 1:] = leaves
+        return np.cumsum(margins, axis=1, dtype=np.float32)[:, -1]
+
+
+def tree_depth(left: List[int], right: List[int]) -> int:
+    """Depth of a tree given its children lists (-1 for leaves)."""
+    depth = [0] * len(left)
+    # Children always come after their parent in XGBoost trees
+    for node in range(len(left)):
+        if left[node] != -1:
+            depth[left[node]] = depth[node] + 1
+            depth[right[node]] = depth[node] + 1
+    return max(depth)
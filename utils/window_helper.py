@@ -0,0 +1,105 @@
+"""Calendar windows of the monitoring data.
+
+Windows are made of consecutive calendar periods (hours, days, ISO weeks or
+months). ``size`` periods form a window and a new window ends every
+``step`` periods, so ``size == step`` gives disjoint windows and
+``size > step`` sliding ones, e.g. 7 day windows every day. Periods are
+counted from the epoch, so the same data always gives the same windows
+whatever range is loaded.
+
+The data is sorted by time once and every window is a contiguous slice of
+it, located with a binary search on the period of each row. The content
+hash of a window tells whether it changed since its metrics were stored.
+"""
+
+import hashlib
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+
+# Pandas period frequency of each granularity, weeks end on Sunday like
+# ISO weeks
+GRANULARITIES = {"hour": "h", "day": "D", "week": "W-SUN", "month": "M"}
+
+
+def window_bounds(
+    index: pd.DatetimeIndex,
+    granularity: str = "week",
+    size: int = 1,
+    step: int = 1,
+) -> List[Tuple[int, int]]:
+    """Row positions of every window of a sorted index.
+
+    Only the windows fully inside the periods of the index and holding
+    rows are returned, in time order.
+
+    Args:
+        index: Sorted datetime index of the data.
+        granularity: ``"hour"``, ``"day"``, ``"week"`` or ``"month"``.
+        size: Periods per window.
+        step: Periods between the ends of consecutive windows.
+
+    Returns:
+        The ``(start, stop)`` positions of the rows of each window.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(
+            f"Unknown window granularity {granularity!r}, expected one of "
+            f"{sorted(GRANULARITIES)}"
+        )
+    if size < 1 or step < 1:
+        raise ValueError("Window size and step must be at least 1")
+    if not len(index):
+        return []
+    if not index.is_monotonic_increasing:
+        raise ValueError("The index must be sorted")
+
+    periods = index.to_period(GRANULARITIES[granularity]).asi8
+    ends = np.arange(periods[0] + size - 1, periods[-1] + 1)
+    ends = ends[ends % step == 0]
+    starts = np.searchsorted(periods, ends - size + 1, side="left")
+    stops = np.searchsorted(periods, ends, side="right")
+    return [
+        (int(start), int(stop))
+        for start, stop in zip(starts, stops)
+        if stop > start
+    ]
+
+
+def window_timestamp(window: pd.DataFrame, granularity: str = "week"):
+    """Timestamp of a window: its last hour, or the last day of its last
+    period otherwise.
+
+    The end of the period is used even when the data stops earlier, so a
+    partial window keeps its timestamp when the rest of its data arrives.
+    """
+    period = window.index[-1].to_period(GRANULARITIES[granularity])
+    if granularity == "hour":
+        return period.start_time.to_pydatetime()
+    return period.end_time.date()
+
+
+def window_start(
+    timestamp, granularity: str = "week", size: int = 1, shift: int = 0
+) -> pd.Timestamp:
+    """First instant of a window of ``size`` periods.
+
+    The window ends ``shift`` periods after the period of ``timestamp``.
+    """
+    period = pd.Period(timestamp, freq=GRANULARITIES[granularity])
+    return (period + shift - size + 1).start_time
+
+
+def window_key(timestamp) -> str:
+    """Key of a window timestamp, the same for dates and datetimes."""
+    return pd.Timestamp(timestamp).isoformat()
+
+
+def content_hash(data: pd.DataFrame, salt: str = "") -> str:
+    """SHA-256 of the index, column names and values of ``data``."""
+    digest = hashlib.sha256(salt.encode())
+    digest.update(repr(list(data.columns)).encode())
+    digest.update(
+        pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes()
+    )
+    return digest.hexdigest()